@@ -0,0 +1,250 @@
+"""
+預先計算的聚合立方體（Aggregate Cube）
+
+資料載入後只做一次 groupby，把每個維度組合的
+筆數、總和、平方和、最小值、最大值存起來，
+API 直接從這裡查詢，不必每次都複製整份 DataFrame。
+"""
+
+import hashlib
+import json
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+# 可以被分組的類別欄位
+DIMENSIONS = [
+    "Country",
+    "Year",
+    "Attack Type",
+    "Target Industry",
+    "Attack Source",
+    "Security Vulnerability Type",
+    "Defense Mechanism Used",
+]
+
+# 可以被加總的數值欄位
+MEASURES = [
+    "Financial Loss (in Million $)",
+    "Number of Affected Users",
+    "Incident Resolution Time (in Hours)",
+]
+
+
+def stat_column(measure, stat):
+    """聚合表中某個數值欄位統計量的欄位名稱"""
+    return f"{measure}|{stat}"
+
+
+class AggregateCube:
+    """各維度組合（預設最多兩個維度）的聚合結果"""
+
+    def __init__(self, df, dimensions=None, measures=None, max_depth=2):
+        self.dimensions = [
+            d for d in (dimensions or DIMENSIONS) if d in df.columns
+        ]
+        self.measures = [m for m in (measures or MEASURES) if m in df.columns]
+        self.max_depth = max_depth
+        self.total_rows = len(df)
+        self._tables = {}
+
+        work = df[self.dimensions + self.measures]
+        squares = {f"{m}|sq": work[m].astype("float64")**2 for m in self.measures}
+        work = work.assign(**squares)
+
+        for depth in range(0, max_depth + 1):
+            for dims in combinations(self.dimensions, depth):
+                self._tables[dims] = self._aggregate(work, list(dims))
+
+    def _aggregate(self, work, dims):
+        """計算單一維度組合的聚合表"""
+        if not dims:
+            row = {"rows": len(work)}
+            for m in self.measures:
+                col = work[m]
+                row[stat_column(m, "count")] = int(col.count())
+                row[stat_column(m, "sum")] = float(col.sum())
+                row[stat_column(m, "sumsq")] = float(work[f"{m}|sq"].sum())
+                row[stat_column(m, "min")] = col.min()
+                row[stat_column(m, "max")] = col.max()
+            return pd.DataFrame([row])
+
+        grouped = work.groupby(dims, observed=True, sort=True)
+        table = pd.DataFrame({"rows": grouped.size()})
+        if self.measures:
+            stats = grouped[self.measures].agg(["count", "sum", "min", "max"])
+            sumsq = grouped[[f"{m}|sq" for m in self.measures]].sum()
+            for m in self.measures:
+                table[stat_column(m, "count")] = stats[(m, "count")]
+                table[stat_column(m, "sum")] = stats[(m, "sum")]
+                table[stat_column(m, "sumsq")] = sumsq[f"{m}|sq"]
+                table[stat_column(m, "min")] = stats[(m, "min")]
+                table[stat_column(m, "max")] = stats[(m, "max")]
+        return table
+
+    def merge(self, other):
+        """
+        合併另一份資料的聚合結果，回傳新的立方體
+
+        count / sum / sumsq 相加，min / max 取極值，
+        成本只與組合數量有關，與資料筆數無關。
+        """
+        merged = AggregateCube.__new__(AggregateCube)
+        merged.dimensions = self.dimensions
+        merged.measures = self.measures
+        merged.max_depth = self.max_depth
+        merged.total_rows = self.total_rows + other.total_rows
+        merged._tables = {}
+
+        how = self._how()
+        for key, table in self._tables.items():
+            extra = other._tables.get(key)
+            if extra is None or extra.empty:
+                merged._tables[key] = table
+            elif not key:
+                merged._tables[key] = self._collapse(pd.concat([table, extra]))
+            else:
+                combined = pd.concat([table, extra])
+                merged._tables[key] = combined.groupby(
+                    level=list(range(len(key))), observed=True,
+                    sort=True).agg(how)
+        return merged
+
+    def _how(self):
+        """合併聚合表時各欄位的運算方式"""
+        how = {"rows": "sum"}
+        for m in self.measures:
+            for stat in ("count", "sum", "sumsq"):
+                how[stat_column(m, stat)] = "sum"
+            how[stat_column(m, "min")] = "min"
+            how[stat_column(m, "max")] = "max"
+        return how
+
+    def rollup(self, dims=(), filters=None):
+        """
+        先篩選再分組的聚合表
+
+        Args:
+            dims: 分組維度
+            filters: {維度: 函式}，函式接收該維度的值（Index），回傳布林遮罩；
+                篩選的維度不必出現在 dims 中，會使用包含它的聚合表再加總
+        """
+        dims = list(dims)
+        filters = filters or {}
+        extra = [d for d in filters if d not in dims]
+        table = self._tables[self._key(dims + extra)]
+
+        for dim, predicate in filters.items():
+            mask = np.asarray(predicate(table.index.get_level_values(dim)),
+                              dtype=bool)
+            table = table[mask]
+
+        if not dims:
+            return self._collapse(table)
+        if extra:
+            table = table.groupby(level=dims, observed=True,
+                                  sort=True).agg(self._how())
+        elif len(dims) > 1 and list(table.index.names) != dims:
+            table = table.reorder_levels(dims).sort_index()
+        return table
+
+    def _key(self, dims):
+        """把任意順序的維度轉成儲存時使用的順序"""
+        missing = [d for d in dims if d not in self.dimensions]
+        if missing:
+            raise KeyError(f"Unknown dimension: {missing[0]}")
+        key = tuple(d for d in self.dimensions if d in dims)
+        if key not in self._tables:
+            raise KeyError(f"Combination not precomputed: {list(dims)}")
+        return key
+
+    def has(self, *dims):
+        """是否有預先計算這個維度組合"""
+        try:
+            self._key(dims)
+            return True
+        except KeyError:
+            return False
+
+    def frame(self, dims=(), where=None):
+        """
+        取得聚合表
+
+        Args:
+            dims: 分組維度（索引順序與傳入順序相同）
+            where: {維度: 值} 的等值篩選，會先用更細的聚合表再取出切片
+        """
+        dims = list(dims)
+        where = where or {}
+        table = self._tables[self._key(dims + list(where))]
+
+        if where:
+            names = list(table.index.names)
+            for dim, value in where.items():
+                level = names.index(dim)
+                mask = table.index.get_level_values(level) == value
+                table = table[mask]
+            if not dims:
+                return self._collapse(table)
+            table = table.droplevel(list(where))
+
+        if len(dims) > 1 and list(table.index.names) != dims:
+            table = table.reorder_levels(dims).sort_index()
+        return table
+
+    def _collapse(self, table):
+        """把多列聚合結果合併成單列（sum 相加、min/max 取極值）"""
+        row = {"rows": int(table["rows"].sum())}
+        for m in self.measures:
+            for stat in ("count", "sum", "sumsq"):
+                row[stat_column(m, stat)] = table[stat_column(m, stat)].sum()
+            row[stat_column(m, "min")] = table[stat_column(m, "min")].min()
+            row[stat_column(m, "max")] = table[stat_column(m, "max")].max()
+        return pd.DataFrame([row])
+
+    def counts(self, *dims, where=None):
+        """各組筆數"""
+        return self.frame(dims, where)["rows"]
+
+    def stat(self, measure, stat, *dims, where=None):
+        """各組某個數值欄位的統計量（count/sum/sumsq/min/max）"""
+        return self.frame(dims, where)[stat_column(measure, stat)]
+
+    def sum(self, measure, *dims, where=None):
+        return self.stat(measure, "sum", *dims, where=where)
+
+    def mean(self, measure, *dims, where=None):
+        table = self.frame(dims, where)
+        n = table[stat_column(measure, "count")]
+        return table[stat_column(measure, "sum")] / n.where(n > 0)
+
+    def std(self, measure, *dims, where=None):
+        """樣本標準差（ddof=1），與 Series.std() 相同"""
+        table = self.frame(dims, where)
+        n = table[stat_column(measure, "count")].astype("float64")
+        total = table[stat_column(measure, "sum")]
+        sumsq = table[stat_column(measure, "sumsq")]
+        var = (sumsq - total**2 / n) / (n - 1).where(n > 1)
+        return np.sqrt(var.clip(lower=0))
+
+    def totals(self):
+        """整份資料的聚合結果（單列）"""
+        return self._tables[()].iloc[0]
+
+    def fingerprint(self):
+        """
+        資料內容的指紋（由每個維度組合的聚合表計算）
+
+        任何一筆資料的類別或數值改變，都會改變某個聚合表，
+        只比較總數或各年份的總和時，資料在年份之間不變的修改會被忽略。
+        同一份資料在不同 worker 中算出的結果相同，可當作資料版本。
+        """
+        digest = hashlib.sha1(str(self.total_rows).encode("utf-8"))
+        for dims in sorted(self._tables):
+            # 排序與四捨五入：合併分區時的列順序與浮點誤差不影響結果
+            table = self._tables[dims].sort_index().round(6)
+            digest.update(json.dumps(dims, ensure_ascii=False).encode("utf-8"))
+            digest.update(
+                pd.util.hash_pandas_object(table, index=True).values.tobytes())
+        return digest.hexdigest()[:16]
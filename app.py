@@ -1,7 +1,31 @@
-from flask import Flask, render_template, jsonify, request
-import pandas as pd
+from flask import Flask, Response, render_template, jsonify, request
+import numpy as np
 import json
 import os
+import threading
+from urllib.parse import quote
+
+from aggregates import stat_column
+from batch import BatchError, parse_queries, run_batch
+from boxplot import box_summary
+from compression import Compressor
+from data_cache import DEFAULT_CACHE_DIR, cache_path_for, load_cached_csv
+from http_cache import ResponseCache
+from ingest import DEFAULT_CHUNK_ROWS, ingest_csv
+from instrumentation import Instrumentation, stage
+from memo import LRUCache
+from partitions import load_partitions
+from providers import DatasetBootstrap, KaggleProvider, LocalFileProvider
+from query import Filter, QueryError, execute as execute_query, parse_query
+from schema import concat_frames, memory_report, read_threats_csv
+from serialization import FastJSONProvider, stream_json
+from serving import ComputePool, PoolBusyError
+from sketches import DEFAULT_TOP_K, kll_rank_error
+from snapshot import DatasetSnapshot
+from storage import DEFAULT_DB_PATH, SQLiteStore
+from treemap import DEFAULT_LEVELS, MAX_DEPTH, build_treemap
+from warmup import COUNTRY_PATHS, WARMUP_PATHS, CacheWarmer
+from watcher import DataWatcher
 
 # 載入 .env 檔案
 try:
@@ -14,61 +38,294 @@ except ImportError:
     pass
 
 app = Flask(__name__)
+# jsonify() 改用 orjson（有安裝時），numpy 陣列可直接序列化
+app.json = FastJSONProvider(app)
 
 
-def download_kaggle_dataset():
-    """從 Kaggle 下載資料集"""
-    try:
-        print("正在嘗試使用 Kaggle API 下載資料集...")
-
-        kaggle_username = os.environ.get("KAGGLE_USERNAME")
-        kaggle_key = os.environ.get("KAGGLE_KEY")
-
-        if kaggle_username and kaggle_key:
-            print("✓ 從環境變數讀取 Kaggle 憑證")
-            os.environ["KAGGLE_USERNAME"] = kaggle_username
-            os.environ["KAGGLE_KEY"] = kaggle_key
-        elif os.path.exists("kaggle.json"):
-            print("✓ 找到專案內的 kaggle.json")
-            os.environ["KAGGLE_CONFIG_DIR"] = os.path.abspath(".")
-
-        import kaggle
-
-        kaggle.api.dataset_download_files(
-            "atharvasoundankar/global-cybersecurity-threats-2015-2024",
-            path="data/",
-            unzip=True,
+def load_data(data_path):
+    """載入網路安全威脅資料集"""
+    print(f"✓ 找到資料檔案: {data_path}")
+
+    # 類別欄位轉 category、整數欄位縮減型別
+    # 來源檔案沒變時直接載入二進位快取
+    # DATA_CACHE_DIR 可設為 /dev/shm/... 讓多個 worker 共用記憶體
+    df = load_cached_csv(data_path,
+                         read_threats_csv,
+                         cache_dir=os.environ.get("DATA_CACHE_DIR",
+                                                  DEFAULT_CACHE_DIR))
+    print(f"✓ 成功載入 {len(df)} 筆資料")
+    print(f"資料欄位: {list(df.columns)}")
+    print(f"✓ 記憶體使用量: {memory_report(df)['total_mb']} MB")
+
+    return df
+
+
+def publish_snapshot(snap):
+    """替換目前的資料快照（單一賦值，進行中的請求仍使用舊快照）"""
+    global snapshot
+    snapshot = snap
+    response_cache.clear()
+    api_memo.clear()
+    compressor.clear()
+    if WARMUP_ENABLED and snap.rows:
+        warmer.schedule()
+
+
+def load_snapshot(data_paths):
+    """
+    載入資料集並建立快照
+
+    開始讀取前先記錄檔案狀態（snap.file_state），載入期間才附加的
+    資料列之後由資料監看讀取，不會被當作已經載入。
+    """
+    if isinstance(data_paths, str):
+        data_paths = [data_paths]
+    file_state = watcher.capture(data_paths)
+    snap = read_snapshot(data_paths)
+    snap.file_state = file_state
+    return snap
+
+
+def read_snapshot(data_paths):
+    """
+    讀取資料集並建立快照
+
+    data/ 內有多個 CSV 時每個檔案是一個分區，以 LOAD_WORKERS 個行程
+    平行載入後合併（見 partitions.py）。
+    檔案總大小大於 STREAMING_MIN_MB 時改為分批串流載入，只保留聚合結果；
+    DATA_ROW_STORE=1（預設）時另外把資料列寫成磁碟上的欄式快取。
+    DATA_BACKEND=sqlite 時資料列改存在 SQLite 資料庫（見 load_sqlite）。
+    """
+    if os.environ.get("DATA_BACKEND", "memory") == "sqlite":
+        return load_sqlite(data_paths)
+    size_mb = sum(os.path.getsize(p) for p in data_paths) / 1024 / 1024
+    streamed = size_mb >= float(os.environ.get("STREAMING_MIN_MB", 1024))
+    if len(data_paths) > 1:
+        return load_partitioned(data_paths, streamed)
+
+    data_path = data_paths[0]
+    if not streamed:
+        return DatasetSnapshot.build(load_data(data_path),
+                                     sources=[data_path])
+
+    print(f"✓ 資料檔案 {size_mb:.0f} MB，改用分批串流載入: {data_path}")
+    cache_path = None
+    if os.environ.get("DATA_ROW_STORE", "1") == "1":
+        cache_path = cache_path_for(
+            data_path, os.environ.get("DATA_CACHE_DIR", DEFAULT_CACHE_DIR))
+    df, cube, sketches = ingest_csv(
+        data_path,
+        cache_path,
+        chunk_rows=int(os.environ.get("INGEST_CHUNK_ROWS",
+                                      DEFAULT_CHUNK_ROWS)),
+    )
+    print(f"✓ 成功載入 {cube.total_rows} 筆資料（串流模式）")
+    return DatasetSnapshot.from_stream(df, cube, sketches,
+                                       sources=[data_path])
+
+
+def load_partitioned(data_paths, streamed):
+    """平行載入多個分區（每個 CSV 一個），合併聚合結果"""
+    print(f"✓ 找到 {len(data_paths)} 個資料檔案，平行載入"
+          + ("（串流模式）" if streamed else ""))
+    workers = int(os.environ.get("LOAD_WORKERS", 0)) or None
+    df, cube, sketches, partitions = load_partitions(
+        data_paths,
+        workers=workers,
+        streamed=streamed,
+        cache_dir=os.environ.get("DATA_CACHE_DIR", DEFAULT_CACHE_DIR),
+        chunk_rows=int(os.environ.get("INGEST_CHUNK_ROWS",
+                                      DEFAULT_CHUNK_ROWS)),
+        row_store=os.environ.get("DATA_ROW_STORE", "1") == "1",
+    )
+    print(f"✓ 成功載入 {cube.total_rows} 筆資料（{len(partitions)} 個分區）")
+    if streamed:
+        return DatasetSnapshot.from_stream(df, cube, sketches,
+                                           sources=data_paths,
+                                           partitions=partitions)
+    report = memory_report([p.frame for p in partitions])
+    print(f"✓ 記憶體使用量: {report['total_mb']} MB（memory-map）")
+    return DatasetSnapshot.build(df, sources=data_paths, cube=cube,
+                                 sketches=sketches, partitions=partitions)
+
+
+def load_sqlite(data_paths):
+    """
+    從 SQLite 資料庫（SQLITE_PATH）建立快照
+
+    來源檔案沒變時直接開啟資料庫，聚合結果也從資料庫讀取，
+    不必讀取 CSV；否則分批匯入 CSV 重建資料庫。
+    """
+    db_path = os.environ.get("SQLITE_PATH", DEFAULT_DB_PATH)
+    opened = SQLiteStore.open(data_paths, db_path)
+    if opened is None:
+        print(f"✓ 建立 SQLite 資料庫: {db_path}")
+        opened = SQLiteStore.build(
+            data_paths,
+            db_path,
+            chunk_rows=int(os.environ.get("INGEST_CHUNK_ROWS",
+                                          DEFAULT_CHUNK_ROWS)),
         )
-        print("✓ 成功從 Kaggle 下載資料集")
-        return True
-    except Exception as e:
-        print(f"! 無法從 Kaggle 下載: {e}")
-        return False
-
+    store, cube, sketches = opened
+    print(f"✓ 成功載入 {cube.total_rows} 筆資料（SQLite: {db_path}）")
+    return DatasetSnapshot.from_store(store, cube, sketches,
+                                      sources=data_paths)
+
+
+def publish_data(snap, paths=None):
+    """發布完整載入的資料集（聚合結果與列索引重新計算）"""
+    with snapshot_lock:
+        publish_snapshot(snap)
+    watcher.baseline(snap.sources, snap.file_state)
+
+
+def append_data(new_rows, path):
+    """
+    附加新資料：只計算新資料列的聚合結果再合併
+
+    新資料列先以分區的形式附加在快照上（不複製現有資料），
+    再由背景執行緒合併進 DataFrame 並重建列索引。
+    """
+    with snapshot_lock:
+        publish_snapshot(snapshot.append(new_rows, sources=[path]))
+    print(f"✓ 資料已更新: 共 {snapshot.rows} 筆（版本 {snapshot.version}）")
+    if snapshot.appended():
+        threading.Thread(target=compact_data, name="compact-data",
+                         daemon=True).start()
+
+
+# 同時只進行一次合併，連續附加時後面的執行緒直接合併最新的快照
+compact_lock = threading.Lock()
+
+
+def compact_data():
+    """把附加的資料列合併進快照（內容與版本不變，不清空快取）"""
+    global snapshot
+    with compact_lock:
+        snap = snapshot
+        compacted = snap.compact()
+        if compacted is snap:
+            return
+        with snapshot_lock:
+            # 合併期間有新的資料（或重新載入）時放棄，由下一次合併處理
+            if snapshot is snap:
+                snapshot = compacted
+
+
+def reload_data(paths):
+    """已載入的檔案被改寫時，重新讀取全部檔案"""
+    if not paths:
+        return
+    snap = load_snapshot(paths)
+    with snapshot_lock:
+        publish_snapshot(snap)
+
+
+# API 使用的資料都在快照裡：DataFrame、聚合立方體、列索引與版本
+# 每個請求開始時取一次 snapshot，整個請求都使用同一份資料
+snapshot = DatasetSnapshot.empty()
+# 只序列化「產生新快照」的動作，讀取不需要鎖
+snapshot_lock = threading.Lock()
+
+# 請求量測：最先註冊，耗時包含快取查詢、回應大小為壓縮後的大小
+# PROFILE_DIR 有設定時，帶 X-Profile: 1 標頭的請求會寫出 cProfile 結果
+instrumentation = Instrumentation(
+    app, profile_dir=os.environ.get("PROFILE_DIR") or None)
+
+# 回應壓縮（gzip / brotli），需在 ResponseCache 之前註冊，
+# after_request 會以相反順序執行，快取中保存的是未壓縮的內容
+compressor = Compressor(
+    app,
+    cache_entries=int(os.environ.get("COMPRESS_CACHE_MAX_ENTRIES", 256)),
+    cache_bytes=int(os.environ.get("COMPRESS_CACHE_MAX_MB", 64)) * 1024 * 1024,
+    version_getter=lambda: snapshot.version,
+)
+
+# /api 回應快取：ETag 由資料版本與參數決定
+response_cache = ResponseCache(
+    app,
+    version_getter=lambda: snapshot.version,
+    exclude={"/api/health", "/api/ready", "/api/memory_usage",
+             "/api/cache_stats"},
+    max_age=int(os.environ.get("API_CACHE_MAX_AGE", 60)),
+)
+
+# 帶參數 endpoint 的計算結果快取（筆數與記憶體皆有上限）
+api_memo = LRUCache(
+    max_entries=int(os.environ.get("API_MEMO_MAX_ENTRIES", 256)),
+    max_bytes=int(os.environ.get("API_MEMO_MAX_MB", 32)) * 1024 * 1024,
+)
+
+# 較重的計算交給大小固定的計算池，相同的計算同時只執行一次（見 serving.py）
+compute_pool = ComputePool(
+    workers=int(os.environ.get("COMPUTE_WORKERS", 0)) or None,
+    max_pending=int(os.environ.get("COMPUTE_MAX_PENDING", 64)),
+)
+
+
+def memo_compute(key, compute):
+    """先查 api_memo，沒有時在計算池中計算（相同的 key 合併）再存入"""
+    return api_memo.get_or_compute(key,
+                                   lambda: compute_pool.run(key, compute))
+
+
+def busy_response(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+
+
+instrumentation.caches.update({
+    "response_cache": response_cache,
+    "api_memo": api_memo,
+    "compression": compressor,
+})
+
+# 資料載入後在背景預熱常用的請求，/api/ready 在完成前回傳 503
+WARMUP_ENABLED = os.environ.get("WARMUP", "1") == "1"
+
+
+def warmup_paths():
+    """預熱清單：不帶參數的 endpoint，加上事件數最多的幾個國家"""
+    snap = snapshot
+    paths = list(WARMUP_PATHS)
+    if snap.cube.has("Country"):
+        top = snap.cube.counts("Country").nlargest(
+            int(os.environ.get("WARMUP_TOP_COUNTRIES", 5))).index
+        paths += [
+            template.format(quote(str(country)))
+            for country in top for template in COUNTRY_PATHS
+        ]
+    return paths
 
-def load_data():
-    """載入網路安全威脅資料集"""
-    if download_kaggle_dataset():
-        data_dir = "data"
-        csv_files = [f for f in os.listdir(data_dir) if f.endswith(".csv")]
-        if csv_files:
-            data_path = os.path.join(data_dir, csv_files[0])
-            print(f"✓ 找到資料檔案: {data_path}")
 
-            df = pd.read_csv(data_path)
-            print(f"✓ 成功載入 {len(df)} 筆資料")
-            print(f"資料欄位: {list(df.columns)}")
+warmer = CacheWarmer(
+    app,
+    version_getter=lambda: snapshot.version,
+    paths_getter=warmup_paths,
+    workers=int(os.environ.get("WARMUP_WORKERS", 4)),
+)
 
-            # 資料前處理
-            if "Year" in df.columns:
-                df["Year"] = pd.to_numeric(df["Year"], errors="coerce")
+# 監看 data/：附加的資料列或新的 CSV 檔案不必重新啟動即可載入
+watcher = DataWatcher(
+    "data",
+    on_append=append_data,
+    on_reset=reload_data,
+    interval=float(os.environ.get("DATA_WATCH_INTERVAL", 5)),
+)
 
-            return df
-    return pd.DataFrame()
+# 載入資料：優先使用 data/ 內的檔案，Kaggle 下載只在背景進行
+bootstrap = DatasetBootstrap(
+    LocalFileProvider("data"),
+    KaggleProvider("data"),
+    loader=load_snapshot,
+    on_load=publish_data,
+    remote_refresh=os.environ.get("DATASET_REMOTE_REFRESH") == "1",
+)
 
 
-# 載入資料
-df_global = load_data()
+@app.context_processor
+def inject_static_bundle():
+    """靜態匯出時（export_static.py）頁面改從預先產生的檔案讀取 /api 資料"""
+    return {"static_bundle": app.config.get("STATIC_BUNDLE")}
 
 
 @app.route("/")
@@ -96,69 +353,102 @@ def advanced():
     return render_template("advanced.html")
 
 
+def country_year_matrix(cube, loss_col):
+    """
+    國家 × 年份的損失總和矩陣（一次從聚合表展開）
+
+    Returns:
+        (countries, years, matrix)：matrix[i, j] 為 countries[i] 在
+        years[j] 的損失，沒有資料的組合為 NaN。國家依第一次出現的年份、
+        再依國家名稱排序（與逐年列出的順序相同）。
+    """
+    table = cube.frame(['Country', 'Year'])
+    counts = table[stat_column(loss_col, 'count')].unstack('Year')
+    sums = table[stat_column(loss_col, 'sum')].unstack('Year')
+    # 只保留有損失數值的組合（等同 dropna）
+    present = counts.fillna(0).to_numpy() > 0
+    matrix = np.where(present, sums.to_numpy(dtype="float64"), np.nan)
+
+    years = np.asarray(sums.columns).astype(int)
+    year_order = np.argsort(years, kind="stable")
+    years, matrix, present = (years[year_order], matrix[:, year_order],
+                              present[:, year_order])
+
+    keep = present.any(axis=1)
+    countries = np.asarray(sums.index.astype(str))[keep]
+    matrix, present = matrix[keep], present[keep]
+    order = np.lexsort((countries, present.argmax(axis=1)))
+    return countries[order].tolist(), years.tolist(), matrix[order]
+
+
 @app.route("/api/map_data")
 def get_map_data():
-    """地圖：各國網路攻擊事件數量（返回原始資料）"""
+    """
+    地圖：各國每年的損失總和
+
+    預設依年份回傳 data_by_year；format=columnar 時改為
+    countries（國家清單）加上 losses（每年一個與 countries 對齊的陣列，
+    沒有資料為 null），不重複國家名稱，回應小得多。
+    """
     try:
-        df = df_global.copy()
+        snap = snapshot
+        loss_col = 'Financial Loss (in Million $)'
+        columnar = request.args.get('format') == 'columnar'
 
-        required_cols = ['Country', 'Year', 'Financial Loss (in Million $)']
+        required_cols = ['Country', 'Year', loss_col]
         for col in required_cols:
-            if col not in df.columns:
+            if col not in snap.df.columns:
                 return jsonify({"error":
                                 f"Required column '{col}' not found"}), 400
 
-        df_clean = df.dropna(subset=required_cols)
+        with stage("aggregate"):
+            countries, years, matrix = country_year_matrix(
+                snap.cube, loss_col)
+            totals = np.nansum(matrix, axis=1)
 
-        country_year_loss = df_clean.groupby(
-            ['Country',
-             'Year'])['Financial Loss (in Million $)'].sum().reset_index()
-        country_year_loss.columns = ['Country', 'Year', 'Loss']
+        if not countries:
+            return jsonify({"error": "No loss data available"}), 400
 
-        country_year_loss['Year'] = country_year_loss['Year'].astype(int)
-        country_year_loss = country_year_loss.sort_values(['Year', 'Country'])
-
-        # 計算每個國家的總損失（用於排序）
-        total_loss_by_country = df_clean.groupby(
-            'Country')['Financial Loss (in Million $)'].sum().reset_index()
-        total_loss_by_country.columns = ['Country', 'TotalLoss']
+        # 全局統計資訊（國家總損失由矩陣逐列加總）
+        top = int(np.argmax(totals))
+        statistics = {
+            'total_loss': float(totals.sum()),
+            'avg_loss_per_country': float(totals.mean()),
+            'max_loss_country': countries[top],
+            'max_loss_value': float(totals[top]),
+            'year_range': f"{years[0]} - {years[-1]}",
+            'total_countries': len(countries)
+        }
 
-        # 取得所有年份和國家
-        all_years = sorted(country_year_loss['Year'].unique().tolist())
-        all_countries = country_year_loss['Country'].unique().tolist()
+        if columnar:
+            return jsonify({
+                'format': 'columnar',
+                'years': years,
+                'countries': countries,
+                'losses': [
+                    np.where(np.isnan(matrix[:, j]), None,
+                             matrix[:, j]).tolist()
+                    for j in range(len(years))
+                ],
+                'statistics': statistics
+            })
 
-        # 為每個年份準備資料
+        names = np.asarray(countries, dtype=object)
         data_by_year = {}
-        for year in all_years:
-            year_data = country_year_loss[country_year_loss['Year'] == year]
+        for j, year in enumerate(years):
+            column = matrix[:, j]
+            mask = ~np.isnan(column)
+            # 同一年內依國家名稱排序
+            order = np.argsort(names[mask], kind="stable")
             data_by_year[str(year)] = {
-                'countries': year_data['Country'].tolist(),
-                'losses': year_data['Loss'].tolist()
+                'countries': names[mask][order].tolist(),
+                'losses': column[mask][order].tolist()
             }
 
-        # 計算全局統計資訊
-        statistics = {
-            'total_loss':
-            float(df_clean['Financial Loss (in Million $)'].sum()),
-            'avg_loss_per_country':
-            float(total_loss_by_country['TotalLoss'].mean()),
-            'max_loss_country':
-            total_loss_by_country.nlargest(1,
-                                           'TotalLoss')['Country'].values[0],
-            'max_loss_value':
-            float(
-                total_loss_by_country.nlargest(
-                    1, 'TotalLoss')['TotalLoss'].values[0]),
-            'year_range':
-            f"{min(all_years)} - {max(all_years)}",
-            'total_countries':
-            len(all_countries)
-        }
-
         return jsonify({
-            'years': all_years,
+            'years': years,
             'data_by_year': data_by_year,
-            'all_countries': all_countries,
+            'all_countries': countries,
             'statistics': statistics
         })
     except Exception as e:
@@ -172,13 +462,13 @@ def get_map_data():
 def get_industry_analysis():
     """長條圖：產業類型分析（攻擊次數或財務損失）"""
     try:
-        df = df_global.copy()
+        snap = snapshot
         chart_type = request.args.get("type", "count")
 
         if chart_type == "count":
             # 按產業統計攻擊次數
-            industry_counts = df["Target Industry"].value_counts().reset_index(
-            )
+            industry_counts = snap.cube.counts("Target Industry").sort_values(
+                ascending=False, kind="stable").reset_index()
             industry_counts.columns = ["Industry", "Count"]
 
             return jsonify({
@@ -188,9 +478,9 @@ def get_industry_analysis():
             })
         else:  # loss
             # 按產業統計財務損失
-            industry_loss = (
-                df.groupby("Target Industry")
-                ["Financial Loss (in Million $)"].sum().reset_index())
+            industry_loss = snap.cube.sum(
+                "Financial Loss (in Million $)", "Target Industry").rename(
+                    "Financial Loss (in Million $)").reset_index()
             industry_loss = industry_loss.sort_values(
                 "Financial Loss (in Million $)", ascending=True)
 
@@ -211,170 +501,195 @@ def get_industry_analysis():
 def get_countries():
     """取得所有可用的國家列表"""
     try:
-        df = df_global.copy()
-        countries = sorted(df["Country"].unique().tolist())
+        snap = snapshot
+        countries = sorted(snap.cube.counts("Country").index.tolist())
         return jsonify({"countries": countries})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# /api/top_ips 的 top_n 上限；不大於預先排序的筆數（DEFAULT_TOP_K）時
+# 直接切出前 N 筆，否則改從資料列排序
+TOP_N_MAX = int(os.environ.get("TOP_N_MAX", DEFAULT_TOP_K))
+
+
+def top_ips_payload(snap, country, top_n):
+    """計算 /api/top_ips 的回應內容"""
+    users = "Number of Affected Users"
+    with stage("aggregate"):
+        if not snap.rows:
+            totals = None
+        elif country == "all":
+            totals = snap.cube.totals()
+        else:
+            totals = snap.cube.frame([], where={"Country": country}).iloc[0]
+
+    if totals is None or not totals["rows"]:
+        return {
+            "labels": [],
+            "values": [],
+            "countries": [],
+            "attack_types": [],
+            "statistics": {
+                "total_events": 0,
+                "total_users": 0,
+                "avg_impact": 0,
+            },
+            "country": country,
+            "top_n": top_n,
+        }
+
+    top = snap.sketches.top
+    if top_n <= top.k:
+        with stage("aggregate"):
+            top_incidents = top.top(top_n,
+                                    None if country == "all" else country)
+    else:
+        # 只讀取排序後的前 top_n 筆（SQLite 後端由資料庫排序）
+        filters = ({} if country == "all" else
+                   {"Country": Filter("Country", values=[country])})
+        with stage("filter"):
+            top_incidents, _ = snap.store.select(
+                ["Country", "Attack Type", users], filters,
+                order_by=users, limit=top_n)
+
+    count = totals[stat_column(users, "count")]
+    statistics = {
+        "total_events": int(totals["rows"]),
+        "total_users": int(totals[stat_column(users, "sum")]),
+        "avg_impact": (float(totals[stat_column(users, "sum")] / count)
+                       if count else None),
+    }
+
+    return {
+        "labels": (top_incidents["Country"].astype(str) + " - " +
+                   top_incidents["Attack Type"].astype(str)).tolist(),
+        "values": top_incidents[users].tolist(),
+        "countries": top_incidents["Country"].tolist(),
+        "attack_types": top_incidents["Attack Type"].tolist(),
+        "statistics": statistics,
+        "country": country,
+        "top_n": top_n,
+    }
+
+
 @app.route("/api/top_ips")
 def get_top_ips():
     """長條圖：TOP N 受影響使用者最多的事件（支援國家篩選）"""
     try:
-        df = df_global.copy()
-
+        snap = snapshot
         country = request.args.get("country", "all")
-        top_n = int(request.args.get("top_n", 10))
+        top_n = min(max(int(request.args.get("top_n", 10)), 1), TOP_N_MAX)
+
+        result = memo_compute(
+            ("top_ips", snap.version, country, top_n),
+            lambda: top_ips_payload(snap, country, top_n))
+        return jsonify(result)
+    except PoolBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        if country != "all":
-            df = df[df["Country"] == country]
 
-        if df.empty:
-            return jsonify({
-                "labels": [],
-                "values": [],
-                "countries": [],
-                "attack_types": [],
-                "statistics": {
-                    "total_events": 0,
-                    "total_users": 0,
-                    "avg_impact": 0,
-                },
-                "country": country,
-                "top_n": top_n,
-            })
+def time_series_payload(cube, country, countries, mode):
+    """計算 /api/time_series 的回應內容"""
+    if mode == "compare" and countries:
+        # 多國比較模式
+        result = {"mode": "compare", "countries": [], "series": []}
+
+        for country_name in countries[:5]:
+            yearly_counts = cube.counts("Year",
+                                        where={
+                                            "Country": country_name
+                                        }).reset_index(name="Count")
+            if not yearly_counts.empty:
+                result["series"].append({
+                    "country": country_name,
+                    "years": yearly_counts["Year"].tolist(),
+                    "counts": yearly_counts["Count"].tolist(),
+                })
 
-        top_incidents = df.nlargest(top_n, "Number of Affected Users")[[
-            "Country", "Attack Type", "Number of Affected Users"
-        ]]
+        return result
 
-        statistics = {
-            "total_events": len(df),
-            "total_users": int(df["Number of Affected Users"].sum()),
-            "avg_impact": float(df["Number of Affected Users"].mean()),
+    # 單一國家或全球模式（加上財務損失）
+    where = {"Country": country} if country != "all" else None
+    yearly_table = cube.frame(["Year"], where)
+
+    if yearly_table.empty:
+        return {
+            "mode": "single",
+            "country": country,
+            "years": [],
+            "counts": [],
+            "losses": [],
+            "statistics": {},
         }
 
-        return jsonify({
-            "labels": (top_incidents["Country"] + " - " +
-                       top_incidents["Attack Type"]).tolist(),
-            "values":
-            top_incidents["Number of Affected Users"].tolist(),
-            "countries":
-            top_incidents["Country"].tolist(),
-            "attack_types":
-            top_incidents["Attack Type"].tolist(),
-            "statistics":
-            statistics,
-            "country":
-            country,
-            "top_n":
-            top_n,
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    # 計算每年的攻擊次數和財務損失
+    yearly_stats = yearly_table[[
+        "rows", stat_column("Financial Loss (in Million $)", "sum")
+    ]].reset_index()
+    yearly_stats.columns = ["Year", "Count", "Loss"]
+
+    # 計算統計數據
+    total = yearly_stats["Count"].sum()
+    average = yearly_stats["Count"].mean()
+    total_loss = yearly_stats["Loss"].sum()
+    avg_loss = yearly_stats["Loss"].mean()
+
+    # 計算趨勢（首尾年份增長率）
+    if len(yearly_stats) >= 2:
+        first_year_count = yearly_stats.iloc[0]["Count"]
+        last_year_count = yearly_stats.iloc[-1]["Count"]
+        trend = (((last_year_count - first_year_count) / first_year_count) *
+                 100 if first_year_count > 0 else 0)
+
+        first_year_loss = yearly_stats.iloc[0]["Loss"]
+        last_year_loss = yearly_stats.iloc[-1]["Loss"]
+        loss_trend = (((last_year_loss - first_year_loss) / first_year_loss) *
+                      100 if first_year_loss > 0 else 0)
+    else:
+        trend = 0
+        loss_trend = 0
+
+    statistics = {
+        "total": int(total),
+        "average": float(average),
+        "trend": float(trend),
+        "total_loss": float(total_loss),
+        "avg_loss": float(avg_loss),
+        "loss_trend": float(loss_trend),
+    }
+
+    return {
+        "mode": "single",
+        "country": country,
+        "years": yearly_stats["Year"].tolist(),
+        "counts": yearly_stats["Count"].tolist(),
+        "losses": yearly_stats["Loss"].tolist(),
+        "statistics": statistics,
+    }
 
 
 @app.route("/api/time_series")
 def get_time_series():
     """折線圖：年度攻擊趨勢（支援單一國家或多國比較，包含財務損失）"""
     try:
-        df = df_global.copy()
-
+        snap = snapshot
         country = request.args.get("country", "all")
         countries_param = request.args.get("countries", "")
         mode = request.args.get("mode", "single")
+        countries = tuple(
+            c.strip() for c in countries_param.split(",") if c.strip())
 
-        if mode == "compare" and countries_param:
-            # 多國比較模式
-            countries = [
-                c.strip() for c in countries_param.split(",") if c.strip()
-            ]
-
-            result = {"mode": "compare", "countries": [], "series": []}
-
-            for country_name in countries[:5]:
-                country_df = df[df["Country"] == country_name]
-                if not country_df.empty:
-                    yearly_counts = (
-                        country_df.groupby("Year").size().reset_index(
-                            name="Count"))
-                    result["series"].append({
-                        "country":
-                        country_name,
-                        "years":
-                        yearly_counts["Year"].tolist(),
-                        "counts":
-                        yearly_counts["Count"].tolist(),
-                    })
-
-            return jsonify(result)
-
-        else:
-            # 單一國家或全球模式（加上財務損失）
-            if country != "all":
-                df = df[df["Country"] == country]
-
-            if df.empty:
-                return jsonify({
-                    "mode": "single",
-                    "country": country,
-                    "years": [],
-                    "counts": [],
-                    "losses": [],
-                    "statistics": {},
-                })
-
-            # 計算每年的攻擊次數和財務損失
-            yearly_stats = (df.groupby("Year").agg({
-                "Country":
-                "count",
-                "Financial Loss (in Million $)":
-                "sum"
-            }).reset_index())
-            yearly_stats.columns = ["Year", "Count", "Loss"]
-
-            # 計算統計數據
-            total = yearly_stats["Count"].sum()
-            average = yearly_stats["Count"].mean()
-            total_loss = yearly_stats["Loss"].sum()
-            avg_loss = yearly_stats["Loss"].mean()
-
-            # 計算趨勢（首尾年份增長率）
-            if len(yearly_stats) >= 2:
-                first_year_count = yearly_stats.iloc[0]["Count"]
-                last_year_count = yearly_stats.iloc[-1]["Count"]
-                trend = ((
-                    (last_year_count - first_year_count) / first_year_count) *
-                         100 if first_year_count > 0 else 0)
-
-                first_year_loss = yearly_stats.iloc[0]["Loss"]
-                last_year_loss = yearly_stats.iloc[-1]["Loss"]
-                loss_trend = ((
-                    (last_year_loss - first_year_loss) / first_year_loss) *
-                              100 if first_year_loss > 0 else 0)
-            else:
-                trend = 0
-                loss_trend = 0
-
-            statistics = {
-                "total": int(total),
-                "average": float(average),
-                "trend": float(trend),
-                "total_loss": float(total_loss),
-                "avg_loss": float(avg_loss),
-                "loss_trend": float(loss_trend),
-            }
-
-            return jsonify({
-                "mode": "single",
-                "country": country,
-                "years": yearly_stats["Year"].tolist(),
-                "counts": yearly_stats["Count"].tolist(),
-                "losses": yearly_stats["Loss"].tolist(),
-                "statistics": statistics,
-            })
+        cube = snap.cube
+        result = memo_compute(
+            ("time_series", snap.version, country, countries, mode),
+            lambda: time_series_payload(cube, country, countries, mode))
+        return jsonify(result)
 
+    except PoolBusyError as e:
+        return busy_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -383,13 +698,13 @@ def get_time_series():
 def get_attack_types():
     """圓餅圖：攻擊類型分布"""
     try:
-        df = df_global.copy()
-
+        snap = snapshot
         country = request.args.get("country", "all")
-        if country != "all":
-            df = df[df["Country"] == country]
+        where = {"Country": country} if country != "all" else None
 
-        attack_counts = df["Attack Type"].value_counts().reset_index()
+        attack_counts = snap.cube.counts(
+            "Attack Type", where=where).sort_values(ascending=False,
+                                                    kind="stable").reset_index()
         attack_counts.columns = ["Attack_Type", "Count"]
 
         return jsonify({
@@ -405,18 +720,18 @@ def get_attack_types():
 def get_heatmap():
     """熱力圖：平均財務損失 by 目標產業 & 攻擊類型"""
     try:
-        df = df_global.copy()
+        snap = snapshot
+        loss_col = 'Financial Loss (in Million $)'
 
-        required_cols = [
-            'Target Industry', 'Attack Type', 'Financial Loss (in Million $)'
-        ]
+        required_cols = ['Target Industry', 'Attack Type', loss_col]
         for col in required_cols:
-            if col not in df.columns:
+            if col not in snap.df.columns:
                 return jsonify({'error': f'Missing column: {col}'}), 400
 
-        df_clean = df.dropna(subset=required_cols)
+        avg_loss = snap.cube.mean(loss_col, 'Target Industry',
+                                    'Attack Type').dropna()
 
-        if df_clean.empty:
+        if avg_loss.empty:
             return jsonify({
                 'industries': [],
                 'attack_types': [],
@@ -424,9 +739,7 @@ def get_heatmap():
                 'statistics': {}
             })
 
-        heatmap_df = df_clean.groupby([
-            'Target Industry', 'Attack Type'
-        ])['Financial Loss (in Million $)'].mean().reset_index()
+        heatmap_df = avg_loss.reset_index()
         heatmap_df.columns = ['Industry', 'Attack', 'AvgLoss']
 
         # 使用 pivot_table 轉換為矩陣格式
@@ -485,66 +798,74 @@ def get_heatmap():
         return jsonify({'error': str(e)}), 500
 
 
+def level_counts(snap, levels):
+    """各層（前 1..n 個欄位）的事件數，聚合立方體沒有的組合改從資料列計算"""
+    counts = []
+    for depth in range(1, len(levels) + 1):
+        dims = levels[:depth]
+        if snap.cube.has(*dims):
+            counts.append(snap.cube.counts(*dims))
+        else:
+            with stage("groupby"):
+                counts.append(snap.store.group_counts(dims))
+    return counts
+
+
 @app.route("/api/treemap")
 def get_treemap():
-    """Treemap：目標產業與攻擊類型分布"""
-    try:
-        df = df_global.copy()
-        
-        labels = []
-        parents = []
-        values = []
-        
-        # 第一層：產業統計
-        industry_counts = df.groupby("Target Industry").size().reset_index(name="Count")
-        industry_counts = industry_counts[industry_counts["Count"] > 5]
-        
-        valid_industries = set(industry_counts["Target Industry"].tolist())
-        
-        # 收集產業數據
-        industry_values = []
-        for _, row in industry_counts.iterrows():
-            labels.append(row["Target Industry"])
-            parents.append("All Industries")
-            values.append(int(row["Count"]))
-            industry_values.append(int(row["Count"]))
-        
-        # 第二層：產業下的攻擊類型
-        industry_attack = df.groupby(["Target Industry", "Attack Type"]).size().reset_index(name="Count")
-        industry_attack = industry_attack[industry_attack["Count"] > 5]
-        
-        industry_acronyms = {
-            "IT": "IT",
-            "Healthcare": "HC",
-            "Education": "EDU",
-            "Government": "GOV",
-            "Banking": "BANK",
-            "Retail": "RET",
-            "Telecommunications": "TEL",
-        }
+    """
+    Treemap：目標產業與攻擊類型分布
 
-        for _, row in industry_attack.iterrows():
-            industry = str(row["Target Industry"]).strip()
-            attack = str(row["Attack Type"]).strip()
-            
-            if industry in valid_industries:
-                label = f"{industry_acronyms.get(industry)} - {attack}"
-                labels.append(label)
-                parents.append(industry)
-                values.append(int(row["Count"]))
-
-        
-        # 添加根節點
-        labels.insert(0, "All Industries")
-        parents.insert(0, "")
-        values.insert(0, sum(industry_values))
-        
-        return jsonify({
-            "labels": labels,
-            "parents": parents,
-            "values": values
-        })
-        
+    levels 可指定任意層（逗號分隔，例如
+    "Target Industry,Attack Type,Attack Source"），
+    min_count 為節點顯示的最少事件數。
+    """
+    try:
+        snap = snapshot
+        levels = [
+            level.strip() for level in request.args.get(
+                "levels", ",".join(DEFAULT_LEVELS)).split(",")
+            if level.strip()
+        ]
+        try:
+            min_count = int(request.args.get("min_count", 6))
+        except ValueError:
+            return jsonify({"error": f"'{request.args['min_count']}' "
+                                     "is not a number for 'min_count'"}), 400
+
+        if not levels or len(levels) > MAX_DEPTH:
+            return jsonify({"error":
+                            f"levels must have 1 to {MAX_DEPTH} columns"}), 400
+        if len(set(levels)) != len(levels):
+            return jsonify({"error": "levels must not repeat"}), 400
+        for level in levels:
+            if level not in snap.df.columns:
+                return jsonify({"error":
+                                f"Column '{level}' not found"}), 400
+        # 聚合立方體沒有的組合需要資料列
+        if not snap.has_rows and not snap.cube.has(*levels):
+            return jsonify({
+                "error": "Raw data is not available for streamed datasets, "
+                         f"use at most {snap.cube.max_depth} levels",
+            }), 400
+
+        root = ("All Industries" if levels[0] == "Target Industry" else
+                f"All {levels[0]}")
+
+        def compute():
+            counts = level_counts(snap, levels)
+            with stage("aggregate"):
+                result = build_treemap(counts, min_count=min_count,
+                                       root=root)
+            result["levels"] = levels
+            return result
+
+        return jsonify(
+            memo_compute(("treemap", snap.version, tuple(levels), min_count),
+                         compute))
+
+    except PoolBusyError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Treemap API Error: {e}")
         import traceback
@@ -556,11 +877,11 @@ def get_treemap():
 def get_severity_by_type():
     """攻擊類型與安全漏洞分析"""
     try:
-        df = df_global.copy()
-
+        snap = snapshot
         # 統計攻擊類型與安全漏洞類型
-        vuln_data = (df.groupby(["Attack Type", "Security Vulnerability Type"
-                                 ]).size().reset_index(name="Count"))
+        vuln_data = (snap.cube.counts(
+            "Attack Type",
+            "Security Vulnerability Type").reset_index(name="Count"))
         vuln_data = vuln_data.nlargest(30, "Count")
 
         # 取得所有唯一的攻擊類型和漏洞類型
@@ -590,15 +911,12 @@ def get_severity_by_type():
 def get_yearly_trend():
     """年度攻擊趨勢與財務損失"""
     try:
-        df = df_global.copy()
-
+        snap = snapshot
         # 按年份統計事件數和財務損失
-        yearly_stats = (df.groupby("Year").agg({
-            "Country":
-            "count",
-            "Financial Loss (in Million $)":
-            "sum"
-        }).reset_index())
+        yearly_stats = snap.cube.frame(["Year"])[[
+            "rows",
+            stat_column("Financial Loss (in Million $)", "sum")
+        ]].reset_index()
         yearly_stats.columns = ["Year", "Count", "Loss"]
 
         return jsonify({
@@ -614,21 +932,24 @@ def get_yearly_trend():
 def get_statistics():
     """統計資料"""
     try:
-        df = df_global.copy()
+        snap = snapshot
+        attack_counts = snap.cube.counts("Attack Type")
+        industry_counts = snap.cube.counts("Target Industry")
+        years = snap.cube.counts("Year").index
 
         stats = {
             "total_attacks":
-            int(df.shape[0]),
+            int(snap.cube.total_rows),
             "unique_countries":
-            int(df["Country"].nunique()),
+            len(snap.cube.counts("Country")),
             "attack_types":
-            int(df["Attack Type"].nunique()),
+            len(attack_counts),
             "date_range":
-            f"{int(df['Year'].min())} ~ {int(df['Year'].max())}",
+            f"{int(years.min())} ~ {int(years.max())}",
             "most_common_attack":
-            (df["Attack Type"].mode()[0] if not df.empty else "N/A"),
+            (attack_counts.idxmax() if not attack_counts.empty else "N/A"),
             "most_targeted_port":
-            (df["Target Industry"].mode()[0] if not df.empty else "N/A"),
+            (industry_counts.idxmax() if not industry_counts.empty else "N/A"),
         }
 
         return jsonify(stats)
@@ -636,11 +957,120 @@ def get_statistics():
         return jsonify({"error": str(e)}), 500
 
 
+def defense_summary_payload(snap, precision, filters, max_outliers):
+    """
+    計算 /api/defense_resolution?mode=summary 的回應內容
+
+    precision=approx 時使用 KLL 摘要，不論資料量多大都是固定成本；
+    exact 時以資料列計算（串流載入時改用精確的直方圖）。
+    """
+    defense_col = "Defense Mechanism Used"
+    resolution_col = "Incident Resolution Time (in Hours)"
+
+    if precision == "approx" or snap.streamed:
+        statistics = {
+            method: sketch.summary(max_outliers=max_outliers)
+            for method, sketch in snap.sketches.lookup(precision,
+                                                       filters).items()
+        }
+    else:
+        with stage("filter"):
+            # Country 使用列索引，Year 只讀取有該年份資料的分區
+            df, _ = snap.store.select(
+                [resolution_col, defense_col], {
+                    column: Filter(column, values=[value])
+                    for column, value in filters.items()
+                })
+        with stage("aggregate"):
+            statistics = box_summary(df[resolution_col],
+                                     df[defense_col],
+                                     max_outliers=max_outliers)
+        # 與摘要（SketchSet.lookup）相同，依防禦方法排序
+        statistics = dict(sorted(statistics.items()))
+
+    result = {
+        "mode": "summary",
+        "precision": precision,
+        "filters": filters,
+        "defense_methods": list(statistics),
+        "statistics": statistics,
+    }
+    if precision == "approx":
+        # 分位數的排名誤差（例如 0.013 表示中位數落在真實排名 50% ± 1.3%）
+        result["rank_error"] = kll_rank_error(snap.sketches.k)
+    return result
+
+
+def defense_raw_payload(snap, defense_col, resolution_col):
+    """每種防禦方法的原始解決時間與統計（/api/defense_resolution）"""
+    # df 與各自保存資料列的分區（多個 CSV、附加的資料），各有自己的列索引
+    sources = [(snap.df, snap.index)] + [
+        (p.frame, p.index) for p in snap.appended()
+    ]
+    sources = [(rows[resolution_col], index) for rows, index in sources
+               if len(rows)]
+
+    # 獲取所有防禦方法（依出現順序）
+    defense_methods = []
+    for _, row_index in sources:
+        defense_methods += [
+            method for method in row_index.values(defense_col)
+            if method not in defense_methods
+        ]
+
+    # 為每種防禦方法準備盒鬚圖數據
+    resolution_data = {}
+    statistics = {}
+
+    for method in defense_methods:
+        # 用列索引取出該方法的資料，並移除空值
+        with stage("filter"):
+            parts = [
+                resolution.iloc[row_index.positions(defense_col, method)]
+                for resolution, row_index in sources
+            ]
+            if len(parts) > 1:
+                parts = [concat_frames([
+                    part.to_frame() for part in parts])[resolution_col]]
+            method_data = parts[0].dropna()
+
+        if len(method_data) > 0:
+            # 直接交給序列化器編碼 numpy 陣列，不必先轉成 list
+            resolution_data[method] = method_data.to_numpy()
+
+            # 計算統計數據 - 確保針對每個方法單獨計算
+            statistics[method] = {
+                "count": len(method_data),
+                "mean": float(method_data.mean()),
+                "median": float(method_data.median()),
+                "q1": float(method_data.quantile(0.25)),
+                "q3": float(method_data.quantile(0.75)),
+                "min": float(method_data.min()),  # 這應該是該方法的實際最小值
+                "max": float(method_data.max()),  # 這應該是該方法的實際最大值
+                "std": float(method_data.std()),
+            }
+
+    return {
+        "defense_methods": list(resolution_data),
+        "resolution_data": resolution_data,
+        "statistics": statistics,
+    }
+
+
 @app.route("/api/defense_resolution")
 def get_defense_resolution():
-    """盒鬚圖：防禦方法與事件解決時間比較"""
+    """
+    盒鬚圖：防禦方法與事件解決時間比較
+
+    mode=summary 時只回傳盒鬚圖統計（含鬚線與取樣後的離群值），
+    可用 country / year 篩選，precision=approx 時使用分位數摘要；
+    否則回傳每筆原始資料；stream=1 時以串流輸出。
+    """
     try:
-        df = df_global.copy()
+        snap = snapshot
+        df = snap.df
+        mode = request.args.get("mode", "raw")
+        stream = request.args.get("stream") == "1"
 
         # 使用正確的欄位名稱
         defense_col = "Defense Mechanism Used"
@@ -656,51 +1086,157 @@ def get_defense_resolution():
                 400,
             )
 
-        # 移除空值
-        df_clean = df.dropna(subset=[defense_col, resolution_col])
-
-        if df_clean.empty:
+        if mode == "summary":
+            try:
+                max_outliers = min(
+                    max(int(request.args.get("max_outliers", 100)), 0), 1000)
+            except ValueError:
+                return jsonify({"error": f"'{request.args['max_outliers']}' "
+                                         "is not a number for "
+                                         "'max_outliers'"}), 400
+            precision = request.args.get("precision", "exact")
+            if precision not in ("exact", "approx"):
+                return jsonify({"error":
+                                "precision must be 'exact' or 'approx'"}), 400
+
+            filters = {}
+            if request.args.get("country", "all") != "all":
+                filters["Country"] = request.args["country"]
+            if request.args.get("year"):
+                try:
+                    filters["Year"] = int(request.args["year"])
+                except ValueError:
+                    return jsonify({"error": f"'{request.args['year']}' "
+                                             "is not a number for 'year'"}), 400
+
+            return jsonify(
+                defense_summary_payload(snap, precision, filters,
+                                        max_outliers))
+
+        # 串流載入（或 SQLite 後端）沒有列索引，無法取出原始資料
+        if not snap.index.has(defense_col):
             return jsonify({
-                "defense_methods": [],
-                "resolution_data": {},
-                "statistics": {}
-            })
+                "error": "Raw data is not available for streamed datasets, "
+                         "use mode=summary",
+            }), 400
+        # 原始資料很大，不存入 api_memo，只在計算池中合併相同的請求
+        result = compute_pool.run(
+            ("defense_raw", snap.version),
+            lambda: defense_raw_payload(snap, defense_col, resolution_col))
+        if stream:
+            return stream_json(result)
+        return jsonify(result)
+
+    except PoolBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        # 獲取所有防禦方法
-        defense_methods = df_clean[defense_col].unique().tolist()
 
-        # 為每種防禦方法準備盒鬚圖數據
-        resolution_data = {}
-        statistics = {}
+@app.route("/api/query", methods=["GET", "POST"])
+def get_query():
+    """
+    通用查詢：group_by、篩選、metrics、order、limit（格式見 query.py）
 
-        for method in defense_methods:
-            method_data = df_clean[df_clean[defense_col] ==
-                                   method][resolution_col]
+    例如 /api/query?group_by=Country&Year=2018..2020
+         &metrics=count,mean(Financial Loss (in Million $))&order=-count
+    """
+    try:
+        snap = snapshot
+        params = (request.args if request.method == "GET" else
+                  request.get_json(silent=True))
+        try:
+            query = parse_query(snap.df, params)
+            # 資料列沒有保存時，聚合立方體無法回答的查詢也回傳 400
+            result = memo_compute(("query", snap.version, query.key()),
+                                  lambda: execute_query(query, snap))
+        except QueryError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(result)
+    except PoolBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            if len(method_data) > 0:
-                resolution_data[method] = method_data.tolist()
 
-                # 計算統計數據 - 確保針對每個方法單獨計算
-                statistics[method] = {
-                    "count": len(method_data),
-                    "mean": float(method_data.mean()),
-                    "median": float(method_data.median()),
-                    "q1": float(method_data.quantile(0.25)),
-                    "q3": float(method_data.quantile(0.75)),
-                    "min": float(method_data.min()),  # 這應該是該方法的實際最小值
-                    "max": float(method_data.max()),  # 這應該是該方法的實際最大值
-                    "std": float(method_data.std()),
-                }
+@app.route("/api/batch", methods=["POST"])
+def post_batch():
+    """批次 API：一次執行多個 /api 查詢，減少頁面載入的往返次數"""
+    try:
+        queries = parse_queries(request.get_json(silent=True))
+    except BatchError as e:
+        return jsonify({"error": str(e)}), 400
 
-        return jsonify({
-            "defense_methods": defense_methods,
-            "resolution_data": resolution_data,
-            "statistics": statistics,
-        })
+    try:
+        return app.response_class(run_batch(app, queries),
+                                  mimetype="application/json")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+
+@app.route("/api/health")
+def get_health():
+    """資料集載入狀態（資料尚未就緒時回傳 503）"""
+    status = bootstrap.health()
+    snap = snapshot
+    status["snapshot"] = {
+        "version": snap.version,
+        "rows": snap.rows,
+        "sources": list(snap.sources),
+        "partitions": snap.partitions.describe(),
+        "backend": snap.store.name,
+        "created_at": snap.created_at,
+    }
+    return jsonify(status), (200 if status["ready"] else 503)
+
+
+@app.route("/api/ready")
+def get_ready():
+    """就緒檢查：資料已載入且快取預熱完成才回傳 200（給負載平衡器使用）"""
+    loaded = bootstrap.ready
+    warmed = warmer.warmed or not WARMUP_ENABLED
+    return jsonify({
+        "ready": loaded and warmed,
+        "dataset_loaded": loaded,
+        "warmup": warmer.status(),
+    }), (200 if loaded and warmed else 503)
+
+
+@app.route("/api/cache_stats")
+def get_cache_stats():
+    """快取命中率統計"""
+    return jsonify({
+        "data_version": snapshot.version,
+        "response_cache": response_cache.stats(),
+        "compression": compressor.stats(),
+        "api_memo": api_memo.stats(),
+        "compute_pool": compute_pool.stats(),
+    })
+
+
+@app.route("/metrics")
+def get_metrics():
+    """Prometheus 格式的請求量測（耗時、各階段、回應大小、快取命中）"""
+    return Response(instrumentation.render(),
+                    mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/memory_usage")
+def get_memory_usage():
+    """資料集記憶體使用量（各欄位型別與大小）"""
+    try:
+        snap = snapshot
+        return jsonify(memory_report(
+            [snap.df] + [p.frame for p in snap.appended()]))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+# 所有路由註冊完成後才開始載入：載入後的快取預熱會直接呼叫這些路由
+# 分區平行載入的子行程（spawn）會以 __mp_main__ 匯入本模組，不重複載入
+if __name__ != "__mp_main__":
+    bootstrap.start()
+    watcher.start()
+
 if __name__ == "__main__":
     app.run(debug=True, port=5001)
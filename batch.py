@@ -0,0 +1,88 @@
+"""
+批次 API：一次請求執行多個 /api 查詢
+
+每個子查詢都走一般的 Flask 請求流程（包含回應快取），
+相同的子查詢只會執行一次；各子查詢共用同一份聚合立方體與列索引。
+子查詢的 JSON 直接拼接進批次回應，不會重新解析。
+"""
+
+from werkzeug.datastructures import MultiDict
+
+from http_cache import normalize_args
+from serialization import dumps_bytes
+
+# 單次批次最多幾個子查詢
+MAX_BATCH_QUERIES = 20
+
+
+class BatchError(ValueError):
+    """批次請求格式錯誤"""
+
+
+def parse_queries(payload, max_queries=MAX_BATCH_QUERIES):
+    """
+    驗證並正規化批次請求
+
+    payload 格式：
+        {"queries": [{"id": "ts", "endpoint": "time_series",
+                      "params": {"country": "China"}}, ...]}
+    """
+    if not isinstance(payload, dict) or not isinstance(
+            payload.get("queries"), list):
+        raise BatchError("Body must be a JSON object with a 'queries' list")
+
+    queries = payload["queries"]
+    if len(queries) > max_queries:
+        raise BatchError(f"At most {max_queries} queries per batch")
+
+    parsed = []
+    for i, query in enumerate(queries):
+        if not isinstance(query, dict) or not query.get("endpoint"):
+            raise BatchError(f"Query {i} must have an 'endpoint'")
+
+        endpoint = str(query["endpoint"]).strip("/")
+        if endpoint.startswith("api/"):
+            endpoint = endpoint[len("api/"):]
+        if endpoint == "batch" or "/" in endpoint:
+            raise BatchError(f"Query {i}: invalid endpoint '{endpoint}'")
+
+        params = query.get("params") or {}
+        if not isinstance(params, dict):
+            raise BatchError(f"Query {i}: 'params' must be an object")
+        args = MultiDict()
+        for key, value in params.items():
+            values = value if isinstance(value, list) else [value]
+            for v in values:
+                args.add(str(key), str(v))
+
+        parsed.append({
+            "id": str(query.get("id", i)),
+            "path": f"/api/{endpoint}",
+            "args": args,
+        })
+    return parsed
+
+
+def run_batch(app, queries):
+    """執行所有子查詢，回傳批次回應的 JSON bytes"""
+    done = {}
+    parts = []
+    for query in queries:
+        key = (query["path"], normalize_args(query["args"]))
+        if key not in done:
+            # 每個子查詢有自己的 app context（自己的 g），
+            # 快取命中旗標與量測資料不會和其他子查詢或批次請求本身混用
+            with app.app_context(), app.test_request_context(
+                    query["path"], query_string=query["args"]):
+                response = app.full_dispatch_request()
+                body = response.get_data().strip()
+                if response.mimetype != "application/json" or not body:
+                    body = dumps_bytes({"error": response.status})
+                done[key] = (response.status_code, body)
+
+        status, body = done[key]
+        parts.append(b'{"id":' + dumps_bytes(query["id"]) + b',"status":' +
+                     str(status).encode() + b',"data":' + body +
+                     b"}")
+
+    return b'{"results":[' + b",".join(parts) + b"]}"
@@ -0,0 +1,329 @@
+"""
+API 端點效能測試（不同資料量）
+
+以合成資料（欄位與 Global_Cybersecurity_Threats_2015-2024.csv 相同）
+在 3k / 300k / 3M / 30M 筆下，透過 Flask test client 呼叫每個 /api 路由，
+記錄延遲百分位數、吞吐量與單次請求的記憶體峰值。
+
+每種資料量在獨立的行程中啟動 app（與正式環境相同的載入流程，
+大檔案會自動改用串流載入），量測前會清空回應快取與計算結果快取，
+量到的是實際計算的成本；cached_p50_ms 則是快取命中時的延遲。
+
+使用方式：
+    python benchmarks/api.py --rows 3000 300000
+    python benchmarks/api.py --save benchmarks/baseline.json
+    python benchmarks/api.py --rows 3000 300000 3000000 \
+        --compare benchmarks/baseline.json
+
+--compare 時，p50 延遲或記憶體峰值超過基準 --threshold（預設 25%）
+的端點會標示為退步，並以結束碼 1 結束（可用在 CI）。
+benchmarks/baseline.json 是 3k / 300k / 3M 筆的基準（記錄了量測的機器），
+在不同的機器上比較前先以 --save 重新產生。
+合成資料會保留在 --data-dir，下次執行不必重新產生。
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource，不回報最大 RSS
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import write_synthetic_csv  # noqa: E402
+
+DATA_FILE = "Global_Cybersecurity_Threats_2015-2024.csv"
+
+DEFAULT_ROWS = [3_000, 300_000, 3_000_000, 30_000_000]
+
+# (名稱, 方法, 路徑, JSON 內容)
+ENDPOINTS = [
+    ("map_data", "GET", "/api/map_data", None),
+    ("map_data_columnar", "GET", "/api/map_data?format=columnar", None),
+    ("industry_count", "GET", "/api/industry_analysis?type=count", None),
+    ("industry_loss", "GET", "/api/industry_analysis?type=loss", None),
+    ("countries", "GET", "/api/countries", None),
+    ("top_ips", "GET", "/api/top_ips", None),
+    ("top_ips_country", "GET", "/api/top_ips?country=China&top_n=20", None),
+    ("time_series", "GET", "/api/time_series", None),
+    ("time_series_country", "GET",
+     "/api/time_series?country=China", None),
+    ("attack_types", "GET", "/api/attack_types?country=China", None),
+    ("heatmap", "GET", "/api/heatmap", None),
+    ("treemap", "GET", "/api/treemap", None),
+    ("treemap_3_levels", "GET",
+     "/api/treemap?levels=Target Industry,Attack Type,Attack Source", None),
+    ("severity_by_type", "GET", "/api/severity_by_type", None),
+    ("yearly_trend", "GET", "/api/yearly_trend", None),
+    ("statistics", "GET", "/api/statistics", None),
+    ("defense_raw", "GET", "/api/defense_resolution", None),
+    ("defense_summary", "GET", "/api/defense_resolution?mode=summary", None),
+    ("defense_summary_approx", "GET",
+     "/api/defense_resolution?mode=summary&precision=approx&country=China",
+     None),
+    ("query_cube", "GET",
+     "/api/query?group_by=Country,Year"
+     "&metrics=count,mean(Financial Loss (in Million $))&order=-count", None),
+    ("query_rows", "POST", "/api/query", {
+        "group_by": "Attack Type",
+        "filters": {"Country": "China", "Year": {"gte": 2018}},
+        "metrics": "count,p90(Incident Resolution Time (in Hours))",
+    }),
+    ("batch", "POST", "/api/batch", {
+        "queries": [
+            {"endpoint": "time_series", "params": {"country": "USA"}},
+            {"endpoint": "top_ips", "params": {"country": "USA"}},
+            {"endpoint": "attack_types", "params": {"country": "USA"}},
+        ]
+    }),
+    ("health", "GET", "/api/health", None),
+    ("ready", "GET", "/api/ready", None),
+    ("cache_stats", "GET", "/api/cache_stats", None),
+    ("memory_usage", "GET", "/api/memory_usage", None),
+    ("metrics", "GET", "/metrics", None),
+]
+
+# 比較時低於此值的延遲差異視為雜訊（毫秒 / MB）
+NOISE_MS = 0.5
+NOISE_MB = 1.0
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) if samples else None
+
+
+def run_endpoint(server, client, method, path, body, repeat):
+    """量測單一端點：未快取的延遲分布、快取命中延遲與記憶體峰值"""
+
+    def call():
+        return client.open(path, method=method, json=body)
+
+    def clear():
+        server.response_cache.clear()
+        server.api_memo.clear()
+
+    clear()
+    response = call()  # 暖機（import、第一次配置）
+    status, size = response.status_code, len(response.get_data())
+
+    samples = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        clear()
+        begin = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - start
+
+    cached = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        call()
+        cached.append((time.perf_counter() - begin) * 1000)
+
+    # tracemalloc 會拖慢執行，記憶體峰值另外量一次
+    clear()
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "status": status,
+        "bytes": size,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "mean_ms": float(np.mean(samples)),
+        "throughput_rps": repeat / elapsed if elapsed else None,
+        "cached_p50_ms": percentile(cached, 50),
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def worker(output, repeat, only):
+    """在資料目錄中啟動 app 並量測所有端點（子行程）"""
+    begin = time.perf_counter()
+    import app as server  # noqa: E402  載入資料（同步）
+    load_seconds = time.perf_counter() - begin
+    if not server.bootstrap.ready:
+        raise SystemExit(f"資料載入失敗: {server.bootstrap.health()}")
+
+    client = server.app.test_client()
+    results = {}
+    for name, method, path, body in ENDPOINTS:
+        if only and name not in only:
+            continue
+        results[name] = run_endpoint(server, client, method, path, body,
+                                     repeat)
+
+    covered = {path.split("?")[0] for _, _, path, _ in ENDPOINTS}
+    missing = sorted(
+        rule.rule for rule in server.app.url_map.iter_rules()
+        if rule.rule.startswith("/api/") and rule.rule not in covered)
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "rows": len(server.snapshot),
+            "streamed": server.snapshot.streamed,
+            "load_seconds": load_seconds,
+            "max_rss_mb": max_rss_mb(),
+            "endpoints": results,
+            "uncovered_routes": missing,
+        }, f)
+
+
+def max_rss_mb():
+    """行程的最大 RSS（MB），沒有 resource 模組時為 None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 為 KB，macOS 為 bytes
+    return rss / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def prepare(rows, data_dir):
+    """建立 rows 筆資料的工作目錄（已存在則沿用）"""
+    workdir = os.path.join(data_dir, str(rows))
+    csv_path = os.path.join(workdir, "data", DATA_FILE)
+    if not os.path.exists(csv_path):
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+        print(f"產生 {rows:,} 筆測試資料...")
+        write_synthetic_csv(rows, csv_path + ".tmp")
+        os.replace(csv_path + ".tmp", csv_path)
+    return workdir
+
+
+def run(rows, data_dir, repeat, only):
+    workdir = prepare(rows, data_dir)
+    fd, output = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    env = dict(os.environ, WARMUP="0", DATA_WATCH_INTERVAL="0")
+    env.pop("PROFILE_DIR", None)
+    command = [sys.executable, os.path.abspath(__file__), "--worker",
+               "--output", output, "--repeat", str(repeat)]
+    if only:
+        command += ["--only", *only]
+    try:
+        # app 以相對路徑讀取 data/，在工作目錄中啟動
+        subprocess.run(command, cwd=workdir, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def print_result(rows, result, baseline=None, threshold=0.25):
+    """印出結果；有基準時加上比較，回傳退步的端點"""
+    mode = "串流" if result["streamed"] else "記憶體"
+    rss = ("" if result["max_rss_mb"] is None else
+           f"，最大 RSS {result['max_rss_mb']:.0f} MB")
+    print(f"\n== {rows:,} 筆（{mode}載入 {result['load_seconds']:.2f} 秒"
+          f"{rss}）")
+    header = (f"{'endpoint':<24}{'status':>7}{'p50':>9}{'p95':>9}"
+              f"{'p99':>9}{'req/s':>9}{'cached':>9}{'peak MB':>9}"
+              f"{'KB':>9}")
+    if baseline is not None:
+        header += f"{'vs base':>10}"
+    print(header)
+
+    regressions = []
+    for name, r in result["endpoints"].items():
+        line = (f"{name:<24}{r['status']:>7}{r['p50_ms']:>7.2f}ms"
+                f"{r['p95_ms']:>7.2f}ms{r['p99_ms']:>7.2f}ms"
+                f"{r['throughput_rps']:>9.0f}{r['cached_p50_ms']:>7.2f}ms"
+                f"{r['peak_mb']:>9.1f}{r['bytes'] / 1024:>9.1f}")
+        base = (baseline or {}).get(name)
+        if base is not None:
+            ratio = r["p50_ms"] / base["p50_ms"] if base["p50_ms"] else 1.0
+            slower = (ratio > 1 + threshold
+                      and r["p50_ms"] - base["p50_ms"] > NOISE_MS)
+            bigger = (r["peak_mb"] > base["peak_mb"] * (1 + threshold)
+                      and r["peak_mb"] - base["peak_mb"] > NOISE_MB)
+            line += f"{ratio:>9.2f}x"
+            if slower or bigger:
+                line += "  ! 退步" + ("（延遲）" if slower else "") + \
+                    ("（記憶體）" if bigger else "")
+                regressions.append(name)
+        elif baseline is not None:
+            line += f"{'new':>10}"
+        print(line)
+
+    if result["uncovered_routes"]:
+        print(f"! 沒有量測的路由: {', '.join(result['uncovered_routes'])}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="+", metavar="ENDPOINT",
+                        help="只量測這些端點（名稱見 ENDPOINTS）")
+    parser.add_argument("--data-dir",
+                        default=os.path.join(tempfile.gettempdir(),
+                                             "data_visual_bench"))
+    parser.add_argument("--save", metavar="PATH", help="把結果存成基準")
+    parser.add_argument("--compare", metavar="PATH", help="與基準比較")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--worker", action="store_true",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.output, args.repeat, args.only)
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    regressions = []
+    for rows in args.rows:
+        result = run(rows, args.data_dir, args.repeat, args.only)
+        results[str(rows)] = result
+        base = baseline.get(str(rows), {}).get("endpoints") \
+            if args.compare else None
+        if args.compare and base is None:
+            print(f"! 基準中沒有 {rows:,} 筆的結果")
+        regressions += [
+            f"{name} @ {rows:,}" for name in print_result(
+                rows, result, base, args.threshold)
+        ]
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"\n✓ 已儲存基準: {args.save}")
+
+    if regressions:
+        print(f"\n! {len(regressions)} 個端點退步: {', '.join(regressions)}")
+        sys.exit(1)
+    if args.compare:
+        print("\n✓ 沒有端點退步")
+
+
+if __name__ == "__main__":
+    main()
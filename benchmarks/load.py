@@ -0,0 +1,132 @@
+"""
+負載測試：對執行中的伺服器同時送出大量請求
+
+    python serve.py --port 5001 &
+    python benchmarks/load.py --url http://127.0.0.1:5001 --concurrency 32
+
+預設以 --concurrency 個執行緒輪流請求儀表板載入時的 /api 路徑
+（warmup.py 的 WARMUP_PATHS），共 --requests 次，
+回報吞吐量、延遲百分位數與狀態碼。
+
+--burst N 時每個路徑同時送出 N 個相同的請求（模擬多人同時開啟儀表板），
+伺服器在資料剛載入、快取還是空的時候，相同的計算應該只執行一次：
+結果中的 compute_pool.coalesced 為合併的請求數（由 /api/cache_stats 取得）。
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from warmup import WARMUP_PATHS  # noqa: E402
+
+
+def quote_path(path):
+    return urllib.request.quote(path, safe="/?=&,")
+
+
+def fetch(url, timeout):
+    """送出一個 GET 請求，回傳 (狀態碼, 毫秒)"""
+    begin = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = "error"
+    return status, (time.perf_counter() - begin) * 1000
+
+
+def pool_stats(base, timeout):
+    try:
+        with urllib.request.urlopen(base + "/api/cache_stats",
+                                    timeout=timeout) as response:
+            return json.load(response).get("compute_pool", {})
+    except (urllib.error.URLError, OSError, ValueError):
+        return {}
+
+
+def run_load(base, paths, concurrency, total, timeout):
+    urls = [base + quote_path(paths[i % len(paths)]) for i in range(total)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda url: fetch(url, timeout), urls))
+
+
+def run_burst(base, paths, size, timeout):
+    """每個路徑同時送出 size 個請求（等所有執行緒就緒後一起送出）"""
+    results = []
+    for path in paths:
+        barrier = threading.Barrier(size)
+        url = base + quote_path(path)
+
+        def call():
+            barrier.wait()
+            return fetch(url, timeout)
+
+        with ThreadPoolExecutor(max_workers=size) as pool:
+            results += list(pool.map(lambda _: call(), range(size)))
+    return results
+
+
+def report(results, elapsed, before, after):
+    latencies = [ms for _, ms in results]
+    statuses = Counter(str(status) for status, _ in results)
+    print(f"請求數: {len(results)}，耗時 {elapsed:.2f} 秒，"
+          f"{len(results) / elapsed:.0f} req/s")
+    print("延遲: " + "  ".join(
+        f"p{q}={np.percentile(latencies, q):.1f}ms" for q in (50, 95, 99)) +
+        f"  max={max(latencies):.1f}ms")
+    print("狀態碼: " + ", ".join(f"{s}×{n}"
+                               for s, n in sorted(statuses.items())))
+    if after:
+        delta = {
+            key: after.get(key, 0) - before.get(key, 0)
+            for key in ("submitted", "coalesced", "rejected")
+        }
+        print(f"compute_pool（workers={after.get('workers')}）: "
+              f"執行 {delta['submitted']} 次計算，"
+              f"合併 {delta['coalesced']} 個請求，"
+              f"拒絕 {delta['rejected']} 個")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:5001")
+    parser.add_argument("--paths", nargs="+", default=WARMUP_PATHS)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--burst", type=int, metavar="N",
+                        help="每個路徑同時送出 N 個相同的請求")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    before = pool_stats(base, args.timeout)
+    start = time.perf_counter()
+    if args.burst:
+        results = run_burst(base, args.paths, args.burst, args.timeout)
+    else:
+        results = run_load(base, args.paths, args.concurrency, args.requests,
+                           args.timeout)
+    elapsed = time.perf_counter() - start
+    report(results, elapsed, before, pool_stats(base, args.timeout))
+
+    if any(status == "error" for status, _ in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
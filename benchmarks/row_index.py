@@ -0,0 +1,64 @@
+"""
+列索引 vs 布林遮罩篩選的效能比較
+
+對不同筆數的測試資料，比較
+  - mask : df[df["Country"] == country]
+  - index: RowIndex.take(df, "Country", country)
+以及兩者接著做 nlargest（/api/top_ips 的實際用法）的時間。
+
+使用方式：
+    python benchmarks/row_index.py --rows 10000 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from indexes import RowIndex  # noqa: E402
+
+from synthetic import synthetic_frame  # noqa: E402
+
+USERS_COL = "Number of Affected Users"
+
+
+def best_ms(func, repeat):
+    """重複執行取最快的一次（毫秒）"""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--country", default="China")
+    args = parser.parse_args()
+
+    print(f"{'rows':>12}{'build':>10}{'mask':>10}{'index':>10}"
+          f"{'mask+top':>10}{'index+top':>11}{'speedup':>9}")
+    for rows in args.rows:
+        df = synthetic_frame(rows)
+        build = best_ms(lambda: RowIndex(df), 3)
+        index = RowIndex(df)
+        country = args.country
+
+        mask = best_ms(lambda: df[df["Country"] == country], args.repeat)
+        take = best_ms(lambda: index.take(df, "Country", country),
+                       args.repeat)
+        mask_top = best_ms(
+            lambda: df[df["Country"] == country].nlargest(10, USERS_COL),
+            args.repeat)
+        take_top = best_ms(
+            lambda: index.take(df, "Country", country).nlargest(
+                10, USERS_COL), args.repeat)
+
+        print(f"{rows:>12,}{build:>8.2f}ms{mask:>8.2f}ms{take:>8.2f}ms"
+              f"{mask_top:>8.2f}ms{take_top:>9.2f}ms{mask / take:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+產生與 Global_Cybersecurity_Threats_2015-2024.csv 欄位相同的測試資料
+
+每個欄位各自依原始資料的值分布抽樣（欄位之間互相獨立），
+可以快速產生任意筆數的資料，用在效能測試。
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from schema import apply_schema  # noqa: E402
+
+SOURCE_CSV = os.path.join(ROOT, "data",
+                          "Global_Cybersecurity_Threats_2015-2024.csv")
+
+
+def synthetic_frame(rows, seed=0, source=SOURCE_CSV):
+    """產生 rows 筆資料（已套用 schema 的 DataFrame）"""
+    base = apply_schema(pd.read_csv(source))
+    rng = np.random.default_rng(seed)
+
+    data = {}
+    for col in base.columns:
+        series = base[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            freq = series.cat.codes.value_counts(normalize=True).sort_index()
+            codes = rng.choice(freq.index.to_numpy(), size=rows,
+                               p=freq.to_numpy()).astype(
+                                   series.cat.codes.dtype)
+            data[col] = pd.Categorical.from_codes(
+                codes, categories=series.cat.categories)
+        else:
+            values = series.dropna().to_numpy()
+            data[col] = values[rng.integers(0, len(values), rows)]
+    return pd.DataFrame(data)
+
+
+def write_synthetic_csv(rows, path, seed=0, chunk_rows=1_000_000):
+    """分批產生並寫入 CSV，避免大筆數時一次佔用太多記憶體"""
+    written = 0
+    chunk = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        frame = synthetic_frame(n, seed=seed + chunk)
+        frame.to_csv(path,
+                     mode="w" if chunk == 0 else "a",
+                     header=chunk == 0,
+                     index=False)
+        written += n
+        chunk += 1
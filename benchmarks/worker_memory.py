@@ -0,0 +1,110 @@
+"""
+多 worker 記憶體用量測試
+
+同時啟動多個 worker 行程載入資料集並建立聚合結果，比較：
+  - csv : 每個 worker 各自解析 CSV（各自一份資料）
+  - mmap: 透過欄式快取 memory-map（資料在 page cache 中只有一份）
+
+RSS 會把共用的分頁重複計算，PSS（Linux）則把共用分頁平均分給
+各行程，比較能代表實際佔用的記憶體。
+
+使用方式：
+    python benchmarks/worker_memory.py --rows 1000000 --workers 8
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aggregates import AggregateCube  # noqa: E402
+from data_cache import load_cached_csv  # noqa: E402
+from schema import read_threats_csv  # noqa: E402
+
+from synthetic import write_synthetic_csv  # noqa: E402
+
+
+def memory_kb():
+    """目前行程的 RSS 與 PSS（KB），非 Linux 時 PSS 為 None"""
+    rss = pss = None
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, pss
+
+
+def worker(mode, csv_path, cache_dir, barrier, results):
+    before = memory_kb()
+    if mode == "mmap":
+        df = load_cached_csv(csv_path, read_threats_csv, cache_dir=cache_dir)
+    else:
+        df = read_threats_csv(csv_path)
+    AggregateCube(df)
+
+    # 所有 worker 都載入完成後再量測，PSS 才會反映共用情形
+    barrier.wait()
+    after = memory_kb()
+    results.put((before, after))
+    barrier.wait()
+
+
+def run(mode, workers, csv_path, cache_dir):
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker,
+                    args=(mode, csv_path, cache_dir, barrier, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    samples = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "threats.csv")
+        cache_dir = os.path.join(tmp, "cache")
+        print(f"產生 {args.rows:,} 筆測試資料...")
+        write_synthetic_csv(args.rows, csv_path)
+
+        # 先建立快取，量測的是 worker 重新啟動後的穩定狀態
+        load_cached_csv(csv_path, read_threats_csv, cache_dir=cache_dir)
+
+        print(f"\n{'mode':<6}{'RSS/worker':>14}{'PSS/worker':>14}"
+              f"{'PSS total':>14}{'data RSS':>14}")
+        for mode in ("csv", "mmap"):
+            samples = run(mode, args.workers, csv_path, cache_dir)
+            rss = [after[0] for _, after in samples]
+            pss = [after[1] for _, after in samples if after[1] is not None]
+            delta = [after[0] - before[0] for before, after in samples]
+            pss_avg = f"{np.mean(pss) / 1024:.1f} MB" if pss else "n/a"
+            pss_total = f"{np.sum(pss) / 1024:.1f} MB" if pss else "n/a"
+            print(f"{mode:<6}{np.mean(rss) / 1024:>11.1f} MB{pss_avg:>14}"
+                  f"{pss_total:>14}{np.mean(delta) / 1024:>11.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
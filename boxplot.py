@@ -0,0 +1,107 @@
+"""
+盒鬚圖統計（Box Plot Summary）
+
+一次排序後，以陣列運算算出每組的四分位數、平均、標準差、
+鬚線與離群值，不必對每個組別各做一次遮罩與 quantile。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _quantile(sorted_values, starts, counts, q):
+    """各組的分位數（與 pandas 預設的 linear 內插相同）"""
+    position = (counts - 1) * q
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    frac = position - lower
+    low_values = sorted_values[starts + lower]
+    high_values = sorted_values[starts + upper]
+    return low_values + (high_values - low_values) * frac
+
+
+def _sample(values, limit):
+    """超過 limit 筆時平均取樣（保留最小與最大值）"""
+    if len(values) <= limit:
+        return values
+    picks = np.linspace(0, len(values) - 1, limit).round().astype(np.int64)
+    return values[picks]
+
+
+def box_summary(values, groups, whisker=1.5, max_outliers=100):
+    """
+    計算各組的盒鬚圖統計
+
+    Args:
+        values: 數值 Series
+        groups: 組別 Series（category 或一般欄位）
+        whisker: 鬚線長度（IQR 的倍數）
+        max_outliers: 每組最多回傳幾個離群值（超過時平均取樣）
+
+    Returns:
+        dict: {組別: 統計資料}，依組別第一次出現的順序
+    """
+    if isinstance(groups.dtype, pd.CategoricalDtype):
+        codes = groups.cat.codes.to_numpy()
+        labels = groups.cat.categories
+    else:
+        codes, labels = pd.factorize(groups)
+
+    data = values.to_numpy(dtype="float64", na_value=np.nan)
+    valid = (codes >= 0) & ~np.isnan(data)
+    positions = np.flatnonzero(valid)
+    codes = codes[valid]
+    data = data[valid]
+
+    # 依 (組別, 數值) 排序，每組的資料在陣列中連續且遞增
+    order = np.lexsort((data, codes))
+    sorted_values = data[order]
+    counts = np.bincount(codes, minlength=len(labels))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    present = np.flatnonzero(counts)
+    if len(present) == 0:
+        return {}
+    n = counts[present]
+    s = starts[present]
+
+    sums = np.bincount(codes, weights=data, minlength=len(labels))[present]
+    sumsq = np.bincount(codes, weights=data**2,
+                        minlength=len(labels))[present]
+    mean = sums / n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(np.maximum(sumsq - sums**2 / n, 0) / (n - 1))
+
+    q1 = _quantile(sorted_values, s, n, 0.25)
+    median = _quantile(sorted_values, s, n, 0.5)
+    q3 = _quantile(sorted_values, s, n, 0.75)
+    iqr = q3 - q1
+    low_fence = q1 - whisker * iqr
+    high_fence = q3 + whisker * iqr
+
+    # 第一次出現的列位置，用來維持與原本 unique() 相同的順序
+    first_seen = np.full(len(labels), np.iinfo(np.int64).max)
+    np.minimum.at(first_seen, codes, positions)
+
+    summary = {}
+    for i in sorted(range(len(present)), key=lambda i: first_seen[present[i]]):
+        group = sorted_values[s[i]:s[i] + n[i]]
+        lo = np.searchsorted(group, low_fence[i], side="left")
+        hi = np.searchsorted(group, high_fence[i], side="right")
+        outliers = np.concatenate([group[:lo], group[hi:]])
+
+        summary[labels[present[i]]] = {
+            "count": int(n[i]),
+            "mean": float(mean[i]),
+            "median": float(median[i]),
+            "q1": float(q1[i]),
+            "q3": float(q3[i]),
+            "min": float(group[0]),
+            "max": float(group[-1]),
+            "std": float(std[i]),
+            "lower_whisker": float(group[lo]) if lo < hi else float(q1[i]),
+            "upper_whisker": float(group[hi - 1]) if lo < hi else float(q3[i]),
+            "outlier_count": int(len(outliers)),
+            "outliers": _sample(outliers, max_outliers).tolist(),
+        }
+    return summary
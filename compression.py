@@ -0,0 +1,144 @@
+"""
+回應壓縮（gzip / brotli）
+
+依照 Accept-Encoding 壓縮 JSON 回應，brotli 為選裝套件，
+沒有安裝時只使用 gzip。有 ETag 的回應會把壓縮結果快取起來
+（以資料版本、ETag 與編碼為 key，筆數與記憶體皆有上限，資料更新時清空），
+同一份資料不必每次重新壓縮；串流回應則邊產生邊壓縮。
+壓縮後的回應在 ETag 後面加上編碼（如 "-gzip"、"-br"），
+不同編碼的內容不會共用同一個強 ETag。
+"""
+
+import gzip
+import zlib
+
+from flask import request
+
+from memo import LRUCache
+
+try:
+    import brotli
+except ImportError:  # 選裝套件
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "application/javascript",
+    "text/javascript",
+}
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class Compressor:
+    """
+    掛在 Flask app 上的回應壓縮
+
+    Args:
+        min_size: 小於此大小（bytes）的回應不壓縮
+        gzip_level: gzip 壓縮等級
+        brotli_quality: brotli 壓縮品質
+        cache_entries: 壓縮結果快取的筆數上限
+        cache_bytes: 壓縮結果快取的記憶體上限（bytes）
+        version_getter: 回傳目前資料版本字串的函式（快取 key 的一部分）
+    """
+
+    def __init__(self, app=None, min_size=1024, gzip_level=6,
+                 brotli_quality=5, cache_entries=256,
+                 cache_bytes=64 * 1024 * 1024, version_getter=None):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.version_getter = version_getter or (lambda: None)
+        self._cache = LRUCache(max_entries=cache_entries,
+                               max_bytes=cache_bytes,
+                               sizeof=len)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self._after_request)
+
+    def _choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return None
+
+    def compress(self, data, encoding):
+        if encoding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level)
+
+    def _after_request(self, response):
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        encoding = self._choose_encoding()
+        if encoding is None:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        etag, _ = response.get_etag()
+        if response.is_streamed:
+            chunks = response.response
+            if encoding == "br":
+                response.response = _brotli_stream(chunks,
+                                                   self.brotli_quality)
+            else:
+                response.response = _gzip_stream(chunks, self.gzip_level)
+            response.headers.pop("Content-Length", None)
+            self._set_encoding(response, etag, encoding)
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        key = (self.version_getter(), etag, encoding) if etag else None
+        compressed = self._cache.get(key) if key else None
+        if compressed is None:
+            compressed = self.compress(data, encoding)
+            if key:
+                self._cache.put(key, compressed)
+
+        response.set_data(compressed)
+        self._set_encoding(response, etag, encoding)
+        return response
+
+    @staticmethod
+    def _set_encoding(response, etag, encoding):
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            response.set_etag(f"{etag}-{encoding}")
+
+    def clear(self):
+        """清空壓縮結果快取（資料重新載入時使用）"""
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
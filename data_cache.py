@@ -0,0 +1,258 @@
+"""
+CSV 的二進位欄式快取（Columnar Cache）
+
+第一次啟動時把 CSV 轉成每欄一個 .npy 檔，類別欄位只存整數代碼，
+類別字典寫在 manifest.json。之後只要來源檔案的大小 / mtime / 雜湊
+沒變，就直接以 memory-map 方式載入，不必重新解析文字。
+
+所有 worker 都透過 memory-map 讀取同一份檔案，欄位資料只會在
+作業系統的 page cache 中存在一份；把快取目錄設在 /dev/shm
+即等同放進共享記憶體。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# 快取格式版本，格式改變時遞增讓舊快取失效
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join("data", ".cache")
+
+# 等待其他 worker 建立快取的最長時間（秒），超過就自己解析 CSV
+LOCK_TIMEOUT = 120
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """計算檔案的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path, with_hash=True):
+    """來源檔案的指紋（大小、修改時間、雜湊）"""
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        fingerprint["sha256"] = file_sha256(path)
+    return fingerprint
+
+
+def cache_path_for(source_path, cache_dir=DEFAULT_CACHE_DIR):
+    """來源檔案對應的快取資料夾"""
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, name)
+
+
+def _read_manifest(cache_path):
+    try:
+        with open(os.path.join(cache_path, "manifest.json"),
+                  encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def cache_is_valid(source_path, cache_path):
+    """
+    檢查快取是否仍對應目前的來源檔案
+
+    大小與 mtime 相同即視為有效；mtime 改變但大小相同時
+    （例如重新複製同一份檔案）再比對雜湊。
+    """
+    manifest = _read_manifest(cache_path)
+    if not manifest or manifest.get("version") != CACHE_VERSION:
+        return False
+
+    cached = manifest.get("source", {})
+    current = source_fingerprint(source_path, with_hash=False)
+    if cached.get("size") != current["size"]:
+        return False
+    if cached.get("mtime_ns") == current["mtime_ns"]:
+        return True
+    if cached.get("sha256") != file_sha256(source_path):
+        return False
+
+    # 內容相同只是 mtime 變了：更新 manifest，下次不必再算雜湊
+    cached["mtime_ns"] = current["mtime_ns"]
+    try:
+        with open(os.path.join(cache_path, "manifest.json"), "w",
+                  encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+    except OSError:
+        pass
+    return True
+
+
+def write_cache(df, source_path, cache_path):
+    """把 DataFrame 寫成欄式快取（先寫到暫存資料夾再原子替換）"""
+    parent = os.path.dirname(os.path.abspath(cache_path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        entry = {"name": col, "file": f"col_{i:03d}.npy"}
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["kind"] = "category"
+            entry["categories"] = series.cat.categories.tolist()
+            values = series.cat.codes.to_numpy()
+        elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and \
+                pd.api.types.is_integer_dtype(series.dtype):
+            # nullable 整數：數值與缺值遮罩分開存
+            entry["kind"] = "nullable_int"
+            entry["dtype"] = str(series.dtype)
+            entry["mask_file"] = f"col_{i:03d}_mask.npy"
+            values = series.to_numpy(
+                dtype=series.dtype.numpy_dtype, na_value=0)
+            np.save(os.path.join(tmp_path, entry["mask_file"]),
+                    series.isna().to_numpy())
+        elif pd.api.types.is_numeric_dtype(series.dtype):
+            entry["kind"] = "numeric"
+            values = series.to_numpy()
+        else:
+            # 其他欄位（例如文字）當成類別欄位存
+            entry["kind"] = "category"
+            codes, uniques = pd.factorize(series)
+            entry["categories"] = [str(u) for u in uniques]
+            values = codes
+            entry["as_object"] = True
+
+        np.save(os.path.join(tmp_path, entry["file"]), values)
+        columns.append(entry)
+
+    manifest = {
+        "version": CACHE_VERSION,
+        "rows": int(len(df)),
+        "source": source_fingerprint(source_path),
+        "columns": columns,
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w",
+              encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    if os.path.exists(cache_path):
+        shutil.rmtree(cache_path)
+    os.replace(tmp_path, cache_path)
+
+
+def read_cache(cache_path, mmap=True):
+    """以 memory-map 方式讀取欄式快取"""
+    manifest = _read_manifest(cache_path)
+    mmap_mode = "r" if mmap else None
+
+    data = {}
+    for entry in manifest["columns"]:
+        values = np.load(os.path.join(cache_path, entry["file"]),
+                         mmap_mode=mmap_mode)
+        # 轉成一般 ndarray 檢視，底層仍是 memory-map，不會複製
+        values = values.view(np.ndarray)
+        if entry["kind"] == "category":
+            # 不驗證代碼，from_codes 才會直接沿用 memory-map 的陣列
+            column = pd.Categorical.from_codes(
+                values, categories=entry["categories"], validate=False)
+            if entry.get("as_object"):
+                column = np.asarray(column, dtype=object)
+        elif entry["kind"] == "nullable_int":
+            mask = np.load(os.path.join(cache_path, entry["mask_file"]))
+            column = pd.array(np.asarray(values), dtype=entry["dtype"])
+            column[mask] = pd.NA
+        else:
+            column = values
+        data[entry["name"]] = column
+
+    return pd.DataFrame(data, copy=False)
+
+
+def _acquire_lock(lock_path, timeout=LOCK_TIMEOUT):
+    """以建立檔案的方式取得跨行程的鎖（Windows / Linux 皆可用）"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            return True
+        except FileExistsError:
+            # 前一個行程異常結束留下的鎖
+            try:
+                if time.time() - os.path.getmtime(lock_path) > timeout:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                return False
+            time.sleep(0.05)
+
+
+def _try_read_cache(source_path, cache_path):
+    if not cache_is_valid(source_path, cache_path):
+        return None
+    try:
+        df = read_cache(cache_path)
+        print(f"✓ 從快取載入: {cache_path}")
+        return df
+    except Exception as e:
+        print(f"! 快取讀取失敗，改為重新解析 CSV: {e}")
+        return None
+
+
+def load_cached_csv(source_path, loader, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    讀取 CSV，快取有效時直接載入快取，否則重新解析並寫入快取
+
+    多個 worker 同時啟動時只有一個會解析 CSV，其他的等快取寫好後
+    直接 memory-map，因此每個 worker 拿到的都是共用的唯讀陣列。
+
+    Args:
+        source_path: CSV 路徑
+        loader: 解析 CSV 的函式（例如 schema.read_threats_csv）
+        cache_dir: 快取根目錄
+    """
+    cache_path = cache_path_for(source_path, cache_dir)
+
+    df = _try_read_cache(source_path, cache_path)
+    if df is not None:
+        return df
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        locked = _acquire_lock(cache_path + ".lock")
+    except OSError as e:
+        print(f"! 無法建立快取目錄: {e}")
+        return loader(source_path)
+
+    if not locked:
+        print("! 等待快取逾時，直接解析 CSV")
+        return loader(source_path)
+
+    try:
+        # 等待期間其他 worker 可能已經寫好快取
+        df = _try_read_cache(source_path, cache_path)
+        if df is not None:
+            return df
+
+        df = loader(source_path)
+        try:
+            write_cache(df, source_path, cache_path)
+            print(f"✓ 已建立快取: {cache_path}")
+            return read_cache(cache_path)
+        except Exception as e:
+            print(f"! 無法寫入快取: {e}")
+            return df
+    finally:
+        try:
+            os.remove(cache_path + ".lock")
+        except OSError:
+            pass
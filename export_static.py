@@ -0,0 +1,164 @@
+"""
+靜態匯出（Static Export）
+
+把所有儀表板頁面與它們用到的 /api 資料預先產生成靜態檔案，
+可以直接放到任何靜態檔案伺服器或 CDN，瀏覽時不需要 Python 計算：
+
+    python export_static.py --output dist
+    python -m http.server --directory dist 8000
+
+輸出的結構：
+
+    dist/
+    ├── index.html、overview/index.html、map/index.html ...
+    ├── static/                 # 與 static/ 相同
+    └── api-data/
+        ├── manifest.json       # {key: 檔名}，key 為正規化後的 /api 路徑
+        └── <hash>.json.gz      # 每個 /api 回應（gzip 壓縮）
+
+頁面會設定 window.STATIC_BUNDLE，static/js/api.js 依 manifest 讀取檔案。
+國家篩選（/api/time_series、/api/attack_types、/api/top_ips）
+會為每個國家各產生一份；多國比較由各國的結果在瀏覽器中組合。
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from urllib.parse import parse_qsl, quote, urlsplit
+
+from werkzeug.datastructures import MultiDict
+
+from http_cache import normalize_args
+from warmup import COUNTRY_PATHS, WARMUP_PATHS
+
+# 匯出時不需要背景預熱與資料監看
+os.environ.setdefault("WARMUP", "0")
+os.environ.setdefault("DATA_WATCH_INTERVAL", "0")
+
+# 頁面路由與輸出的檔案
+PAGES = {
+    "/": "index.html",
+    "/overview": "overview/index.html",
+    "/map": "map/index.html",
+    "/charts": "charts/index.html",
+    "/advanced": "advanced/index.html",
+}
+
+BUNDLE_DIR = "api-data"
+
+
+def bundle_key(path):
+    """正規化後的 /api 路徑（與 static/js/api.js 的 bundleKey 相同）"""
+    url = urlsplit(path)
+    items = normalize_args(MultiDict(parse_qsl(url.query,
+                                               keep_blank_values=True)))
+    if not items:
+        return url.path
+    return url.path + "?" + "&".join(f"{key}={value}" for key, value in items)
+
+
+def export_paths(snap):
+    """要匯出的 /api 路徑：預熱清單，加上每個國家的篩選結果"""
+    paths = list(WARMUP_PATHS)
+    if snap.cube.has("Country"):
+        for country in sorted(snap.cube.counts("Country").index.tolist()):
+            paths += [
+                template.format(quote(str(country)))
+                for template in COUNTRY_PATHS
+            ]
+    return paths
+
+
+def export_api(app, snap, output):
+    """
+    產生每個 /api 回應的壓縮檔與 manifest.json
+
+    Returns:
+        (檔案數, 壓縮前 bytes, 壓縮後 bytes)
+    """
+    bundle_dir = os.path.join(output, BUNDLE_DIR)
+    os.makedirs(bundle_dir, exist_ok=True)
+    client = app.test_client()
+
+    files = {}
+    raw_bytes = packed_bytes = 0
+    for path in export_paths(snap):
+        key = bundle_key(path)
+        if key in files:
+            continue
+        response = client.get(path)
+        if response.status_code != 200:
+            print(f"! 略過 {path}: {response.status_code}")
+            continue
+
+        body = response.get_data()
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".json.gz"
+        # mtime=0：內容相同時檔案也相同，重新匯出不會讓 CDN 快取失效
+        packed = gzip.compress(body, compresslevel=9, mtime=0)
+        with open(os.path.join(bundle_dir, name), "wb") as f:
+            f.write(packed)
+        files[key] = name
+        raw_bytes += len(body)
+        packed_bytes += len(packed)
+
+    with open(os.path.join(bundle_dir, "manifest.json"), "w",
+              encoding="utf-8") as f:
+        json.dump({
+            "version": snap.version,
+            "rows": snap.rows,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "files": files,
+        }, f, ensure_ascii=False)
+    return len(files), raw_bytes, packed_bytes
+
+
+def export_pages(app, output, base_url):
+    """以靜態模式渲染每個頁面，並複製 static/"""
+    app.config["STATIC_BUNDLE"] = base_url
+    client = app.test_client()
+    try:
+        for route, filename in PAGES.items():
+            response = client.get(route)
+            if response.status_code != 200:
+                raise RuntimeError(f"{route}: {response.status_code}")
+            path = os.path.join(output, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(response.get_data())
+    finally:
+        app.config.pop("STATIC_BUNDLE", None)
+
+    shutil.copytree(app.static_folder, os.path.join(output, "static"),
+                    dirs_exist_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匯出靜態的儀表板與資料")
+    parser.add_argument("--output", default="dist")
+    parser.add_argument("--base-url", default=f"/{BUNDLE_DIR}/",
+                        help="瀏覽器讀取 api-data/ 的網址（部署在子路徑時修改）")
+    args = parser.parse_args()
+
+    import app as server  # 載入資料（同步）
+
+    if not server.bootstrap.ready:
+        sys.exit(f"! 資料載入失敗: {server.bootstrap.health()}")
+    snap = server.snapshot
+
+    begin = time.perf_counter()
+    count, raw_bytes, packed_bytes = export_api(server.app, snap,
+                                                args.output)
+    export_pages(server.app, args.output, args.base_url)
+    print(f"✓ 已匯出 {count} 個 API 回應與 {len(PAGES)} 個頁面到 "
+          f"{args.output}（{raw_bytes / 1024:.0f} KB → "
+          f"{packed_bytes / 1024:.0f} KB，"
+          f"{time.perf_counter() - begin:.1f} 秒）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+/api 回應快取（ETag / If-None-Match）
+
+資料集在兩次重新載入之間是固定的，所以同樣的 endpoint + 參數
+一定會得到同樣的 JSON。ETag 由資料版本與正規化後的參數組成：
+瀏覽器帶著 If-None-Match 回來時直接回 304，不必重新計算；
+其他使用者第一次請求時則從伺服器端快取取出已序列化的內容。
+壓縮後的回應 ETag 會帶編碼後綴（見 compression.py），比對 If-None-Match
+時一併接受，304 回傳瀏覽器手上的那一個。
+"""
+
+import hashlib
+import threading
+
+from flask import Response, g, request
+
+from memo import LRUCache
+
+# 參數的預設值：省略參數與明確傳入預設值視為同一個請求
+# 壓縮回應加在 ETag 後面的編碼後綴
+ENCODING_SUFFIXES = ("", "-gzip", "-br")
+
+DEFAULT_ARGS = {
+    "country": "all",
+    "mode": "single",
+    "top_n": "10",
+    "type": "count",
+}
+
+
+def normalize_args(args):
+    """把 query string 轉成穩定的 tuple（排序、去空白、去掉預設值）"""
+    items = []
+    for key in sorted(args.keys()):
+        value = ",".join(v.strip() for v in args.getlist(key))
+        if key == "countries":
+            value = ",".join(c.strip() for c in value.split(",") if c.strip())
+        elif key == "top_n":
+            try:
+                value = str(int(value))
+            except ValueError:
+                pass
+        if value == "" or DEFAULT_ARGS.get(key) == value:
+            continue
+        items.append((key, value))
+    return tuple(items)
+
+
+class ResponseCache:
+    """
+    掛在 Flask app 上的 /api 回應快取
+
+    Args:
+        version_getter: 回傳目前資料版本字串的函式
+        prefix: 需要快取的路徑前綴
+        exclude: 不快取的路徑（例如健康檢查）
+        max_entries: 伺服器端最多保留幾筆回應
+        max_bytes: 伺服器端保留的回應總大小上限
+        max_age: Cache-Control 的 max-age（秒）
+    """
+
+    def __init__(self, app=None, version_getter=None, prefix="/api/",
+                 exclude=(), max_entries=512, max_bytes=64 * 1024 * 1024,
+                 max_age=60):
+        self.version_getter = version_getter
+        self.prefix = prefix
+        self.exclude = set(exclude)
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._entries = LRUCache(max_entries=max_entries,
+                                 max_bytes=max_bytes,
+                                 sizeof=lambda entry: len(entry[0]) + 256)
+        self.not_modified = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _cacheable(self):
+        return (request.method == "GET"
+                and request.path.startswith(self.prefix)
+                and request.path not in self.exclude)
+
+    def _etag(self, key, version):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+        return f"{version}-{digest}"
+
+    def _before_request(self):
+        if not self._cacheable():
+            return None
+
+        version = self.version_getter()
+        key = (version, request.path, normalize_args(request.args))
+        etag = self._etag(key[1:], version)
+        g.response_cache = (key, etag)
+
+        # 瀏覽器已有相同版本（任一種編碼）：直接回 304
+        for suffix in ENCODING_SUFFIXES:
+            if etag + suffix in request.if_none_match:
+                with self._lock:
+                    self.not_modified += 1
+                response = Response(status=304)
+                return self._set_headers(response, etag + suffix)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            body, mimetype = entry
+            response = Response(body, mimetype=mimetype)
+            g.response_cache_hit = True
+            return self._set_headers(response, etag)
+        return None
+
+    def _after_request(self, response):
+        cached = g.pop("response_cache", None)
+        hit = g.pop("response_cache_hit", False)
+        if cached is None:
+            return response
+
+        key, etag = cached
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.is_streamed):
+            return response
+
+        self._set_headers(response, etag)
+        if hit:
+            # 請求量測的 after_request 在之後執行，由它讀取並移除
+            g.metrics_cache_hit = True
+        else:
+            self._entries.put(key, (response.get_data(), response.mimetype))
+        return response
+
+    def _set_headers(self, response, etag):
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
+        return response
+
+    def clear(self):
+        """清空伺服器端快取（資料重新載入時使用）"""
+        self._entries.clear()
+
+    def stats(self):
+        stats = self._entries.stats()
+        with self._lock:
+            stats["not_modified"] = self.not_modified
+        return stats
@@ -0,0 +1,86 @@
+"""
+類別欄位的列索引（Row Index）
+
+對每個索引欄位，把「值 → 該值出現的列位置（由小到大排序）」預先建好，
+篩選單一國家 / 產業 / 攻擊類型時只需要取出對應的位置陣列，
+成本與符合的筆數成正比，不必對整份資料做布林遮罩。
+"""
+
+import numpy as np
+import pandas as pd
+
+INDEXED_COLUMNS = [
+    "Country",
+    "Target Industry",
+    "Attack Type",
+    "Defense Mechanism Used",
+]
+
+
+class _ColumnIndex:
+    """單一欄位的索引：依值分組後的列位置，與各組的起訖位置"""
+
+    def __init__(self, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            labels = series.cat.categories
+        else:
+            codes, labels = pd.factorize(series)
+
+        valid = codes >= 0
+        position_dtype = np.int32 if len(codes) < 2**31 else np.int64
+        positions = np.flatnonzero(valid).astype(position_dtype)
+        # stable 排序：同一組內的列位置維持由小到大
+        order = np.argsort(codes[valid], kind="stable")
+        self.positions = positions[order]
+
+        counts = np.bincount(codes[valid], minlength=len(labels))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.lookup = {label: i for i, label in enumerate(labels)}
+
+    def get(self, value):
+        i = self.lookup.get(value)
+        if i is None:
+            return self.positions[:0]
+        return self.positions[self.offsets[i]:self.offsets[i + 1]]
+
+    def values(self):
+        """出現過的值，依第一次出現的列位置排序"""
+        present = [(self.positions[self.offsets[i]], label)
+                   for label, i in self.lookup.items()
+                   if self.offsets[i + 1] > self.offsets[i]]
+        return [label for _, label in sorted(present)]
+
+
+class RowIndex:
+    """多個類別欄位的列索引"""
+
+    def __init__(self, df, columns=None):
+        self._columns = {
+            col: _ColumnIndex(df[col])
+            for col in (INDEXED_COLUMNS if columns is None else columns)
+            if col in df.columns
+        }
+
+    def has(self, column):
+        return column in self._columns
+
+    def positions(self, column, value):
+        """某欄位等於 value 的列位置（唯讀、遞增排序）"""
+        return self._columns[column].get(value)
+
+    def values(self, column):
+        """某欄位所有出現過的值（依出現順序）"""
+        return self._columns[column].values()
+
+    def take(self, df, column, value):
+        """取出某欄位等於 value 的列，順序與原資料相同"""
+        if not self.has(column):
+            # 沒有建立索引的欄位（例如串流載入的資料）改用遮罩篩選
+            return df[(df[column] == value).to_numpy()]
+        return df.iloc[self.positions(column, value)]
+
+    def nbytes(self):
+        return sum(
+            idx.positions.nbytes + idx.offsets.nbytes
+            for idx in self._columns.values())
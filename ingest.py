@@ -0,0 +1,296 @@
+"""
+大型 CSV 的分批串流載入（Chunked Ingestion）
+
+檔案大於記憶體時不能一次 pd.read_csv。這裡每次只讀入一批資料列：
+- 聚合立方體與解決時間摘要逐批計算後合併，大小只與組合數量有關
+- 原始資料列（選用）逐批寫成 data_cache 的欄式快取，
+  完成後以 memory-map 方式開啟，只佔用作業系統的 page cache
+
+下次啟動時快取仍有效，就直接開啟快取，再逐批重算聚合結果。
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube
+from data_cache import (CACHE_VERSION, _acquire_lock, cache_is_valid,
+                        read_cache, source_fingerprint)
+from schema import CATEGORICAL_COLUMNS, apply_schema
+from sketches import SketchSet
+
+# 每批讀入的資料列數
+DEFAULT_CHUNK_ROWS = 250_000
+
+
+def read_csv_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """逐批讀取 CSV，每批都套用 schema"""
+    dtype = {col: "category" for col in CATEGORICAL_COLUMNS}
+    for chunk in pd.read_csv(path, dtype=dtype, chunksize=chunk_rows):
+        yield apply_schema(chunk)
+
+
+def iter_frame_chunks(df, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """把（memory-map 的）DataFrame 切成多批，每批才實際讀入記憶體"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _smallest_int(low, high):
+    for candidate in ("int8", "int16", "int32"):
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            return candidate
+    return "int64"
+
+
+class _ColumnWriter:
+    """
+    單一欄位的分批寫入
+
+    每批先以原始 bytes 附加到暫存檔，類別欄位用全域的類別字典編碼；
+    全部讀完後才知道最終的整數寬度與類別排序，再轉寫成 .npy。
+    """
+
+    def __init__(self, name, index, tmp_path):
+        self.name = name
+        self.file = f"col_{index:03d}.npy"
+        self.raw_path = os.path.join(tmp_path, f"col_{index:03d}.raw")
+        self.mask_path = os.path.join(tmp_path, f"col_{index:03d}.mask")
+        self.kind = None
+        self.categories = {}
+        self.has_na = False
+        self.low = 0
+        self.high = 0
+        self.rows = 0
+
+    def append(self, series):
+        if isinstance(series.dtype, pd.CategoricalDtype) or \
+                series.dtype == object:
+            self.kind = "category"
+            codes, uniques = pd.factorize(series.astype(str).where(
+                series.notna()))
+            mapping = np.array([
+                self.categories.setdefault(u, len(self.categories))
+                for u in uniques
+            ], dtype=np.int64)
+            values = np.full(len(codes), -1, dtype=np.int64)
+            values[codes >= 0] = mapping[codes[codes >= 0]]
+        elif (pd.api.types.is_integer_dtype(series.dtype)
+              and self.kind != "float"):
+            self.kind = "int"
+            mask = series.isna().to_numpy()
+            values = series.to_numpy(dtype="int64", na_value=0)
+            self.has_na = self.has_na or bool(mask.any())
+            with open(self.mask_path, "ab") as f:
+                f.write(mask.tobytes())
+            if len(values):
+                self.low = min(self.low, int(values.min()))
+                self.high = max(self.high, int(values.max()))
+        else:
+            # 某一批出現小數時，整欄（含之前寫入的部分）改存 float64
+            if self.kind == "int":
+                self._promote_to_float()
+            self.kind = "float"
+            values = series.to_numpy(dtype="float64", na_value=np.nan)
+
+        with open(self.raw_path, "ab") as f:
+            f.write(values.tobytes())
+        self.rows += len(series)
+
+    def _promote_to_float(self):
+        converted = self.raw_path + ".float"
+        with open(self.mask_path, "rb") as masks, \
+                open(converted, "wb") as out:
+            for block in self._raw_blocks(DEFAULT_CHUNK_ROWS):
+                mask = np.frombuffer(masks.read(len(block)), dtype=bool)
+                out.write(np.where(mask, np.nan,
+                                   block.astype("float64")).tobytes())
+        os.replace(converted, self.raw_path)
+        os.remove(self.mask_path)
+        self.has_na = False
+
+    def _raw_blocks(self, chunk_rows):
+        dtype = np.dtype("float64" if self.kind == "float" else "int64")
+        with open(self.raw_path, "rb") as f:
+            while True:
+                block = np.frombuffer(f.read(chunk_rows * dtype.itemsize),
+                                      dtype=dtype)
+                if not len(block):
+                    return
+                yield block
+
+    def finalize(self, tmp_path, chunk_rows):
+        """轉寫成 .npy，回傳 manifest 中的欄位描述"""
+        entry = {"name": self.name, "file": self.file}
+        remap = None
+        if self.kind == "category":
+            # 類別依字母排序，與 pd.read_csv(dtype="category") 相同
+            labels = list(self.categories)
+            order = sorted(range(len(labels)), key=lambda i: labels[i])
+            remap = np.empty(len(labels), dtype=np.int64)
+            remap[order] = np.arange(len(labels))
+            entry["kind"] = "category"
+            entry["categories"] = [labels[i] for i in order]
+            dtype = _smallest_int(-1, len(labels))
+        elif self.kind == "int":
+            dtype = _smallest_int(self.low, self.high)
+            if self.has_na:
+                entry["kind"] = "nullable_int"
+                entry["dtype"] = dtype.capitalize()
+                entry["mask_file"] = self.file.replace(".npy", "_mask.npy")
+                mask = np.fromfile(self.mask_path, dtype=bool)
+                np.save(os.path.join(tmp_path, entry["mask_file"]), mask)
+            else:
+                entry["kind"] = "numeric"
+        else:
+            entry["kind"] = "numeric"
+            dtype = "float64"
+
+        out = np.lib.format.open_memmap(os.path.join(tmp_path, self.file),
+                                        mode="w+", dtype=dtype,
+                                        shape=(self.rows,))
+        start = 0
+        for block in self._raw_blocks(chunk_rows):
+            if remap is not None:
+                block = np.where(block >= 0, remap[np.maximum(block, 0)], -1)
+            out[start:start + len(block)] = block
+            start += len(block)
+        out.flush()
+        del out
+
+        for path in (self.raw_path, self.mask_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return entry
+
+
+class ColumnarCacheWriter:
+    """逐批寫入 data_cache 格式的欄式快取（完成後原子替換）"""
+
+    def __init__(self, source_path, cache_path,
+                 chunk_rows=DEFAULT_CHUNK_ROWS):
+        self.source_path = source_path
+        self.cache_path = cache_path
+        self.chunk_rows = chunk_rows
+        parent = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(parent, exist_ok=True)
+        self.tmp_path = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        self.columns = None
+        self.rows = 0
+
+    def append(self, chunk):
+        if self.columns is None:
+            self.columns = [
+                _ColumnWriter(col, i, self.tmp_path)
+                for i, col in enumerate(chunk.columns)
+            ]
+        for writer in self.columns:
+            writer.append(chunk[writer.name])
+        self.rows += len(chunk)
+
+    def finalize(self):
+        manifest = {
+            "version": CACHE_VERSION,
+            "rows": int(self.rows),
+            "source": source_fingerprint(self.source_path),
+            "columns": [
+                w.finalize(self.tmp_path, self.chunk_rows)
+                for w in self.columns or []
+            ],
+        }
+        with open(os.path.join(self.tmp_path, "manifest.json"), "w",
+                  encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        if os.path.exists(self.cache_path):
+            shutil.rmtree(self.cache_path)
+        os.replace(self.tmp_path, self.cache_path)
+
+    def abort(self):
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+class StreamingAggregator:
+    """逐批累積聚合立方體與解決時間摘要"""
+
+    def __init__(self):
+        self.cube = None
+        self.sketches = SketchSet()
+        self.schema = None
+        self.rows = 0
+
+    def add(self, chunk):
+        if self.schema is None:
+            self.schema = chunk.iloc[:0]
+        cube = AggregateCube(chunk)
+        self.cube = cube if self.cube is None else self.cube.merge(cube)
+        self.sketches = self.sketches.merge(SketchSet.build(chunk))
+        self.rows += len(chunk)
+
+    def result(self):
+        if self.cube is None:
+            return AggregateCube(pd.DataFrame()), SketchSet(), pd.DataFrame()
+        return self.cube, self.sketches, self.schema
+
+
+def ingest_csv(source_path, cache_path=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    分批讀取 CSV，只保留聚合結果（與選用的磁碟欄式快取）
+
+    Args:
+        source_path: CSV 路徑
+        cache_path: 原始資料列的快取資料夾，None 表示不保存資料列
+        chunk_rows: 每批的資料列數
+
+    Returns:
+        (df, cube, sketches)：有快取時 df 為 memory-map 的完整資料，
+        否則為只有欄位定義的空 DataFrame
+    """
+    aggregator = StreamingAggregator()
+
+    if cache_path and cache_is_valid(source_path, cache_path):
+        df = read_cache(cache_path)
+        print(f"✓ 從快取載入: {cache_path}，分批計算聚合結果")
+        for chunk in iter_frame_chunks(df, chunk_rows):
+            aggregator.add(chunk)
+        cube, sketches, _ = aggregator.result()
+        return df, cube, sketches
+
+    locked = False
+    writer = None
+    if cache_path:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)),
+                    exist_ok=True)
+        locked = _acquire_lock(cache_path + ".lock")
+        if locked:
+            writer = ColumnarCacheWriter(source_path, cache_path, chunk_rows)
+
+    try:
+        for i, chunk in enumerate(read_csv_chunks(source_path, chunk_rows)):
+            aggregator.add(chunk)
+            if writer:
+                writer.append(chunk)
+            if (i + 1) % 20 == 0:
+                print(f"  已讀取 {aggregator.rows} 筆資料")
+        if writer:
+            writer.finalize()
+            print(f"✓ 已建立快取: {cache_path}")
+    except Exception:
+        if writer:
+            writer.abort()
+        raise
+    finally:
+        if locked:
+            try:
+                os.remove(cache_path + ".lock")
+            except OSError:
+                pass
+
+    cube, sketches, schema = aggregator.result()
+    df = read_cache(cache_path) if writer else schema
+    return df, cube, sketches
@@ -0,0 +1,314 @@
+"""
+API 效能量測（Instrumentation）
+
+記錄每個 /api 請求的：
+- 總耗時（histogram）與各階段耗時（filter / aggregate / serialize ...）
+- 回應大小、回應快取是否命中
+- 處理前後的常駐記憶體（RSS）變化
+
+以 Prometheus 文字格式從 /metrics 輸出。設定 profile_dir 後，
+帶有 X-Profile: 1 標頭的請求會以 cProfile 量測，結果寫入該資料夾。
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+# 請求耗時的 histogram 區間（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+PROFILE_HEADER = "X-Profile"
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):  # Windows
+    _PAGE_SIZE = None
+
+# capture_stages() 收集中的耗時（每個執行緒各一份）
+_captured = threading.local()
+
+
+def current_rss():
+    """目前行程的常駐記憶體（bytes），無法取得時回傳 None"""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+@contextmanager
+def stage(name):
+    """
+    量測請求中某個階段的耗時
+
+        with stage("filter"):
+            rows = row_index.take(df, "Country", country)
+
+    不在請求中（例如背景執行緒）時不記錄；計算池的執行緒中
+    記錄在 capture_stages() 裡，再由請求執行緒以 record_stages() 帶回。
+    """
+    stages = getattr(_captured, "stages", None)
+    if stages is None:
+        if not has_request_context() or "metrics_stages" not in g:
+            yield
+            return
+        stages = g.metrics_stages
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def capture_stages():
+    """在目前的執行緒中收集 stage() 的耗時（沒有請求的背景執行緒使用）"""
+    _captured.stages = {}
+    try:
+        yield _captured.stages
+    finally:
+        _captured.stages = None
+
+
+def record_stages(stages):
+    """把 capture_stages() 收集到的耗時加進目前的請求"""
+    if not stages or not has_request_context() or "metrics_stages" not in g:
+        return
+    for name, seconds in stages.items():
+        g.metrics_stages[name] = g.metrics_stages.get(name, 0.0) + seconds
+
+
+def profiling():
+    """目前的請求是否正在以 cProfile 量測（X-Profile: 1）"""
+    return has_request_context() and "metrics_profiler" in g
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace(
+        "\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"'
+                          for k, v in labels.items()) + "}"
+
+
+class _EndpointStats:
+
+    def __init__(self):
+        self.statuses = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.duration_sum = 0.0
+        self.count = 0
+        self.stages = {}
+        self.bytes_sum = 0
+        self.cache_hits = 0
+        self.rss_delta_sum = 0
+
+
+class Instrumentation:
+    """
+    掛在 Flask app 上的請求量測
+
+    需要在其他 before/after_request（回應快取、壓縮）之前註冊，
+    總耗時才會包含快取查詢，回應大小才是壓縮後的大小。
+
+    Args:
+        prefix: 需要量測的路徑前綴
+        caches: {名稱: 有 stats() 方法的物件}，輸出命中率等統計
+        profile_dir: cProfile 結果的資料夾，None 表示停用
+    """
+
+    def __init__(self, app=None, prefix="/api/", caches=None,
+                 profile_dir=None):
+        self.prefix = prefix
+        self.caches = dict(caches or {})
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+        # cProfile 同一時間只能有一個在執行
+        self._profile_lock = threading.Lock()
+        self._endpoints = {}
+        self._started = time.time()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        if not request.path.startswith(self.prefix):
+            return
+        g.metrics_start = time.perf_counter()
+        g.metrics_stages = {}
+        g.metrics_rss = current_rss()
+
+        if (self.profile_dir and request.headers.get(PROFILE_HEADER) == "1"
+                and self._profile_lock.acquire(blocking=False)):
+            g.metrics_profiler = cProfile.Profile()
+            g.metrics_profiler.enable()
+
+    def _after_request(self, response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+
+        profiler = g.pop("metrics_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            self._profile_lock.release()
+            response.headers["X-Profile-File"] = self._dump_profile(
+                profiler, elapsed)
+
+        rss_before = g.pop("metrics_rss", None)
+        rss_after = current_rss() if rss_before is not None else None
+        endpoint = (request.url_rule.rule
+                    if request.url_rule is not None else "unmatched")
+        size = 0 if response.is_streamed else (
+            response.calculate_content_length() or 0)
+
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, _EndpointStats())
+            status = str(response.status_code)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.count += 1
+            stats.duration_sum += elapsed
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    stats.buckets[i] += 1
+            for name, seconds in g.pop("metrics_stages", {}).items():
+                total, count = stats.stages.get(name, (0.0, 0))
+                stats.stages[name] = (total + seconds, count + 1)
+            stats.bytes_sum += size
+            if g.pop("metrics_cache_hit", False):
+                stats.cache_hits += 1
+            if rss_after is not None:
+                stats.rss_delta_sum += rss_after - rss_before
+        return response
+
+    def _teardown_request(self, exc):
+        # 處理中發生例外（沒有經過 after_request）時也要釋放 profiler
+        profiler = g.pop("metrics_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            self._profile_lock.release()
+
+    def _dump_profile(self, profiler, elapsed):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_")
+        path = os.path.join(
+            self.profile_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{int(elapsed * 1000)}ms")
+        profiler.dump_stats(path + ".prof")
+
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats(
+            "cumulative").print_stats(30)
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"{request.full_path}\n{elapsed * 1000:.1f} ms\n\n")
+            f.write(text.getvalue())
+        print(f"✓ 已寫入 profile: {path}.prof")
+        return os.path.basename(path) + ".prof"
+
+    def render(self):
+        """Prometheus 文字格式"""
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+
+            metric("api_requests_total", "counter",
+                   "Requests by endpoint and status code.")
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append("api_requests_total" + _labels(
+                        endpoint=endpoint, status=status) + f" {count}")
+
+            metric("api_request_duration_seconds", "histogram",
+                   "Request latency including cache lookup.")
+            for endpoint, stats in endpoints:
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append("api_request_duration_seconds_bucket" +
+                                 _labels(endpoint=endpoint, le=bound) +
+                                 f" {count}")
+                lines.append("api_request_duration_seconds_bucket" +
+                             _labels(endpoint=endpoint, le="+Inf") +
+                             f" {stats.count}")
+                lines.append("api_request_duration_seconds_sum" +
+                             _labels(endpoint=endpoint) +
+                             f" {stats.duration_sum:.6f}")
+                lines.append("api_request_duration_seconds_count" +
+                             _labels(endpoint=endpoint) + f" {stats.count}")
+
+            metric("api_stage_duration_seconds", "summary",
+                   "Time spent in each stage of a request.")
+            for endpoint, stats in endpoints:
+                for name, (total, count) in sorted(stats.stages.items()):
+                    labels = _labels(endpoint=endpoint, stage=name)
+                    lines.append(f"api_stage_duration_seconds_sum{labels} "
+                                 f"{total:.6f}")
+                    lines.append(f"api_stage_duration_seconds_count{labels} "
+                                 f"{count}")
+
+            metric("api_response_bytes_total", "counter",
+                   "Response body bytes sent (after compression).")
+            for endpoint, stats in endpoints:
+                lines.append("api_response_bytes_total" +
+                             _labels(endpoint=endpoint) +
+                             f" {stats.bytes_sum}")
+
+            metric("api_response_cache_hits_total", "counter",
+                   "Requests answered from the response cache.")
+            for endpoint, stats in endpoints:
+                lines.append("api_response_cache_hits_total" +
+                             _labels(endpoint=endpoint) +
+                             f" {stats.cache_hits}")
+
+            metric("api_rss_delta_bytes_total", "counter",
+                   "Sum of resident memory change while handling requests.")
+            for endpoint, stats in endpoints:
+                lines.append("api_rss_delta_bytes_total" +
+                             _labels(endpoint=endpoint) +
+                             f" {stats.rss_delta_sum}")
+
+        caches = {name: cache.stats() for name, cache in self.caches.items()}
+        for key, kind, help_text in (
+            ("hits", "counter", "Cache hits."),
+            ("misses", "counter", "Cache misses."),
+            ("evictions", "counter", "Cache evictions."),
+            ("entries", "gauge", "Entries currently cached."),
+            ("bytes", "gauge", "Bytes currently cached."),
+            ("hit_rate", "gauge", "Hit rate since start."),
+        ):
+            name = f"cache_{key}" + ("_total" if kind == "counter" else "")
+            metric(name, kind, help_text)
+            for cache, stats in sorted(caches.items()):
+                if key in stats:
+                    lines.append(f"{name}{_labels(cache=cache)} "
+                                 f"{stats[key]}")
+
+        rss = current_rss()
+        if rss is not None:
+            metric("process_resident_memory_bytes", "gauge",
+                   "Resident memory size in bytes.")
+            lines.append(f"process_resident_memory_bytes {rss}")
+        metric("process_uptime_seconds", "gauge", "Seconds since start.")
+        lines.append(f"process_uptime_seconds {time.time() - self._started:.0f}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,111 @@
+"""
+有筆數與記憶體上限的 LRU 快取
+
+給帶參數的 endpoint（例如 /api/top_ips、/api/time_series）記住計算結果：
+常用的國家篩選直接命中快取，少見的長尾查詢超過上限時會被淘汰，
+不會讓記憶體無限成長。資料重新載入時呼叫 clear() 即可全部失效。
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+
+def estimate_size(obj, _seen=None):
+    """粗略估計物件（含內部元素）佔用的位元組數"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(
+            estimate_size(k, _seen) + estimate_size(v, _seen)
+            for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+class LRUCache:
+    """
+    執行緒安全的 LRU 快取
+
+    Args:
+        max_entries: 最多保留幾筆
+        max_bytes: 所有值估計大小的上限（None 表示不限制）
+        sizeof: 計算單筆大小的函式
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        # 單筆就超過上限的結果不保存
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+
+            while self._data and (
+                    len(self._data) > self.max_entries or
+                (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """有快取就回傳，否則呼叫 compute() 計算並存入"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
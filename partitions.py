@@ -0,0 +1,250 @@
+"""
+分區資料集（Partitioned Dataset）
+
+data/ 內的每個 CSV（例如每個地區 / 每個月匯出一份）是一個分區：
+- 載入時以行程池平行解析各分區並計算聚合結果，再合併成一份，
+  載入時間隨 CPU 核心數縮短
+- 資料列不合併：每個分區保留自己 memory-map 的欄式快取與列索引，
+  多個 worker 仍共用同一份唯讀的資料
+- 每個分區記錄 Year / Country 出現過的值（zone map），
+  查詢篩選這些欄位時只讀取可能有符合資料的分區
+
+多個 worker 行程使用 spawn 啟動，不會複製主行程中的執行緒與鎖。
+"""
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube
+from data_cache import (DEFAULT_CACHE_DIR, cache_is_valid, cache_path_for,
+                        load_cached_csv, read_cache)
+from indexes import RowIndex
+from ingest import DEFAULT_CHUNK_ROWS, ingest_csv
+from schema import concat_frames, read_threats_csv
+from sketches import SketchSet
+
+# 記錄分區內出現過哪些值的欄位（可用來略過分區）
+PARTITION_COLUMNS = ["Year", "Country"]
+
+# 檔案總大小小於此值（MB）時在目前行程中依序載入，啟動行程池反而較慢
+PARALLEL_MIN_MB = 64
+
+
+def _distinct(values):
+    return pd.Index(np.asarray(values)).dropna()
+
+
+def frame_values(df, columns=PARTITION_COLUMNS):
+    """資料列中分區欄位出現過的值"""
+    return {
+        col: _distinct(df[col].unique())
+        for col in columns if col in df.columns
+    }
+
+
+def cube_values(cube, columns=PARTITION_COLUMNS):
+    """聚合結果中分區欄位出現過的值（不必讀取資料列）"""
+    return {
+        col: _distinct(cube.counts(col).index)
+        for col in columns if cube.has(col)
+    }
+
+
+class Partition:
+    """
+    單一分區
+
+    資料列在快照 df 的 [start, start + rows) 範圍內；
+    或由 frame 提供（各分區自己 memory-map 的欄式快取、附加的資料列），
+    index 為 frame 的列索引，沒有時逐列篩選。
+    """
+
+    def __init__(self, source, rows, values, start=None, frame=None,
+                 index=None):
+        self.source = source
+        self.rows = int(rows)
+        self.values = values
+        self.start = start
+        self.frame = frame
+        self.index = index
+
+    def may_match(self, filters):
+        """filters 為 {欄位: 函式}，函式接收欄位值（Index）回傳布林遮罩"""
+        for column, predicate in filters.items():
+            values = self.values.get(column)
+            if values is not None and not np.asarray(predicate(values),
+                                                     dtype=bool).any():
+                return False
+        return True
+
+    def describe(self):
+        info = {"source": self.source, "rows": self.rows}
+        for column, values in self.values.items():
+            if len(values) <= 20:
+                info[column] = values.tolist()
+            else:
+                info[column] = f"{len(values)} values"
+        return info
+
+
+class PartitionMap:
+    """快照中所有分區（建立後不再修改，新增分區時回傳新的物件）"""
+
+    def __init__(self, partitions=()):
+        self.partitions = tuple(partitions)
+
+    def __len__(self):
+        return len(self.partitions)
+
+    def __iter__(self):
+        return iter(self.partitions)
+
+    def add(self, partition):
+        return PartitionMap(self.partitions + (partition,))
+
+    def appended(self):
+        """資料列不在 df 中、只在 frame 中的分區（串流載入或附加的資料）"""
+        return [p for p in self.partitions
+                if p.start is None and p.frame is not None]
+
+    def prune(self, filters):
+        """可能有符合 filters 的資料列的分區"""
+        return [p for p in self.partitions if p.may_match(filters)]
+
+    def frames(self, df, filters):
+        """
+        只讀取可能符合的分區，回傳 (資料列的清單, 讀取的分區數)
+
+        資料列在 df 中的分區合併成一個 DataFrame；串流載入（或附加後尚未
+        合併進 df）的分區各一個，呼叫端可以逐一篩選，不必先合併整份資料。
+        回傳的資料列仍需再套用 filters（分區只保證「可能」符合）。
+        """
+        if not self.partitions:
+            return [df], 0
+        parts = self.prune(filters)
+
+        frames = []
+        in_df = [p for p in self.partitions if p.start is not None]
+        matched = [p for p in parts if p.start is not None]
+        if matched and len(matched) == len(in_df):
+            frames.append(df)
+        elif matched:
+            positions = np.concatenate(
+                [np.arange(p.start, p.start + p.rows) for p in matched])
+            frames.append(df.iloc[positions])
+        frames += [p.frame for p in parts
+                   if p.start is None and p.frame is not None]
+        return frames or [df.iloc[:0]], len(parts)
+
+    def take(self, df, filters):
+        """同 frames()，但合併成單一 DataFrame"""
+        frames, scanned = self.frames(df, filters)
+        return concat_frames(frames) if len(frames) > 1 else frames[0], \
+            scanned
+
+    def describe(self):
+        return [p.describe() for p in self.partitions]
+
+
+def _frame_partitions(paths, frames):
+    """
+    每個分區保留自己 memory-map 的資料列與列索引
+
+    不合併成一個 DataFrame：合併會把資料列複製到每個 worker 自己的 heap，
+    多個 worker 就不再共用同一份唯讀的欄式快取。
+    """
+    return PartitionMap([
+        Partition(path, len(frame), frame_values(frame), frame=frame,
+                  index=RowIndex(frame))
+        for path, frame in zip(paths, frames)
+    ])
+
+
+def _load_partition(path, streamed, cache_dir, chunk_rows, row_store):
+    """
+    在 worker 行程中載入單一分區，只回傳聚合結果與欄位定義
+
+    資料列寫入欄式快取，主行程再以 memory-map 開啟，不必經過 pickle 傳遞。
+    """
+    if streamed:
+        cache_path = cache_path_for(path, cache_dir) if row_store else None
+        df, cube, sketches = ingest_csv(path, cache_path, chunk_rows)
+    else:
+        df = load_cached_csv(path, read_threats_csv, cache_dir=cache_dir)
+        cube, sketches = AggregateCube(df), SketchSet.build(df)
+    return cube, sketches, df.iloc[:0]
+
+
+def load_partitions(paths, workers=None, streamed=False,
+                    cache_dir=DEFAULT_CACHE_DIR, chunk_rows=DEFAULT_CHUNK_ROWS,
+                    row_store=True):
+    """
+    平行載入多個分區並合併
+
+    Args:
+        paths: 各分區的 CSV 路徑
+        workers: 行程數，None 為 CPU 核心數（檔案總大小小於
+            PARALLEL_MIN_MB 時為 1）；1 表示在目前行程中依序載入
+        streamed: 是否分批串流載入（只保留聚合結果與磁碟上的資料列）
+        cache_dir: 欄式快取目錄
+        chunk_rows: 串流載入時每批的資料列數
+        row_store: 串流載入時是否保存資料列
+
+    Returns:
+        (df, cube, sketches, partitions)：df 只有欄位定義，
+        資料列在各分區的 frame 中（memory-map）
+    """
+    paths = list(paths)
+    if workers is None:
+        size_mb = sum(os.path.getsize(p) for p in paths) / 1024 / 1024
+        workers = (os.cpu_count() or 1) if size_mb >= PARALLEL_MIN_MB else 1
+    workers = min(workers, len(paths))
+    if workers <= 1 and not streamed:
+        frames = [
+            load_cached_csv(path, read_threats_csv, cache_dir=cache_dir)
+            for path in paths
+        ]
+        cube, sketches = AggregateCube(frames[0]), SketchSet.build(frames[0])
+        for frame in frames[1:]:
+            cube = cube.merge(AggregateCube(frame))
+            sketches = sketches.merge(SketchSet.build(frame))
+        return (concat_frames([frame.iloc[:0] for frame in frames]), cube,
+                sketches, _frame_partitions(paths, frames))
+
+    args = [(path, streamed, cache_dir, chunk_rows, row_store)
+            for path in paths]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=mp.get_context("spawn")) as pool:
+            results = list(pool.map(_load_partition, *zip(*args)))
+    else:
+        results = [_load_partition(*a) for a in args]
+
+    cube, sketches, _ = results[0]
+    for other_cube, other_sketches, _ in results[1:]:
+        cube = cube.merge(other_cube)
+        sketches = sketches.merge(other_sketches)
+
+    if streamed:
+        partitions = PartitionMap()
+        for path, (part_cube, _, _) in zip(paths, results):
+            cache_path = cache_path_for(path, cache_dir)
+            frame = (read_cache(cache_path) if row_store
+                     and cache_is_valid(path, cache_path) else None)
+            partitions = partitions.add(
+                Partition(path, part_cube.total_rows, cube_values(part_cube),
+                          frame=frame))
+        df = concat_frames([schema for _, _, schema in results])
+        return df, cube, sketches, partitions
+
+    # 快取已由 worker 寫好，這裡直接 memory-map
+    frames = [
+        load_cached_csv(path, read_threats_csv, cache_dir=cache_dir)
+        for path in paths
+    ]
+    return (concat_frames([frame.iloc[:0] for frame in frames]), cube,
+            sketches, _frame_partitions(paths, frames))
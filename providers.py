@@ -0,0 +1,178 @@
+"""
+資料集來源（Dataset Providers）
+
+啟動時優先使用 data/ 內已存在的 CSV，不會因為網路而卡住；
+Kaggle 下載改成在背景執行緒進行，只在本機沒有資料、
+或明確開啟 DATASET_REMOTE_REFRESH 時才會嘗試。
+"""
+
+import os
+import threading
+import time
+
+KAGGLE_DATASET = "atharvasoundankar/global-cybersecurity-threats-2015-2024"
+
+
+class LocalFileProvider:
+    """從本機資料夾讀取 CSV"""
+
+    name = "local"
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+
+    def find(self):
+        """
+        回傳資料夾中所有 CSV 的路徑（依檔名排序），沒有則回傳 None
+
+        每個檔案是資料集的一個分區（例如每個地區 / 每個月一份）。
+        """
+        if not os.path.isdir(self.data_dir):
+            return None
+        csv_files = sorted(
+            f for f in os.listdir(self.data_dir) if f.endswith(".csv"))
+        if not csv_files:
+            return None
+        return [os.path.join(self.data_dir, f) for f in csv_files]
+
+
+class KaggleProvider:
+    """使用 Kaggle API 下載資料集到本機資料夾"""
+
+    name = "kaggle"
+
+    def __init__(self, data_dir="data", dataset=KAGGLE_DATASET):
+        self.data_dir = data_dir
+        self.dataset = dataset
+
+    def fetch(self):
+        """從 Kaggle 下載資料集，成功回傳 True"""
+        print("正在嘗試使用 Kaggle API 下載資料集...")
+
+        kaggle_username = os.environ.get("KAGGLE_USERNAME")
+        kaggle_key = os.environ.get("KAGGLE_KEY")
+
+        if kaggle_username and kaggle_key:
+            print("✓ 從環境變數讀取 Kaggle 憑證")
+        elif os.path.exists("kaggle.json"):
+            print("✓ 找到專案內的 kaggle.json")
+            os.environ["KAGGLE_CONFIG_DIR"] = os.path.abspath(".")
+
+        import kaggle
+
+        kaggle.api.dataset_download_files(
+            self.dataset,
+            path=self.data_dir,
+            unzip=True,
+        )
+        print("✓ 成功從 Kaggle 下載資料集")
+        return True
+
+
+class DatasetBootstrap:
+    """
+    依序嘗試各資料來源並回報狀態
+
+    Args:
+        local: LocalFileProvider，啟動時同步讀取
+        remote: 遠端來源（例如 KaggleProvider），只在背景執行緒中使用
+        loader: 把 CSV 路徑清單轉成資料集的函式（回傳值需支援 len()）
+        on_load: 載入成功後呼叫，參數為 (loader 的回傳值, 檔案路徑清單)
+        remote_refresh: 本機已有資料時是否仍在背景更新
+    """
+
+    def __init__(self, local, remote=None, loader=None, on_load=None,
+                 remote_refresh=False):
+        self.local = local
+        self.remote = remote
+        self.loader = loader
+        self.on_load = on_load
+        self.remote_refresh = remote_refresh
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {
+            "state": "starting",
+            "source": None,
+            "path": None,
+            "rows": 0,
+            "loaded_at": None,
+            "error": None,
+            "remote": {
+                "state": "idle",
+                "last_attempt": None,
+                "error": None,
+            },
+        }
+
+    def start(self):
+        """同步載入本機資料，需要時再開背景執行緒下載"""
+        path = self.local.find()
+        if path:
+            self._load(path, self.local.name)
+        else:
+            self._update(state="waiting", error="No local dataset found")
+            print("! data/ 內沒有資料檔案，將在背景嘗試下載")
+
+        if self.remote and (path is None or self.remote_refresh):
+            self.refresh_async()
+
+    def refresh_async(self):
+        """在背景執行緒中從遠端更新資料（已在執行時不重複啟動）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._refresh,
+                                            name="dataset-refresh",
+                                            daemon=True)
+            self._thread.start()
+        return True
+
+    def _refresh(self):
+        self._update_remote(state="running", last_attempt=time.time(),
+                            error=None)
+        try:
+            self.remote.fetch()
+        except Exception as e:
+            print(f"! 無法從 {self.remote.name} 下載: {e}")
+            self._update_remote(state="failed", error=str(e))
+            return
+
+        self._update_remote(state="done")
+        path = self.local.find()
+        if path:
+            self._load(path, self.remote.name)
+
+    def _load(self, path, source):
+        try:
+            df = self.loader(path)
+            if self.on_load:
+                self.on_load(df, path)
+        except Exception as e:
+            print(f"! 資料載入失敗: {e}")
+            self._update(state="failed", error=str(e))
+            return
+
+        self._update(state="ready", source=source, path=path,
+                     rows=int(len(df)), loaded_at=time.time(), error=None)
+
+    def _update(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    def _update_remote(self, **fields):
+        with self._lock:
+            self._status["remote"].update(fields)
+
+    @property
+    def ready(self):
+        with self._lock:
+            return self._status["state"] == "ready"
+
+    def health(self):
+        """目前的載入狀態（給 /api/health 使用）"""
+        with self._lock:
+            status = dict(self._status)
+            status["remote"] = dict(self._status["remote"])
+        status["ready"] = status["state"] == "ready"
+        return status
@@ -0,0 +1,393 @@
+"""
+通用查詢（/api/query）
+
+以參數描述「依哪些欄位分組、篩選哪些值、計算哪些指標」，
+不必為每一種圖表新增 endpoint。執行時依序嘗試：
+
+1. 聚合立方體：分組與篩選欄位都有預先計算、指標不含分位數時，
+   只在組合表上篩選與加總，成本與資料筆數無關
+2. 列索引：以最有選擇性的等值 / IN 篩選取出列位置，
+   其餘條件只套用在這些列上
+3. 分區掃描：沒有可用的索引時，只讀取 Year / Country 可能符合的分區
+   （見 partitions.py），沒有可略過的分區即為全表掃描
+
+2、3 由快照的 store 執行（見 storage.py）；SQLite 後端改由資料庫
+以索引篩選。
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from aggregates import stat_column
+from instrumentation import stage
+
+# 一次最多回傳幾組
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+# 指標格式：count、sum(欄位)、mean(欄位)、p90(欄位)、median(欄位)
+_METRIC_RE = re.compile(r"([A-Za-z]+\d*)\s*(?:\((.*)\))?")
+
+_CUBE_FUNCTIONS = {"count", "sum", "mean", "min", "max", "std"}
+
+# 非篩選條件的參數
+RESERVED_PARAMS = {"group_by", "metrics", "order", "limit"}
+
+
+class QueryError(ValueError):
+    """查詢格式錯誤"""
+
+
+class Metric:
+    """單一指標：函式名稱與欄位（count 不需要欄位）"""
+
+    def __init__(self, func, column=None):
+        func = func.lower()
+        if func == "median":
+            func = "p50"
+        if func != "count" and not column:
+            raise QueryError(f"Metric '{func}' needs a column")
+        if func not in _CUBE_FUNCTIONS and not re.fullmatch(r"p\d{1,2}",
+                                                             func):
+            raise QueryError(f"Unknown metric '{func}'")
+        self.func = func
+        self.column = column or None
+
+    @property
+    def name(self):
+        return self.func if self.func == "count" else \
+            f"{self.func}({self.column})"
+
+    @property
+    def quantile(self):
+        return int(self.func[1:]) / 100 if self.func.startswith("p") \
+            else None
+
+
+class Filter:
+    """單一欄位的篩選：values（IN）或 low / high（範圍，含端點）"""
+
+    def __init__(self, column, values=None, low=None, high=None):
+        self.column = column
+        self.values = values
+        self.low = low
+        self.high = high
+
+    def mask(self, values):
+        """對欄位值（Series 或 Index）回傳布林陣列"""
+        if self.values is not None:
+            return np.asarray(values.isin(self.values), dtype=bool)
+        mask = np.ones(len(values), dtype=bool)
+        if self.low is not None:
+            mask &= np.asarray(values >= self.low, dtype=bool)
+        if self.high is not None:
+            mask &= np.asarray(values <= self.high, dtype=bool)
+        return mask
+
+    def describe(self):
+        if self.values is not None:
+            return {"in": self.values}
+        return {"gte": self.low, "lte": self.high}
+
+
+class Query:
+    """解析後的查詢（見 parse_query）"""
+
+    def __init__(self, group_by, filters, metrics, order=None,
+                 limit=DEFAULT_LIMIT):
+        self.group_by = group_by
+        self.filters = filters
+        self.metrics = metrics
+        self.order = order
+        self.limit = limit
+
+    def key(self):
+        """可當作快取 key 的正規化內容（相同的查詢得到相同的 key）"""
+        return (tuple(self.group_by),
+                tuple(sorted((c, repr(f.describe()))
+                             for c, f in self.filters.items())),
+                tuple(m.name for m in self.metrics), self.order, self.limit)
+
+
+def _split_list(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value or "").split(",") if v.strip()]
+
+
+def _split_top_level(value):
+    """以逗號分隔，括號內的逗號不分（欄位名稱本身可能含括號）"""
+    parts, depth, current = [], 0, []
+    for ch in value:
+        if ch == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        depth += (ch == "(") - (ch == ")")
+        current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _parse_metrics(value):
+    if isinstance(value, (list, tuple)):
+        tokens = [str(v).strip() for v in value if str(v).strip()]
+    else:
+        tokens = _split_top_level(value or "")
+    metrics = []
+    for token in tokens or ["count"]:
+        match = _METRIC_RE.fullmatch(token)
+        if not match:
+            raise QueryError(f"Invalid metric '{token}'")
+        metrics.append(Metric(match.group(1), (match.group(2) or "").strip()))
+    return metrics
+
+
+def _coerce(df, column, value):
+    """把參數字串轉成欄位的型別"""
+    dtype = df[column].dtype
+    if isinstance(dtype, pd.CategoricalDtype) or not \
+            pd.api.types.is_numeric_dtype(dtype):
+        return str(value)
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"'{value}' is not a number for '{column}'")
+    if pd.api.types.is_integer_dtype(dtype) and number.is_integer():
+        return int(number)
+    return number
+
+
+def _parse_filter(df, column, spec):
+    """
+    篩選條件：
+        "China"、"China,USA"、["China", "USA"]   → IN
+        "2018..2020"、"2018.."、"..2020"          → 範圍（數值欄位）
+        {"in": [...]} 或 {"gte": 2018, "lte": 2020}
+    """
+    if column not in df.columns:
+        raise QueryError(f"Unknown filter column '{column}'")
+
+    numeric = pd.api.types.is_numeric_dtype(df[column].dtype) and \
+        not isinstance(df[column].dtype, pd.CategoricalDtype)
+    is_range = (isinstance(spec, dict) and "in" not in spec) or \
+        (isinstance(spec, str) and ".." in spec)
+    if is_range and not numeric:
+        raise QueryError(f"Range filter needs a numeric column: '{column}'")
+
+    if isinstance(spec, dict):
+        if "in" in spec:
+            if not isinstance(spec["in"], (list, tuple)):
+                raise QueryError(f"'in' must be a list for '{column}'")
+            spec = list(spec["in"])
+        else:
+            low, high = spec.get("gte"), spec.get("lte")
+            return Filter(
+                column,
+                low=None if low is None else _coerce(df, column, low),
+                high=None if high is None else _coerce(df, column, high))
+
+    if isinstance(spec, str) and ".." in spec:
+        low, _, high = spec.partition("..")
+        return Filter(
+            column,
+            low=_coerce(df, column, low) if low.strip() else None,
+            high=_coerce(df, column, high) if high.strip() else None)
+
+    values = _split_list(spec)
+    if not values:
+        raise QueryError(f"Empty filter for '{column}'")
+    return Filter(column, values=[_coerce(df, column, v) for v in values])
+
+
+def _parse_order(value, metrics, group_by):
+    if not value:
+        return None
+    descending = value.startswith("-")
+    name = value.lstrip("-+").strip()
+    names = list(group_by) + [m.name for m in metrics]
+    if name not in names:
+        raise QueryError(f"Cannot order by '{name}'")
+    return name, descending
+
+
+def parse_query(df, params):
+    """
+    從 query string（MultiDict）或 JSON 物件建立 Query
+
+    除了 group_by / metrics / order / limit 以外的參數都是篩選條件，
+    JSON 時可以放在 "filters" 物件中。
+    """
+    if hasattr(params, "getlist"):
+        filters_spec = {
+            key: ",".join(params.getlist(key))
+            for key in params.keys() if key not in RESERVED_PARAMS
+        }
+    else:
+        if not isinstance(params, dict):
+            raise QueryError("Query must be a JSON object")
+        filters_spec = params.get("filters") or {}
+        if not isinstance(filters_spec, dict):
+            raise QueryError("'filters' must be a JSON object")
+        filters_spec = dict(filters_spec)
+
+    group_by = _split_list(params.get("group_by"))
+    for column in group_by:
+        if column not in df.columns:
+            raise QueryError(f"Unknown group_by column '{column}'")
+    if len(set(group_by)) != len(group_by):
+        raise QueryError("group_by must not repeat")
+
+    metrics = _parse_metrics(params.get("metrics"))
+    for metric in metrics:
+        if metric.column is None:
+            continue
+        if metric.column not in df.columns or not \
+                pd.api.types.is_numeric_dtype(df[metric.column].dtype):
+            raise QueryError(f"'{metric.column}' is not a numeric column")
+
+    filters = {
+        column: _parse_filter(df, column, spec)
+        for column, spec in filters_spec.items()
+    }
+
+    try:
+        limit = int(params.get("limit") or DEFAULT_LIMIT)
+    except (TypeError, ValueError):
+        raise QueryError("limit must be an integer")
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    return Query(group_by, filters, metrics,
+                 _parse_order(params.get("order"), metrics, group_by), limit)
+
+
+def _cube_plan(query, cube):
+    """聚合立方體能否回答這個查詢"""
+    if any(m.func not in _CUBE_FUNCTIONS for m in query.metrics):
+        return False
+    if any(m.column is not None and m.column not in cube.measures
+           for m in query.metrics):
+        return False
+    dims = set(query.group_by) | set(query.filters)
+    return cube.has(*dims)
+
+
+def _from_cube(query, cube):
+    table = cube.rollup(query.group_by, {
+        column: f.mask
+        for column, f in query.filters.items()
+    })
+    if not query.group_by:
+        table = table.iloc[:1]
+
+    result = {}
+    for metric in query.metrics:
+        if metric.func == "count":
+            result[metric.name] = table["rows"]
+            continue
+        n = table[stat_column(metric.column, "count")].astype("float64")
+        total = table[stat_column(metric.column, "sum")]
+        if metric.func == "sum":
+            result[metric.name] = total
+        elif metric.func == "mean":
+            result[metric.name] = total / n.where(n > 0)
+        elif metric.func == "std":
+            sumsq = table[stat_column(metric.column, "sumsq")]
+            var = (sumsq - total**2 / n) / (n - 1).where(n > 1)
+            result[metric.name] = np.sqrt(var.clip(lower=0))
+        else:
+            values = table[stat_column(metric.column, metric.func)]
+            result[metric.name] = values.where(n > 0)
+    frame = pd.DataFrame(result, index=table.index)
+    # 篩選後沒有資料的組合不回傳
+    if query.group_by:
+        frame = frame[table["rows"].to_numpy() > 0]
+    return frame
+
+
+def _from_rows(query, rows):
+    if query.group_by:
+        grouped = rows.groupby(query.group_by, observed=True, sort=True)
+    result = {}
+    for metric in query.metrics:
+        if metric.func == "count":
+            result[metric.name] = (grouped.size() if query.group_by else
+                                   pd.Series([len(rows)]))
+            continue
+        if query.group_by:
+            column = grouped[metric.column]
+            values = (column.quantile(metric.quantile)
+                      if metric.quantile is not None else
+                      column.agg(metric.func))
+        else:
+            column = rows[metric.column]
+            values = pd.Series([
+                column.quantile(metric.quantile)
+                if metric.quantile is not None else column.agg(metric.func)
+            ])
+        result[metric.name] = values
+    return pd.DataFrame(result)
+
+
+def _jsonable(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def execute(query, snap):
+    """
+    執行查詢
+
+    Returns:
+        dict: columns、rows（每組一列）、total_groups，
+        以及實際使用的執行方式 plan
+
+    Raises:
+        QueryError: 需要資料列，但快照沒有保存資料列
+    """
+    if _cube_plan(query, snap.cube):
+        with stage("aggregate"):
+            frame = _from_cube(query, snap.cube)
+        plan = {"source": "cube"}
+    else:
+        if not snap.has_rows:
+            raise QueryError("Raw data is not available for streamed "
+                             "datasets, use a query the aggregate cube "
+                             "can answer")
+        # 只讀取分組與指標需要的欄位（SQLite 後端只查詢這些欄位）
+        columns = list(dict.fromkeys(
+            list(query.group_by) +
+            [m.column for m in query.metrics if m.column is not None]))
+        with stage("filter"):
+            rows, plan = snap.store.select(
+                columns or list(snap.df.columns[:1]), query.filters)
+        with stage("groupby"):
+            frame = _from_rows(query, rows)
+
+    if query.group_by:
+        frame = frame.reset_index()
+    total_groups = len(frame)
+
+    if query.order:
+        name, descending = query.order
+        frame = frame.sort_values(name, ascending=not descending,
+                                  kind="stable")
+    frame = frame.head(query.limit)
+
+    columns = list(query.group_by) + [m.name for m in query.metrics]
+    data = [[_jsonable(v) for v in row]
+            for row in frame[columns].itertuples(index=False, name=None)]
+    return {
+        "group_by": query.group_by,
+        "filters": {c: f.describe() for c, f in query.filters.items()},
+        "metrics": [m.name for m in query.metrics],
+        "columns": columns,
+        "rows": data,
+        "total_groups": total_groups,
+        "plan": plan,
+    }
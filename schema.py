@@ -0,0 +1,147 @@
+"""
+資料集欄位型別定義（Typed Schema）
+
+類別欄位以 category 儲存（底層是 int8/int16 代碼），
+整數欄位縮減成最小的整數型別，降低每個 worker 的記憶體用量，
+也讓 groupby 直接在整數代碼上運算。
+"""
+
+import numpy as np
+import pandas as pd
+
+# 類別欄位：重複值多，適合用 category
+CATEGORICAL_COLUMNS = [
+    "Country",
+    "Attack Type",
+    "Target Industry",
+    "Attack Source",
+    "Security Vulnerability Type",
+    "Defense Mechanism Used",
+]
+
+# 整數欄位：縮減為能容納資料範圍的最小整數型別
+INTEGER_COLUMNS = [
+    "Year",
+    "Number of Affected Users",
+    "Incident Resolution Time (in Hours)",
+]
+
+# 浮點數欄位：保留 float64，避免加總時損失精度
+FLOAT_COLUMNS = [
+    "Financial Loss (in Million $)",
+]
+
+# numpy 整數型別 → 對應的 pandas nullable 型別（有缺值時使用）
+_NULLABLE_INTS = {
+    "int8": "Int8",
+    "int16": "Int16",
+    "int32": "Int32",
+    "int64": "Int64",
+}
+
+
+def downcast_integer(series):
+    """把數值欄位轉成能容納所有值的最小整數型別"""
+    numeric = pd.to_numeric(series, errors="coerce")
+    values = numeric.dropna()
+
+    # 含小數的欄位不能轉成整數
+    if not values.empty and not np.all(np.mod(values, 1) == 0):
+        return numeric
+
+    dtype = "int64"
+    low = int(values.min()) if not values.empty else 0
+    high = int(values.max()) if not values.empty else 0
+    for candidate in ("int8", "int16", "int32"):
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            dtype = candidate
+            break
+
+    if numeric.isna().any():
+        return numeric.astype(_NULLABLE_INTS[dtype])
+    return numeric.astype(dtype)
+
+
+def apply_schema(df):
+    """依照欄位定義轉換 DataFrame 的型別（回傳新的 DataFrame）"""
+    df = df.copy()
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype,
+                                                pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            df[col] = downcast_integer(df[col])
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    return df
+
+
+def concat_frames(frames):
+    """
+    合併多個已套用 schema 的 DataFrame
+
+    類別欄位先統一成相同的 categories（取聯集），
+    避免 pd.concat 遇到不同 categories 時退化成 object 字串。
+    """
+    frames = [f for f in frames if len(f.columns)]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+
+    unified = {}
+    for col in frames[0].columns:
+        if all(col in f.columns and isinstance(f[col].dtype,
+                                              pd.CategoricalDtype)
+               for f in frames):
+            unified[col] = pd.api.types.union_categoricals(
+                [f[col] for f in frames], ignore_order=True).categories
+
+    frames = [
+        f.assign(**{
+            col: f[col].cat.set_categories(categories)
+            for col, categories in unified.items()
+        }) for f in frames
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_threats_csv(path, **kwargs):
+    """讀取 CSV 並直接以 category 解析類別欄位"""
+    dtype = {col: "category" for col in CATEGORICAL_COLUMNS}
+    df = pd.read_csv(path, dtype=dtype, **kwargs)
+    return apply_schema(df)
+
+
+def memory_report(df):
+    """
+    回傳記憶體使用量報告
+
+    df 也可以是 DataFrame 的清單（各分區分別保存資料列時），結果為合計。
+
+    Returns:
+        dict: total_bytes、rows，以及每個欄位的 dtype 與 bytes
+    """
+    frames = df if isinstance(df, (list, tuple)) else [df]
+    df = frames[0]
+    usage = sum(f.memory_usage(deep=True, index=True) for f in frames)
+    columns = {
+        col: {
+            "dtype": str(df[col].dtype),
+            "bytes": int(usage[col]),
+        }
+        for col in df.columns
+    }
+    return {
+        "rows": int(sum(len(f) for f in frames)),
+        "total_bytes": int(usage.sum()),
+        "total_mb": round(float(usage.sum()) / 1024 / 1024, 3),
+        "columns": columns,
+    }
@@ -0,0 +1,105 @@
+"""
+JSON 序列化
+
+- 有安裝 orjson 時使用 orjson（C 實作，numpy 陣列直接編碼），
+  沒有時退回標準函式庫 json
+- numpy 陣列 / 純量可以直接放進回應，不必先 .tolist()
+- 大型陣列可以用 stream_json() 分段輸出，不必一次組出整份字串
+"""
+
+import json
+import math
+
+import numpy as np
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+from instrumentation import stage
+
+try:
+    import orjson
+except ImportError:  # 選裝套件
+    orjson = None
+
+# 串流輸出時每段陣列的元素數
+STREAM_CHUNK_SIZE = 10000
+
+
+def to_builtin(obj):
+    """把 numpy / pandas 物件轉成 json 可以處理的型別"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        value = float(obj)
+        return None if math.isnan(value) else value
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} "
+                    "is not JSON serializable")
+
+
+def dumps_bytes(obj, sort_keys=True):
+    """序列化成 UTF-8 bytes"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=to_builtin, option=option)
+        except TypeError:
+            # 例如非連續記憶體的 numpy 陣列，交給標準函式庫處理
+            pass
+    return json.dumps(obj,
+                      default=to_builtin,
+                      sort_keys=sort_keys,
+                      ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask 的 JSON provider：jsonify() 改用 dumps_bytes()"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, sort_keys=self.sort_keys).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with stage("serialize"):
+            body = dumps_bytes(obj, sort_keys=self.sort_keys)
+        return self._app.response_class(body,
+                                        mimetype=self.mimetype)
+
+
+def iter_json(obj, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    逐段產生 obj 的 JSON（bytes）
+
+    dict 逐個 key 輸出，長度超過 chunk_size 的 list / numpy 陣列
+    每 chunk_size 個元素輸出一段。
+    """
+    if isinstance(obj, dict):
+        yield b"{"
+        for i, key in enumerate(sorted(obj, key=str)):
+            if i:
+                yield b","
+            yield dumps_bytes(str(key)) + b":"
+            yield from iter_json(obj[key], chunk_size)
+        yield b"}"
+    elif isinstance(obj, (list, tuple, np.ndarray)) and len(obj) > chunk_size:
+        yield b"["
+        for start in range(0, len(obj), chunk_size):
+            if start:
+                yield b","
+            yield dumps_bytes(obj[start:start + chunk_size])[1:-1]
+        yield b"]"
+    else:
+        yield dumps_bytes(obj)
+
+
+def stream_json(obj, chunk_size=STREAM_CHUNK_SIZE):
+    """以串流方式回傳 JSON（不會被回應快取保存）"""
+    return Response(iter_json(obj, chunk_size), mimetype="application/json")
@@ -0,0 +1,59 @@
+"""
+正式環境的啟動方式
+
+`python app.py` 是單一行程的除錯伺服器，只適合開發。正式環境使用：
+
+    python serve.py --port 5001 --threads 16
+        有安裝 waitress 時使用 waitress（Windows 也可用），
+        否則使用 Werkzeug 的多執行緒伺服器（關閉除錯與自動重新載入）
+
+    gunicorn -w 4 --threads 8 -b 0.0.0.0:5001 serve:app
+        多個行程（Linux / macOS），每個行程各自載入資料集
+
+    uvicorn serve:asgi_app --workers 4 --port 5001
+        ASGI 伺服器（需安裝 asgiref）
+
+每個請求在自己的執行緒中處理，較重的計算交給計算池
+（COMPUTE_WORKERS / COMPUTE_MAX_PENDING，見 serving.py），
+相同的計算同時只執行一次。
+"""
+
+import argparse
+
+# 分區平行載入的子行程（spawn）會以 __mp_main__ 匯入本模組，不重複載入資料
+if __name__ != "__mp_main__":
+    from app import app
+
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+
+        asgi_app = WsgiToAsgi(app)
+    except ImportError:
+        asgi_app = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="啟動儀表板伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--threads", type=int, default=16,
+                        help="同時處理的請求數")
+    args = parser.parse_args()
+
+    try:
+        from waitress import serve
+    except ImportError:
+        from werkzeug.serving import run_simple
+
+        print(f"✓ Werkzeug 多執行緒伺服器: http://{args.host}:{args.port}")
+        run_simple(args.host, args.port, app, threaded=True,
+                   use_reloader=False, use_debugger=False)
+        return
+
+    print(f"✓ waitress（{args.threads} 個執行緒）: "
+          f"http://{args.host}:{args.port}")
+    serve(app, host=args.host, port=args.port, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
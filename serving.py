@@ -0,0 +1,107 @@
+"""
+計算池（Compute Pool）
+
+較重的計算（資料列排序 / 分組、原始資料盒鬚圖）不在請求執行緒中直接執行，
+而是交給大小固定的執行緒池：
+
+- 同時執行的計算數不超過 workers（預設為 CPU 核心數），
+  pandas / numpy 運算大多會釋放 GIL，可以使用多個核心
+- 相同的計算（同一個 key）正在執行時，後到的請求等待同一個結果，
+  儀表板同時被多人開啟時不會重複計算
+- 排隊的計算超過 max_pending 時拒絕新的計算（PoolBusyError → 503），
+  避免請求堆積用完記憶體
+
+計算中以 instrumentation.stage() 記錄的耗時會帶回請求執行緒。
+以 X-Profile 量測的請求不經過計算池，直接在請求執行緒中計算，
+cProfile 才會記錄到實際的計算。
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import capture_stages, profiling, record_stages
+
+
+class PoolBusyError(RuntimeError):
+    """排隊的計算已達上限"""
+
+
+class ComputePool:
+    """
+    有上限、會合併相同計算的執行緒池
+
+    Args:
+        workers: 同時執行的計算數，None 為 CPU 核心數
+        max_pending: 執行中加上排隊中的計算上限（不含合併的請求）
+    """
+
+    def __init__(self, workers=None, max_pending=64):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_pending = max(self.workers, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="compute")
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # 池中的執行緒再呼叫 run() 時直接執行，避免互相等待
+        self._local = threading.local()
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _call(self, compute):
+        self._local.inside = True
+        try:
+            with capture_stages() as stages:
+                value = compute()
+            return value, stages
+        finally:
+            self._local.inside = False
+
+    def run(self, key, compute):
+        """
+        在池中執行 compute()（同一個 key 同時只執行一次）並等待結果
+
+        key 需包含資料版本與所有參數，不同資料版本不會共用結果。
+        """
+        if getattr(self._local, "inside", False) or profiling():
+            return compute()
+
+        with self._lock:
+            future = self._inflight.get(key)
+            submitted = future is None
+            if not submitted:
+                self.coalesced += 1
+            else:
+                if len(self._inflight) >= self.max_pending:
+                    self.rejected += 1
+                    raise PoolBusyError("Server is busy, try again later")
+                future = self._executor.submit(self._call, compute)
+                self._inflight[key] = future
+                self.submitted += 1
+        if submitted:
+            # 已完成的 future 會立即呼叫 callback，不能在持有鎖時註冊
+            future.add_done_callback(lambda _: self._finish(key, future))
+
+        value, stages = future.result()
+        record_stages(stages)
+        return value
+
+    def _finish(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "inflight": len(self._inflight),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,458 @@
+"""
+可合併的數值分布摘要（Sketches）
+
+解決時間的盒鬚圖統計有兩種來源：
+
+- HistogramSketch：「值 → 出現次數」的直方圖，解決時間是整數小時，
+  不同的值很少，因此能精確算出四分位數與離群值
+- KLLSketch：KLL 分位數摘要，大小固定（與資料筆數、不同值的數量都無關），
+  分位數有誤差，k=200 時排名誤差約 ±1.3%（99% 信賴水準）
+
+兩種摘要都能合併：分批載入、不同分區或不同 worker 各自建立後相加即可。
+
+另外 TopKSketch 保存各國家（與全部）受影響使用者最多的前 k 筆事件，
+/api/top_ips 只需切出前 N 筆，同樣可以合併。
+"""
+
+import numpy as np
+import pandas as pd
+
+from boxplot import _sample
+
+RESOLUTION_COLUMN = "Incident Resolution Time (in Hours)"
+
+# 盒鬚圖的分組欄位
+GROUP_COLUMN = "Defense Mechanism Used"
+
+# 可以額外篩選的欄位：每種篩選組合各自保存一份摘要
+FILTER_COLUMNS = ["Country", "Year"]
+
+# KLL 的精確度參數，越大越準、摘要也越大
+DEFAULT_K = 200
+
+# TOP N 事件：排序欄位、保留的欄位與每個國家保留的筆數
+TOP_COLUMN = "Number of Affected Users"
+TOP_GROUP_COLUMN = "Country"
+TOP_LABEL_COLUMNS = ["Country", "Attack Type"]
+DEFAULT_TOP_K = 100
+
+# KLL 每一層最少保留的筆數（與 Apache DataSketches 相同）
+MIN_LEVEL_CAPACITY = 8
+
+
+def kll_rank_error(k=DEFAULT_K):
+    """
+    KLL 單一分位數的正規化排名誤差（99% 信賴水準）
+
+    使用 Apache DataSketches 對相同壓縮規則量測出的經驗公式；
+    例如 k=200 時約 0.0133，表示回傳的中位數在真實排名 50% ± 1.33% 之間。
+    """
+    return 2.296 / k**0.9723
+
+
+class HistogramSketch:
+    """數值的出現次數（值由小到大排序），可合併"""
+
+    def __init__(self, values=None, counts=None):
+        self.values = (np.asarray(values, dtype="float64")
+                       if values is not None else np.empty(0))
+        self.counts = (np.asarray(counts, dtype="int64")
+                       if counts is not None else np.empty(0, dtype="int64"))
+
+    def merge(self, other):
+        values = np.concatenate([self.values, other.values])
+        counts = np.concatenate([self.counts, other.counts])
+        uniques, inverse = np.unique(values, return_inverse=True)
+        return HistogramSketch(uniques,
+                               np.bincount(inverse, weights=counts,
+                                           minlength=len(uniques)))
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """分位數（與 pandas 預設的 linear 內插相同）"""
+        n = self.count
+        cumulative = np.cumsum(self.counts)
+        position = (n - 1) * q
+        lower = int(np.floor(position))
+        upper = min(lower + 1, n - 1)
+        low_value = self.values[np.searchsorted(cumulative, lower,
+                                                side="right")]
+        high_value = self.values[np.searchsorted(cumulative, upper,
+                                                 side="right")]
+        return low_value + (high_value - low_value) * (position - lower)
+
+    def summary(self, whisker=1.5, max_outliers=100):
+        """盒鬚圖統計，格式與 boxplot.box_summary 的每一組相同"""
+        n = self.count
+        total = float(np.dot(self.values, self.counts))
+        sumsq = float(np.dot(self.values**2, self.counts))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(max(sumsq - total**2 / n, 0) / (n - 1)) \
+                if n > 1 else float("nan")
+
+        q1, median, q3 = (self.quantile(q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        inside = ((self.values >= q1 - whisker * iqr)
+                  & (self.values <= q3 + whisker * iqr))
+        outliers = np.repeat(self.values[~inside], self.counts[~inside])
+        kept = self.values[inside]
+
+        return {
+            "count": n,
+            "mean": total / n,
+            "median": float(median),
+            "q1": float(q1),
+            "q3": float(q3),
+            "min": float(self.values[0]),
+            "max": float(self.values[-1]),
+            "std": float(std),
+            "lower_whisker": float(kept[0]) if len(kept) else float(q1),
+            "upper_whisker": float(kept[-1]) if len(kept) else float(q3),
+            "outlier_count": int(len(outliers)),
+            "outliers": _sample(outliers, max_outliers).tolist(),
+        }
+
+    def nbytes(self):
+        return self.values.nbytes + self.counts.nbytes
+
+
+class KLLSketch:
+    """
+    KLL 分位數摘要（Karnin, Lang & Liberty, 2016）
+
+    第 h 層的每個值代表 2^h 筆資料。某一層超過容量時排序，
+    隨機保留奇數或偶數位置的一半移到上一層，總權重維持等於資料筆數。
+    筆數、總和、平方和與最小 / 最大值另外精確記錄。
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.total = 0.0
+        self.sumsq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        # 固定亂數種子：同樣的資料得到同樣的摘要（回應與 ETag 一致）
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """加入一批數值"""
+        data = np.asarray(values, dtype="float64")
+        data = data[~np.isnan(data)]
+        if not len(data):
+            return self
+        self.n += len(data)
+        self.total += float(data.sum())
+        self.sumsq += float(np.dot(data, data))
+        self.min = min(self.min, float(data.min()))
+        self.max = max(self.max, float(data.max()))
+        self.levels[0] = np.concatenate([self.levels[0], data])
+        self._compress()
+        return self
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(MIN_LEVEL_CAPACITY,
+                   int(np.ceil(self.k * (2 / 3)**depth)))
+
+    def _compress(self):
+        while True:
+            full = [
+                h for h, items in enumerate(self.levels)
+                if len(items) > self._capacity(h)
+            ]
+            if not full:
+                return
+            level = full[0]
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+
+            items = np.sort(self.levels[level])
+            # 奇數筆時最小的一筆留在原層，其餘兩兩一組保留一個
+            odd = len(items) % 2
+            promoted = items[odd:][self._rng.integers(2)::2]
+            self.levels[level] = items[:odd]
+            self.levels[level + 1] = np.concatenate(
+                [self.levels[level + 1], promoted])
+
+    def merge(self, other):
+        merged = KLLSketch(min(self.k, other.k))
+        depth = max(len(self.levels), len(other.levels))
+        merged.levels = [
+            np.concatenate([
+                a.levels[h] if h < len(a.levels) else np.empty(0)
+                for a in (self, other)
+            ]) for h in range(depth)
+        ]
+        merged.n = self.n + other.n
+        merged.total = self.total + other.total
+        merged.sumsq = self.sumsq + other.sumsq
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+        merged._compress()
+        return merged
+
+    @property
+    def count(self):
+        return self.n
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(items), 2**h, dtype=np.int64)
+            for h, items in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        """
+        分位數（以權重展開後做 linear 內插）
+
+        資料還沒被壓縮時（筆數少於 k）與 pandas 的結果完全相同。
+        """
+        values, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        position = (self.n - 1) * q
+        lower = int(np.floor(position))
+        upper = min(lower + 1, self.n - 1)
+        low_value = values[np.searchsorted(cumulative, lower, side="right")]
+        high_value = values[np.searchsorted(cumulative, upper, side="right")]
+        return float(low_value + (high_value - low_value) * (position - lower))
+
+    def summary(self, whisker=1.5, max_outliers=100):
+        """盒鬚圖統計（分位數、鬚線與離群值數量為估計值）"""
+        n = self.n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(max(self.sumsq - self.total**2 / n, 0) / (n - 1)) \
+                if n > 1 else float("nan")
+
+        q1, median, q3 = (self.quantile(q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        low_fence = q1 - whisker * iqr
+        high_fence = q3 + whisker * iqr
+
+        values, weights = self._weighted()
+        inside = (values >= low_fence) & (values <= high_fence)
+        kept = values[inside]
+        outliers = np.repeat(values[~inside], weights[~inside])
+
+        return {
+            "count": n,
+            "mean": self.total / n,
+            "median": median,
+            "q1": q1,
+            "q3": q3,
+            "min": self.min,
+            "max": self.max,
+            "std": float(std),
+            "lower_whisker": float(kept[0]) if len(kept) else q1,
+            "upper_whisker": float(kept[-1]) if len(kept) else q3,
+            "outlier_count": int(len(outliers)),
+            "outliers": _sample(outliers, max_outliers).tolist(),
+        }
+
+    def nbytes(self):
+        return sum(items.nbytes for items in self.levels)
+
+
+class TopKSketch:
+    """
+    TOP_COLUMN 最大的前 k 筆事件（全部資料與各國家各一份）
+
+    每份都已依 TOP_COLUMN 由大到小排序，相同值依資料列原本的順序
+    （與 DataFrame.nlargest 相同），合併時前一份的資料列排在前面。
+    """
+
+    def __init__(self, overall=None, groups=None, k=DEFAULT_TOP_K):
+        self.overall = overall
+        self.groups = groups or {}
+        self.k = k
+
+    @classmethod
+    def build(cls, df, k=DEFAULT_TOP_K):
+        columns = TOP_LABEL_COLUMNS + [TOP_COLUMN]
+        if any(col not in df.columns for col in columns):
+            return cls(k=k)
+
+        # 先只排序數值欄位，找出全部與各國家的前 k 筆再取出資料列
+        values = df[TOP_COLUMN].to_numpy(dtype="float64", na_value=np.nan)
+        order = np.argsort(-values, kind="stable")
+        order = order[~np.isnan(values[order])]
+        codes = pd.factorize(df[TOP_GROUP_COLUMN])[0][order]
+        rank = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+        in_overall = np.arange(len(order)) < k
+        in_group = (rank < k) & (codes >= 0)
+        keep = in_overall | in_group
+
+        # 類別欄位轉成一般的值，合併時不必統一 categories
+        rows = df.iloc[order[keep]]
+        frame = pd.DataFrame({
+            col: np.asarray(rows[col], dtype=object)
+            for col in TOP_LABEL_COLUMNS
+        })
+        frame[TOP_COLUMN] = rows[TOP_COLUMN].to_numpy()
+
+        grouped = frame[in_group[keep]]
+        groups = {
+            group: part.reset_index(drop=True)
+            for group, part in grouped.groupby(TOP_GROUP_COLUMN, sort=False)
+        }
+        return cls(frame[in_overall[keep]].reset_index(drop=True), groups, k)
+
+    @staticmethod
+    def _merge_frames(left, right, k):
+        if left is None or right is None:
+            return left if right is None else right
+        merged = pd.concat([left, right], ignore_index=True)
+        return merged.sort_values(TOP_COLUMN, ascending=False,
+                                  kind="stable").head(k).reset_index(
+                                      drop=True)
+
+    def merge(self, other):
+        k = min(self.k, other.k)
+        groups = {
+            group: self._merge_frames(self.groups.get(group),
+                                      other.groups.get(group), k)
+            for group in self.groups.keys() | other.groups.keys()
+        }
+        return TopKSketch(self._merge_frames(self.overall, other.overall, k),
+                          groups, k)
+
+    def top(self, n, group=None):
+        """
+        前 n 筆（n 不可大於 k），group 為 None 時為全部資料
+
+        Returns:
+            DataFrame（TOP_LABEL_COLUMNS 與 TOP_COLUMN），沒有資料時為空
+        """
+        frame = self.overall if group is None else self.groups.get(group)
+        if frame is None:
+            return pd.DataFrame(columns=TOP_LABEL_COLUMNS + [TOP_COLUMN])
+        return frame.head(n)
+
+    def nbytes(self):
+        frames = [self.overall, *self.groups.values()]
+        return sum(int(f.memory_usage(index=False, deep=True).sum())
+                   for f in frames if f is not None)
+
+
+def _merge_tables(left, right):
+    merged = {}
+    for dims in left.keys() | right.keys():
+        groups = dict(left.get(dims, {}))
+        for labels, sketch in right.get(dims, {}).items():
+            groups[labels] = (groups[labels].merge(sketch)
+                              if labels in groups else sketch)
+        merged[dims] = groups
+    return merged
+
+
+class SketchSet:
+    """
+    各防禦方法（與篩選條件組合）的解決時間摘要
+
+    exact / approx 的結構都是
+        {篩選欄位 tuple: {(防禦方法, *篩選值): 摘要}}
+    例如 ("Country",) → {("Firewall", "China"): ...}；() 表示不篩選。
+    top 為 TOP N 事件（見 TopKSketch）。
+    """
+
+    def __init__(self, exact=None, approx=None, k=DEFAULT_K, top=None):
+        self.exact = exact or {}
+        self.approx = approx or {}
+        self.k = k
+        self.top = top if top is not None else TopKSketch()
+
+    @classmethod
+    def build(cls, df, k=DEFAULT_K):
+        top = TopKSketch.build(df)
+        if RESOLUTION_COLUMN not in df.columns or \
+                GROUP_COLUMN not in df.columns:
+            return cls(k=k, top=top)
+
+        filters = [col for col in FILTER_COLUMNS if col in df.columns]
+        groupings = [()]
+        for col in filters:
+            groupings += [dims + (col,) for dims in groupings]
+
+        finest = [GROUP_COLUMN] + filters
+        frame = df[finest + [RESOLUTION_COLUMN]].dropna()
+        values = frame[RESOLUTION_COLUMN].to_numpy(dtype="float64")
+
+        # 直方圖：一次計算最細的分組，較粗的分組由它加總
+        counts = frame.groupby(finest + [RESOLUTION_COLUMN], observed=True,
+                               sort=True).size()
+        exact = {}
+        for dims in groupings:
+            levels = [GROUP_COLUMN, *dims]
+            rolled = counts.groupby(level=levels + [RESOLUTION_COLUMN],
+                                    observed=True, sort=True).sum()
+            exact[dims] = {
+                _as_tuple(labels): HistogramSketch(
+                    part.index.get_level_values(RESOLUTION_COLUMN),
+                    part.to_numpy())
+                for labels, part in rolled.groupby(level=levels,
+                                                   observed=True, sort=True)
+            }
+
+        # KLL：最細的分組直接由資料建立，較粗的分組合併細的摘要
+        finest_key = tuple(filters)
+        approx = {finest_key: {}}
+        for labels, positions in frame.groupby(finest, observed=True,
+                                               sort=True).indices.items():
+            approx[finest_key][_as_tuple(labels)] = KLLSketch(k).update(
+                values[positions])
+        for dims in groupings:
+            if dims == finest_key:
+                continue
+            keep = [0] + [1 + filters.index(col) for col in dims]
+            table = {}
+            for labels, sketch in approx[finest_key].items():
+                key = tuple(labels[i] for i in keep)
+                table[key] = (table[key].merge(sketch)
+                              if key in table else sketch)
+            approx[dims] = table
+
+        return cls(exact, approx, k, top)
+
+    def merge(self, other):
+        return SketchSet(_merge_tables(self.exact, other.exact),
+                         _merge_tables(self.approx, other.approx),
+                         min(self.k, other.k),
+                         self.top.merge(other.top))
+
+    def lookup(self, precision="exact", filters=None):
+        """
+        依篩選條件取出各防禦方法的摘要
+
+        Args:
+            precision: "exact"（直方圖）或 "approx"（KLL）
+            filters: 例如 {"Country": "China", "Year": 2020}
+
+        Returns:
+            {防禦方法: 摘要}，依防禦方法排序
+        """
+        filters = filters or {}
+        dims = tuple(col for col in FILTER_COLUMNS if col in filters)
+        wanted = tuple(filters[col] for col in dims)
+        table = (self.exact if precision == "exact" else self.approx).get(
+            dims, {})
+        return {
+            labels[0]: sketch
+            for labels, sketch in sorted(table.items(), key=lambda x: x[0])
+            if labels[1:] == wanted
+        }
+
+    def nbytes(self):
+        return self.top.nbytes() + sum(
+            sketch.nbytes() for tables in (self.exact, self.approx)
+            for groups in tables.values() for sketch in groups.values())
+
+
+def _as_tuple(labels):
+    return labels if isinstance(labels, tuple) else (labels, )
@@ -0,0 +1,183 @@
+"""
+資料集快照（Dataset Snapshot）
+
+把 DataFrame、聚合立方體、列索引與資料版本綁在同一個唯讀物件裡。
+API 每次請求開始時取得目前的快照，整個請求都使用同一份資料；
+重新載入時建立新的快照後一次替換，進行中的請求不受影響。
+"""
+
+import time
+
+import pandas as pd
+
+from aggregates import AggregateCube
+from indexes import RowIndex
+from partitions import Partition, PartitionMap, cube_values, frame_values
+from schema import concat_frames
+from sketches import SketchSet
+from storage import FrameStore, SQLiteStore
+
+
+class DatasetSnapshot:
+    """某一時間點的資料集與其衍生結構（建立後不再修改）"""
+
+    def __init__(self, df, cube, index, sources=(), sketches=None,
+                 streamed=False, partitions=None, store=None):
+        self.df = df
+        self.cube = cube
+        self.index = index
+        self.sources = tuple(sources)
+        # 解決時間的分布摘要（見 sketches.SketchSet）
+        self.sketches = sketches if sketches is not None else SketchSet()
+        # 串流載入：df 是磁碟上的資料列（或只有欄位定義），沒有列索引
+        self.streamed = streamed
+        # 各來源檔案（與附加的資料）的分區，篩選 Year / Country 時用來略過分區
+        self.partitions = (partitions
+                           if partitions is not None else PartitionMap())
+        # 需要資料列的查詢從 store 讀取（見 storage.py）
+        self.store = (store if store is not None else FrameStore(
+            df, index, self.partitions))
+        self.version = cube.fingerprint()
+        self.created_at = time.time()
+        # 開始載入前的來源檔案狀態（watcher.DataWatcher.capture），
+        # 發布後以此為資料監看的基準
+        self.file_state = None
+
+    @classmethod
+    def build(cls, df, sources=(), cube=None, sketches=None,
+              partitions=None):
+        """
+        從完整的 DataFrame 建立快照
+
+        cube / sketches / partitions 已經算好（例如分區平行載入）時直接使用。
+        """
+        if partitions is None and len(df):
+            partitions = PartitionMap([
+                Partition(sources[0] if sources else None, len(df),
+                          frame_values(df), start=0)
+            ])
+        return cls(df,
+                   cube if cube is not None else AggregateCube(df),
+                   RowIndex(df),
+                   sources,
+                   sketches=(sketches if sketches is not None else
+                             SketchSet.build(df)),
+                   partitions=partitions)
+
+    @classmethod
+    def from_stream(cls, df, cube, sketches, sources=(), partitions=None):
+        """
+        從分批載入的結果建立快照（見 ingest.ingest_csv）
+
+        df 可能是 memory-map 的完整資料或只有欄位定義，
+        不建立列索引，需要資料列的查詢改為逐欄掃描。
+        """
+        if partitions is None:
+            partitions = PartitionMap([
+                Partition(sources[0] if sources else None, cube.total_rows,
+                          cube_values(cube),
+                          frame=df if len(df) else None)
+            ])
+        return cls(df, cube, RowIndex(df, columns=[]), sources,
+                   sketches=sketches, streamed=True, partitions=partitions)
+
+    @classmethod
+    def from_store(cls, store, cube, sketches, sources=()):
+        """
+        從 SQLite 資料庫建立快照（見 storage.SQLiteStore）
+
+        df 只有欄位定義，需要資料列的查詢由資料庫執行。
+        """
+        df = store.schema
+        return cls(df, cube, RowIndex(df, columns=[]), sources,
+                   sketches=sketches, streamed=True, store=store)
+
+    @classmethod
+    def empty(cls):
+        return cls.build(pd.DataFrame())
+
+    @property
+    def rows(self):
+        return int(self.cube.total_rows)
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def has_rows(self):
+        """
+        是否保存了全部資料列（需要資料列的查詢能否得到正確結果）
+
+        串流載入且不保存資料列（DATA_ROW_STORE=0，或欄式快取無法使用）
+        時只有聚合結果，只能回答聚合立方體涵蓋的查詢。
+        """
+        if not self.streamed or isinstance(self.store, SQLiteStore):
+            return True
+        return bool(self.partitions) and all(
+            p.frame is not None for p in self.partitions)
+
+    def append(self, new_rows, sources=()):
+        """
+        加入新的資料列，回傳新的快照
+
+        聚合結果只計算新資料再與現有結果合併；新資料列另存為一個分區，
+        不複製現有的資料列與列索引（之後由 compact() 在背景合併）。
+        串流載入的快照只更新聚合結果，不把資料列合併進記憶體。
+        """
+        if new_rows.empty:
+            return self
+        sources = self.sources + tuple(sources)
+        if self.cube.total_rows == 0:
+            return DatasetSnapshot.build(new_rows, sources)
+
+        cube = self.cube.merge(AggregateCube(new_rows))
+        sketches = self.sketches.merge(SketchSet.build(new_rows))
+        source = sources[-1] if sources else None
+        if isinstance(self.store, SQLiteStore):
+            # 新資料列寫進資料庫，下次啟動不必重新讀取
+            # （其他 worker 已寫入時改用資料庫中的結果）
+            store, cube, sketches = self.store.append(new_rows, cube,
+                                                      sketches, sources)
+            return DatasetSnapshot(self.df, cube, self.index, sources,
+                                   sketches=sketches, streamed=True,
+                                   store=store)
+        # 新資料列不寫進 df（串流載入時也不寫進磁碟快取），
+        # 留在分區中供需要資料列的查詢使用
+        partitions = self.partitions.add(
+            Partition(source, len(new_rows), frame_values(new_rows),
+                      frame=new_rows,
+                      index=None if self.streamed else RowIndex(new_rows)))
+        return DatasetSnapshot(self.df, cube, self.index, sources,
+                               sketches=sketches, streamed=self.streamed,
+                               partitions=partitions)
+
+    def appended(self):
+        """
+        資料列不在 df 中的分區（各自 memory-map 的分區、附加的資料列）
+
+        串流載入的快照沒有列索引，回傳空的清單。
+        """
+        if self.streamed:
+            return []
+        return self.partitions.appended()
+
+    def compact(self):
+        """
+        把附加的資料列合併進 df 並重建列索引，回傳新的快照
+
+        內容與資料版本不變，只是之後的查詢不必再逐列篩選附加的分區。
+        需要複製整份資料，由背景執行緒呼叫，不在請求中執行。
+        """
+        appended = self.appended()
+        # 資料列都在各分區的 memory-map 中時不合併（合併會複製到 heap）
+        if not appended or not len(self.df):
+            return self
+        df = concat_frames([self.df] + [p.frame for p in appended])
+        partitions = PartitionMap()
+        offset = 0
+        for p in self.partitions:
+            partitions = partitions.add(
+                Partition(p.source, p.rows, p.values, start=offset))
+            offset += p.rows
+        return DatasetSnapshot(df, self.cube, RowIndex(df), self.sources,
+                               sketches=self.sketches, partitions=partitions)
@@ -12,8 +12,7 @@ async function loadHeatmap() {
         chartDiv.classList.add('loading');
         chartDiv.innerHTML = '<div class="spinner-border" role="status"><span class="visually-hidden">Loading...</span></div>';
 
-        const response = await fetch('/api/heatmap');
-        const data = await response.json();
+        const data = await fetchJSON('/api/heatmap');
 
         if (data.error) {
             throw new Error(data.error);
@@ -101,8 +100,7 @@ async function loadHeatmap() {
 async function loadTreemap() {
     const chartDiv = document.getElementById("treemap-chart");
     try {
-        const response = await fetch("/api/treemap");
-        const data = await response.json();
+        const data = await fetchJSON("/api/treemap");
 
         if (data.error) {
             throw new Error(data.error);
@@ -124,6 +122,7 @@ async function loadTreemap() {
 
         const trace = {
             type: "treemap",
+            ids: data.ids, // 多層時標籤可能重複，以路徑作為節點識別
             labels: data.labels,
             parents: data.parents,
             values: data.values,
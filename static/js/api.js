@@ -0,0 +1,138 @@
+/**
+ * API 共用函式
+ *
+ * 靜態匯出（export_static.py）的頁面會設定 window.STATIC_BUNDLE，
+ * /api 請求改從預先產生的 JSON 檔案（gzip 壓縮）讀取，不需要 Python 伺服器。
+ */
+
+// 與 http_cache.py 的 DEFAULT_ARGS 相同：省略參數與傳入預設值是同一個請求
+const API_DEFAULT_ARGS = { country: "all", mode: "single", top_n: "10", type: "count" };
+
+let bundleManifest = null;
+
+/**
+ * 靜態檔案中的 key（與 export_static.bundle_key 相同：參數排序、去掉預設值）
+ * @param {string} path - 例如 /api/time_series?country=China
+ */
+function bundleKey(path) {
+    const url = new URL(path, window.location.origin);
+    const keys = Array.from(new Set(url.searchParams.keys())).sort();
+    const items = [];
+    keys.forEach((key) => {
+        let value = url.searchParams.getAll(key).map((v) => v.trim()).join(",");
+        if (key === "countries") {
+            value = value.split(",").map((c) => c.trim()).filter((c) => c).join(",");
+        } else if (key === "top_n" && /^\s*[-+]?\d+\s*$/.test(value)) {
+            value = String(parseInt(value, 10));
+        }
+        if (value === "" || API_DEFAULT_ARGS[key] === value) {
+            return;
+        }
+        items.push(`${key}=${value}`);
+    });
+    return url.pathname + (items.length ? `?${items.join("&")}` : "");
+}
+
+function loadBundleManifest() {
+    if (!bundleManifest) {
+        bundleManifest = fetch(`${window.STATIC_BUNDLE}manifest.json`).then((response) => {
+            if (!response.ok) {
+                throw new Error(`Static bundle manifest not found: ${response.status}`);
+            }
+            return response.json();
+        });
+    }
+    return bundleManifest;
+}
+
+/**
+ * 讀取 gzip 壓縮的 JSON 檔案
+ * 伺服器已用 Content-Encoding 解壓縮時直接解析
+ */
+async function readBundleFile(url) {
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`Static bundle file not found: ${url}`);
+    }
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+        return JSON.parse(await new Response(stream).text());
+    }
+    return JSON.parse(new TextDecoder().decode(bytes));
+}
+
+/**
+ * 多國比較的時間序列：由各國的單一國家結果組合（靜態檔案只有單一國家）
+ */
+async function composeCompareSeries(manifest, countries) {
+    const result = { mode: "compare", countries: [], series: [] };
+    for (const country of countries.slice(0, 5)) {
+        const file = manifest.files[bundleKey(`/api/time_series?country=${encodeURIComponent(country)}`)];
+        if (!file) {
+            continue;
+        }
+        const data = await readBundleFile(`${window.STATIC_BUNDLE}${file}`);
+        if (data.years.length) {
+            result.series.push({ country: country, years: data.years, counts: data.counts });
+        }
+    }
+    return result;
+}
+
+/**
+ * 取得 /api 的 JSON（靜態匯出時從檔案讀取）
+ * @param {string} path - 例如 /api/heatmap
+ */
+async function fetchJSON(path) {
+    if (!window.STATIC_BUNDLE) {
+        return (await fetch(path)).json();
+    }
+
+    const manifest = await loadBundleManifest();
+    const key = bundleKey(path);
+    if (manifest.files[key]) {
+        return readBundleFile(`${window.STATIC_BUNDLE}${manifest.files[key]}`);
+    }
+
+    const url = new URL(path, window.location.origin);
+    if (url.pathname === "/api/time_series" && url.searchParams.get("mode") === "compare") {
+        const countries = (url.searchParams.get("countries") || "").split(",")
+            .map((c) => c.trim()).filter((c) => c);
+        return composeCompareSeries(manifest, countries);
+    }
+    return { error: `Not available in the static export: ${key}` };
+}
+
+/**
+ * 批次 API：一次送出多個 /api 查詢，減少頁面載入的往返次數
+ * @param {Array} queries - [{ id, endpoint, params }]
+ * @returns {Object} 以 id 為 key 的回應資料（失敗的查詢為 null）
+ */
+async function fetchBatch(queries) {
+    if (window.STATIC_BUNDLE) {
+        const results = {};
+        await Promise.all(queries.map(async (query) => {
+            const params = new URLSearchParams(query.params || {}).toString();
+            const data = await fetchJSON(`/api/${query.endpoint}${params ? `?${params}` : ""}`);
+            results[query.id] = data && !data.error ? data : null;
+        }));
+        return results;
+    }
+
+    const response = await fetch("/api/batch", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ queries: queries })
+    });
+    if (!response.ok) {
+        throw new Error(`Batch request failed: ${response.status}`);
+    }
+
+    const data = await response.json();
+    const results = {};
+    data.results.forEach((result) => {
+        results[result.id] = result.status === 200 ? result.data : null;
+    });
+    return results;
+}
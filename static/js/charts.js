@@ -25,15 +25,14 @@ function switchIndustryChart(type) {
     loadIndustryChart();
 }
 
-// 載入bar chart
-async function loadIndustryChart() {
+// 載入bar chart（prefetched：批次 API 已取得的資料）
+async function loadIndustryChart(prefetched = null) {
     const chartDiv = document.getElementById('industry-chart');
     try {
         chartDiv.classList.add('loading');
         chartDiv.innerHTML = '<div class="spinner-border" role="status"><span class="visually-hidden">Loading...</span></div>';
 
-        const response = await fetch(`/api/industry_analysis?type=${currentIndustryChart}`);
-        const data = await response.json();
+        const data = prefetched || await fetchJSON(`/api/industry_analysis?type=${currentIndustryChart}`);
         chartDiv.classList.remove('loading');
         chartDiv.innerHTML = '';
 
@@ -116,11 +115,10 @@ async function loadIndustryChart() {
 }
 
 // 載入園餅圖
-async function loadAttackTypes() {
+async function loadAttackTypes(prefetched = null) {
     const chartDiv = document.getElementById('attack-types-chart');
     try {
-        const response = await fetch('/api/attack_types');
-        const data = await response.json();
+        const data = prefetched || await fetchJSON('/api/attack_types');
         chartDiv.classList.remove('loading');
         chartDiv.innerHTML = '';
 
@@ -163,11 +161,11 @@ async function loadAttackTypes() {
 }
 
 // 載入盒鬚圖
-async function loadDefenseResolution() {
+async function loadDefenseResolution(prefetched = null) {
     const chartDiv = document.getElementById('defense-resolution-chart');
     try {
-        const response = await fetch('/api/defense_resolution');
-        const data = await response.json();
+        // summary 模式：伺服器只回傳盒鬚圖統計，不傳送每筆原始資料
+        const data = prefetched || await fetchJSON('/api/defense_resolution?mode=summary');
 
         if (data.error) {
             throw new Error(data.error);
@@ -181,23 +179,41 @@ async function loadDefenseResolution() {
         const colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEAA7', '#DDA0DD', '#98D8C8'];
 
         data.defense_methods.forEach((method, index) => {
-            if (data.resolution_data[method] && data.resolution_data[method].length > 0) {
+            const stats = data.statistics[method];
+            if (!stats || stats.count === 0) return;
+
+            // 使用預先計算的四分位數與鬚線繪製盒鬚圖
+            traces.push({
+                type: 'box',
+                name: method,
+                x: [method],
+                q1: [stats.q1],
+                median: [stats.median],
+                q3: [stats.q3],
+                lowerfence: [stats.lower_whisker],
+                upperfence: [stats.upper_whisker],
+                marker: {
+                    color: colors[index % colors.length]
+                },
+                line: {
+                    color: colors[index % colors.length]
+                }
+            });
+
+            // 離群值（伺服器端已限制數量）
+            if (stats.outliers.length > 0) {
                 traces.push({
-                    type: 'box',
-                    y: data.resolution_data[method],
+                    type: 'scatter',
+                    mode: 'markers',
                     name: method,
-                    boxpoints: 'outliers',
+                    x: stats.outliers.map(() => method),
+                    y: stats.outliers,
+                    showlegend: false,
                     marker: {
-                        color: colors[index % colors.length],
-                        outliercolor: 'rgba(219, 64, 82, 0.6)',
-                        line: {
-                            outliercolor: 'rgba(219, 64, 82, 0.6)',
-                            outlierwidth: 2
-                        }
+                        color: 'rgba(219, 64, 82, 0.6)',
+                        size: 6
                     },
-                    line: {
-                        color: colors[index % colors.length]
-                    }
+                    hovertemplate: `<b>${method}</b><br>離群值: %{y}h<extra></extra>`
                 });
             }
         });
@@ -261,18 +277,29 @@ function updateDefenseStatsTable(statistics) {
             <td>${stats.count}</td>
             <td>${stats.mean.toFixed(1)}h</td>
             <td>${stats.median.toFixed(1)}h</td>
-            <td>${stats.std.toFixed(1)}h</td>
+            <td>${stats.std != null ? stats.std.toFixed(1) + 'h' : '-'}</td>
             <td>${stats.min.toFixed(1)}h</td>
             <td>${stats.max.toFixed(1)}h</td>
         `;
     });
 }
 
-//把圖表載入方法包在一起
-function initChartsPage() {
-    loadIndustryChart();
-    loadAttackTypes();
-    loadDefenseResolution();
+//把圖表載入方法包在一起（一次批次請求，失敗的項目再個別請求）
+async function initChartsPage() {
+    let results = {};
+    try {
+        results = await fetchBatch([
+            { id: 'industry', endpoint: 'industry_analysis', params: { type: currentIndustryChart } },
+            { id: 'attack_types', endpoint: 'attack_types' },
+            { id: 'defense', endpoint: 'defense_resolution', params: { mode: 'summary' } }
+        ]);
+    } catch (error) {
+        console.error('Error loading batch data:', error);
+    }
+
+    loadIndustryChart(results.industry);
+    loadAttackTypes(results.attack_types);
+    loadDefenseResolution(results.defense);
 }
 
 // 頁面載入時初始化
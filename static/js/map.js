@@ -3,18 +3,40 @@
  * Map page - Animated choropleth map
  */
 
+/**
+ * 把欄式回應（countries + 每年一個對齊的損失陣列）轉成逐年的資料
+ * 沒有資料（null）的國家不放進該年
+ * @param {Object} mapData - /api/map_data?format=columnar 的回應
+ * @returns {Object} { 年份: { countries, losses } }
+ */
+function columnsToYears(mapData) {
+    const byYear = {};
+    mapData.years.forEach((year, index) => {
+        const countries = [];
+        const losses = [];
+        mapData.losses[index].forEach((loss, i) => {
+            if (loss !== null) {
+                countries.push(mapData.countries[i]);
+                losses.push(loss);
+            }
+        });
+        byYear[year.toString()] = { countries, losses };
+    });
+    return byYear;
+}
+
 /**
  * 載入地圖資料並繪製動態地圖
  */
 async function loadMapData() {
     const chartDiv = document.getElementById('map-chart');
     try {
-        const response = await fetch('/api/map_data');
-        const mapData = await response.json();
+        const mapData = await fetchJSON('/api/map_data?format=columnar');
 
         if (mapData.error) {
             throw new Error(mapData.error);
         }
+        mapData.data_by_year = columnsToYears(mapData);
 
         // Update global statistics
         updateGlobalStatistics(mapData.statistics);
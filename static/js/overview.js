@@ -9,11 +9,11 @@ let currentChartMode = "single";
 
 /**
  * 載入可用國家列表
+ * @param {Object} prefetched - 批次 API 已取得的資料（沒有則自行請求）
  */
-async function loadCountries() {
+async function loadCountries(prefetched = null) {
     try {
-        const response = await fetch("/api/countries");
-        const data = await response.json();
+        const data = prefetched || await fetchJSON("/api/countries");
         availableCountries = data.countries || [];
 
         // Populate country select for time series (single)
@@ -43,8 +43,9 @@ async function loadCountries() {
  * @param {string} country - 國家篩選
  * @param {Array} countries - 多國比較
  * @param {string} mode - 模式 (single/compare)
+ * @param {Object} prefetched - 批次 API 已取得的資料（沒有則自行請求）
  */
-async function loadTimeSeries(country = "all", countries = [], mode = "single") {
+async function loadTimeSeries(country = "all", countries = [], mode = "single", prefetched = null) {
     const chartDiv = document.getElementById("time-series-chart");
     const statsPanel = document.getElementById("timeseries-stats-panel");
 
@@ -61,8 +62,7 @@ async function loadTimeSeries(country = "all", countries = [], mode = "single")
             params.append("country", country);
         }
 
-        const response = await fetch(`/api/time_series?${params.toString()}`);
-        const data = await response.json();
+        const data = prefetched || await fetchJSON(`/api/time_series?${params.toString()}`);
 
         chartDiv.classList.remove("loading");
         chartDiv.innerHTML = "";
@@ -257,11 +257,11 @@ function updateTimeSeriesStatistics(stats, country) {
 
 /**
  * 載入統計資料
+ * @param {Object} prefetched - 批次 API 已取得的資料（沒有則自行請求）
  */
-async function loadStatistics() {
+async function loadStatistics(prefetched = null) {
     try {
-        const response = await fetch("/api/statistics");
-        const data = await response.json();
+        const data = prefetched || await fetchJSON("/api/statistics");
 
         document.getElementById("total-attacks").textContent = data.total_attacks.toLocaleString();
         document.getElementById("unique-countries").textContent = data.unique_countries;
@@ -276,14 +276,14 @@ async function loadStatistics() {
 
 /**
  * 載入安全漏洞分布堆疊長條圖
+ * @param {Object} prefetched - 批次 API 已取得的資料（沒有則自行請求）
  */
-async function loadSeverityChart() {
+async function loadSeverityChart(prefetched = null) {
     const chartDiv = document.getElementById("severity-chart");
     if (!chartDiv) return; // 如果元素不存在則跳過
 
     try {
-        const response = await fetch("/api/severity_by_type");
-        const data = await response.json();
+        const data = prefetched || await fetchJSON("/api/severity_by_type");
         chartDiv.classList.remove("loading");
         chartDiv.innerHTML = "";
 
@@ -339,14 +339,33 @@ async function loadSeverityChart() {
     }
 }
 
+/**
+ * 以一次批次請求載入頁面初始資料，失敗的項目再個別請求
+ */
+async function loadOverviewData() {
+    let results = {};
+    try {
+        results = await fetchBatch([
+            { id: "countries", endpoint: "countries" },
+            { id: "statistics", endpoint: "statistics" },
+            { id: "time_series", endpoint: "time_series", params: { country: currentTimeSeriesCountry } },
+            { id: "severity", endpoint: "severity_by_type" }
+        ]);
+    } catch (error) {
+        console.error("Error loading batch data:", error);
+    }
+
+    loadCountries(results.countries);
+    loadStatistics(results.statistics);
+    loadTimeSeries(currentTimeSeriesCountry, [], "single", results.time_series);
+    loadSeverityChart(results.severity);
+}
+
 /**
  * 初始化頁面
  */
 function initOverviewPage() {
-    loadCountries();
-    loadStatistics();
-    loadTimeSeries(currentTimeSeriesCountry);
-    loadSeverityChart();
+    loadOverviewData();
 
     // Time series mode change
     document.getElementById("chart-mode-select").addEventListener("change", function () {
@@ -0,0 +1,411 @@
+"""
+資料列的儲存後端（Row Store）
+
+大部分 API 由聚合立方體回答；需要資料列的計算（TOP N 事件、
+/api/query 的資料列分組、多層 Treemap）都透過同一個介面讀取：
+
+- FrameStore：記憶體中的 DataFrame（預設），使用列索引與分區
+- SQLiteStore：本機的 SQLite 資料庫檔案（DATA_BACKEND=sqlite），
+  Country / Year / Target Industry / Attack Type 有索引，資料集不必
+  放進記憶體；聚合結果也存在資料庫中，再次啟動時不必重新讀取 CSV
+
+篩選條件為 {欄位: query.Filter}（values 為 IN，low / high 為範圍）。
+"""
+
+import os
+import pickle
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from data_cache import _acquire_lock, source_fingerprint
+from ingest import DEFAULT_CHUNK_ROWS, StreamingAggregator, read_csv_chunks
+from schema import CATEGORICAL_COLUMNS, apply_schema, concat_frames
+
+DEFAULT_DB_PATH = os.path.join("data", "threats.sqlite")
+
+# 資料庫格式版本，格式改變時遞增讓舊資料庫重建
+DB_VERSION = 2
+
+TABLE = "threats"
+
+# 建立索引的欄位
+SQL_INDEXED_COLUMNS = ["Country", "Year", "Target Industry", "Attack Type"]
+
+
+def _top(rows, order_by, limit, descending):
+    if descending:
+        return rows.nlargest(limit, order_by)
+    return rows.nsmallest(limit, order_by)
+
+
+def _positions(row_index, column, values):
+    """列索引中欄位值在 values 內的列位置（遞增排序）"""
+    positions = [row_index.positions(column, v) for v in values]
+    return (np.sort(np.concatenate(positions))
+            if len(positions) > 1 else positions[0])
+
+
+class FrameStore:
+    """記憶體中（或 memory-map）的 DataFrame"""
+
+    name = "memory"
+
+    def __init__(self, df, row_index, partitions):
+        self.df = df
+        self.row_index = row_index
+        self.partitions = partitions
+
+    def _frames(self, filters):
+        """
+        先用列索引（最有選擇性的等值 / IN 條件）或分區縮小範圍
+
+        Returns:
+            ([(資料列, 已由索引篩選的欄位)], 讀取方式)
+        """
+        indexed = [
+            (column, f.values) for column, f in filters.items()
+            if f.values is not None and self.row_index.has(column)
+        ]
+        if indexed:
+            # df 使用快照的列索引；各分區的 frame（memory-map 或附加的
+            # 資料列）使用分區自己的列索引，沒有時逐列篩選
+            masks = {column: f.mask for column, f in filters.items()}
+            sources = [(self.df, self.row_index)] + [
+                (p.frame, p.index) for p in self.partitions.appended()
+                if p.may_match(masks)
+            ]
+            frames = []
+            for rows, row_index in sources:
+                if not len(rows):
+                    continue
+                candidates = [
+                    (_positions(row_index, column, values), column)
+                    for column, values in indexed
+                    if row_index is not None and row_index.has(column)
+                ]
+                if not candidates:
+                    frames.append((rows, None))
+                    continue
+                positions, used = min(candidates, key=lambda c: len(c[0]))
+                frames.append((rows.iloc[positions], used))
+            return frames or [(self.df.iloc[:0], None)], "index"
+
+        frames, scanned = self.partitions.frames(self.df, {
+            column: f.mask
+            for column, f in filters.items()
+        })
+        source = "partitions" if scanned < len(self.partitions) else "scan"
+        return [(rows, None) for rows in frames], source
+
+    def select(self, columns=None, filters=None, order_by=None, limit=None,
+               descending=True):
+        """
+        讀取符合 filters 的資料列
+
+        Args:
+            columns: 需要的欄位，None 為全部
+            filters: {欄位: Filter}
+            order_by / limit / descending: 只取排序後的前 limit 列
+                （相同值依原資料順序）
+
+        Returns:
+            (DataFrame, plan)：plan 記錄讀取方式與掃描 / 符合的筆數
+        """
+        filters = filters or {}
+        frames, source = self._frames(filters)
+
+        # 串流載入時逐個分區篩選，只有符合的資料列會被合併
+        scanned = matched = 0
+        parts = []
+        for rows, used in frames:
+            scanned += len(rows)
+            mask = np.ones(len(rows), dtype=bool)
+            for column, f in filters.items():
+                if column != used:
+                    mask &= f.mask(rows[column])
+            if not mask.all():
+                rows = rows[mask]
+            matched += len(rows)
+            if order_by is not None and limit is not None:
+                rows = _top(rows, order_by, limit, descending)
+            parts.append(rows if columns is None else rows[columns])
+
+        rows = concat_frames(parts) if len(parts) > 1 else parts[0]
+        if order_by is not None and limit is not None and len(parts) > 1:
+            rows = _top(rows, order_by, limit, descending)
+        return rows, {"source": source, "rows_scanned": int(scanned),
+                      "rows_matched": int(matched)}
+
+    def group_counts(self, dims):
+        """各組筆數（依分組欄位排序）"""
+        frames, _ = self.partitions.frames(self.df, {})
+        rows = (frames[0] if len(frames) == 1 else
+                concat_frames([frame[dims] for frame in frames]))
+        return rows.groupby(dims, observed=True, sort=True).size()
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _param(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _fingerprints(paths):
+    """來源檔案的大小與修改時間（資料監看附加的檔案可能重複出現）"""
+    return [
+        dict(source_fingerprint(p, with_hash=False), path=p)
+        for p in sorted({os.path.abspath(p) for p in paths})
+    ]
+
+
+class SQLiteStore:
+    """
+    SQLite 資料庫中的資料列
+
+    每次查詢開一個唯讀連線，可在多個執行緒中同時使用。
+    查詢結果依 schema 轉型（類別欄位為 category）。
+    多個 worker 共用同一個資料庫檔案：建立與寫入都先取得跨行程的鎖
+    （與 data_cache.py 相同的鎖檔 path + ".lock"）。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, schema, sources=None):
+        self.path = path
+        # 欄位定義（空的 DataFrame）
+        self.schema = schema
+        # 資料庫內容對應的來源檔案狀態（_fingerprints）
+        self.sources = sources
+
+    def _connect(self, readonly=True):
+        if readonly:
+            return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return sqlite3.connect(self.path)
+
+    @staticmethod
+    def _insert(conn, chunk):
+        chunk = chunk.astype({
+            col: object
+            for col in CATEGORICAL_COLUMNS if col in chunk.columns
+        })
+        chunk.to_sql(TABLE, conn, if_exists="append", index=False,
+                     chunksize=10_000)
+
+    @staticmethod
+    def _write_meta(conn, sources, cube, sketches, schema):
+        # 聚合結果以 pickle 存放，只讀取本機自己建立的資料庫
+        meta = {
+            "version": DB_VERSION,
+            "sources": sources,
+            "cube": cube,
+            "sketches": sketches,
+            "schema": schema,
+        }
+        conn.execute("CREATE TABLE IF NOT EXISTS meta "
+                     "(key TEXT PRIMARY KEY, value BLOB)")
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, pickle.dumps(value)) for key, value in meta.items()])
+
+    @staticmethod
+    def _read_meta(path):
+        with closing(sqlite3.connect(f"file:{path}?mode=ro",
+                                     uri=True)) as conn:
+            return {
+                key: pickle.loads(value)
+                for key, value in conn.execute("SELECT key, value FROM meta")
+            }
+
+    @staticmethod
+    def _release(lock_path):
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+    @classmethod
+    def build(cls, csv_paths, path=DEFAULT_DB_PATH,
+              chunk_rows=DEFAULT_CHUNK_ROWS):
+        """
+        把 CSV 分批寫入資料庫並建立索引（先寫到暫存檔再替換）
+
+        多個 worker 同時啟動時只有一個會匯入 CSV，
+        其他的取得鎖後發現資料庫已經建好，直接開啟。
+
+        Returns:
+            (store, cube, sketches)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        lock_path = path + ".lock"
+        locked = _acquire_lock(lock_path)
+        if not locked:
+            print("! 等待 SQLite 資料庫逾時，自行匯入 CSV")
+        try:
+            if locked:
+                # 等待期間其他 worker 可能已經建好資料庫
+                opened = cls.open(csv_paths, path)
+                if opened is not None:
+                    print(f"✓ 使用其他行程建立的 SQLite 資料庫: {path}")
+                    return opened
+            return cls._build(csv_paths, path, chunk_rows)
+        finally:
+            if locked:
+                cls._release(lock_path)
+
+    @classmethod
+    def _build(cls, csv_paths, path, chunk_rows):
+        # 每個行程使用自己的暫存檔，取得鎖逾時也不會互相覆寫
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        aggregator = StreamingAggregator()
+        sources = _fingerprints(csv_paths)
+        try:
+            with closing(sqlite3.connect(tmp_path)) as conn:
+                conn.execute("PRAGMA journal_mode = OFF")
+                conn.execute("PRAGMA synchronous = OFF")
+                for source in csv_paths:
+                    for chunk in read_csv_chunks(source, chunk_rows):
+                        aggregator.add(chunk)
+                        cls._insert(conn, chunk)
+                        print(f"  已寫入 {aggregator.rows} 筆資料")
+
+                cube, sketches, schema = aggregator.result()
+                for i, col in enumerate(SQL_INDEXED_COLUMNS):
+                    if col in schema.columns:
+                        conn.execute(f"CREATE INDEX idx_{i} ON {TABLE} "
+                                     f"({_quote(col)})")
+                cls._write_meta(conn, sources, cube, sketches, schema)
+                conn.commit()
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        print(f"✓ 已建立 SQLite 資料庫: {path}")
+        return cls(path, schema, sources), cube, sketches
+
+    @classmethod
+    def open(cls, csv_paths, path=DEFAULT_DB_PATH):
+        """
+        開啟已建立的資料庫，來源檔案改變（或格式版本不同）時回傳 None
+
+        Returns:
+            (store, cube, sketches) 或 None
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            meta = cls._read_meta(path)
+            sources = _fingerprints(csv_paths)
+        except (sqlite3.Error, pickle.UnpicklingError, OSError) as e:
+            print(f"! 無法讀取 SQLite 資料庫: {e}")
+            return None
+
+        if (meta.get("version") != DB_VERSION
+                or meta.get("sources") != sources):
+            return None
+        return (cls(path, meta["schema"], sources), meta["cube"],
+                meta["sketches"])
+
+    def append(self, new_rows, cube, sketches, sources):
+        """
+        寫入附加的資料列並更新聚合結果（資料監看使用）
+
+        每個 worker 的資料監看都會看到同一批新資料，只有取得鎖、
+        且資料庫內容仍是這個 store 讀到的狀態時才寫入；否則（等待鎖逾時、
+        資料庫已被其他 worker 更新）不寫入，改用資料庫中的聚合結果，
+        資料列不會重複。
+
+        Returns:
+            (store, cube, sketches)：寫入後（或資料庫中）的狀態
+        """
+        current = _fingerprints(sources)
+        lock_path = self.path + ".lock"
+        locked = _acquire_lock(lock_path)
+        try:
+            meta = self._read_meta(self.path)
+            if not locked:
+                # 沒有取得鎖時不寫入，避免與其他 worker 重複寫入同一批資料列
+                print("! 等待 SQLite 資料庫逾時，略過寫入，"
+                      "改用資料庫中的聚合結果")
+            elif meta.get("sources") == self.sources:
+                with closing(self._connect(readonly=False)) as conn:
+                    self._insert(conn, new_rows)
+                    self._write_meta(conn, current, cube, sketches,
+                                     self.schema)
+                    conn.commit()
+                return (SQLiteStore(self.path, self.schema, current), cube,
+                        sketches)
+            elif meta.get("sources") != current:
+                print("! SQLite 資料庫已被其他行程更新，"
+                      "改用資料庫中的聚合結果")
+            return (SQLiteStore(self.path, meta["schema"], meta["sources"]),
+                    meta["cube"], meta["sketches"])
+        finally:
+            if locked:
+                self._release(lock_path)
+
+    def _where(self, filters):
+        clauses, params = [], []
+        for column, f in filters.items():
+            name = _quote(column)
+            if f.values is not None:
+                clauses.append(f"{name} IN ({', '.join('?' * len(f.values))})")
+                params += [_param(v) for v in f.values]
+                continue
+            if f.low is not None:
+                clauses.append(f"{name} >= ?")
+                params.append(_param(f.low))
+            if f.high is not None:
+                clauses.append(f"{name} <= ?")
+                params.append(_param(f.high))
+        return clauses, params
+
+    def _read(self, sql, params=()):
+        with closing(self._connect()) as conn:
+            frame = pd.read_sql_query(sql, conn, params=list(params))
+            detail = [
+                row[-1]
+                for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)
+            ]
+        return frame, detail
+
+    def select(self, columns=None, filters=None, order_by=None, limit=None,
+               descending=True):
+        """同 FrameStore.select()，篩選與排序在 SQLite 中執行"""
+        columns = list(self.schema.columns) if columns is None else columns
+        clauses, params = self._where(filters or {})
+        if order_by is not None:
+            clauses.append(f"{_quote(order_by)} IS NOT NULL")
+
+        sql = (f"SELECT {', '.join(map(_quote, columns))} FROM {TABLE}")
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order_by is not None:
+            direction = "DESC" if descending else "ASC"
+            sql += f" ORDER BY {_quote(order_by)} {direction}, rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        rows, detail = self._read(sql, params)
+        return apply_schema(rows), {"source": "sqlite",
+                                    "rows_matched": len(rows),
+                                    "sql_plan": detail}
+
+    def group_counts(self, dims):
+        """各組筆數（GROUP BY，依分組欄位排序）"""
+        names = ", ".join(map(_quote, dims))
+        not_null = " AND ".join(f"{_quote(d)} IS NOT NULL" for d in dims)
+        frame, _ = self._read(
+            f"SELECT {names}, COUNT(*) AS n FROM {TABLE} "
+            f"WHERE {not_null} GROUP BY {names} ORDER BY {names}")
+        return frame.set_index(dims)["n"]
@@ -0,0 +1,88 @@
+"""
+階層式 Treemap 資料（Hierarchical Treemap）
+
+任意層數的分組（例如 產業 → 攻擊類型 → 攻擊來源），
+每一層的節點一次以欄位運算產生 labels / parents / ids / values，
+不對每個組合逐列迴圈；事件數低於門檻的節點（與其子節點）會被省略。
+"""
+
+import pandas as pd
+
+# 預設的兩層：目標產業 → 攻擊類型
+DEFAULT_LEVELS = ["Target Industry", "Attack Type"]
+
+# 最多幾層
+MAX_DEPTH = 4
+
+# 產業縮寫，用在子節點的標籤（例如 "BANK - Phishing"）
+INDUSTRY_ACRONYMS = {
+    "IT": "IT",
+    "Healthcare": "HC",
+    "Education": "EDU",
+    "Government": "GOV",
+    "Banking": "BANK",
+    "Retail": "RET",
+    "Telecommunications": "TEL",
+}
+
+
+def build_treemap(level_counts, min_count=6, root="All Industries",
+                  acronyms=INDUSTRY_ACRONYMS):
+    """
+    產生 Plotly treemap 的 labels / parents / ids / values
+
+    Args:
+        level_counts: 各層的事件數 Series，第 i 個的索引是前 i+1 個分組欄位
+        min_count: 事件數低於此值的節點不顯示（其子節點也一併省略）
+        root: 根節點名稱
+        acronyms: 第一層值的縮寫，用在子節點標籤
+
+    Returns:
+        dict: labels、parents、ids、values（根節點在最前面）
+    """
+    frames = []
+    kept = None
+    for depth, counts in enumerate(level_counts):
+        counts = counts[counts >= min_count]
+        path = counts.index.to_frame(index=False).astype(str)
+
+        if depth == 0:
+            ids = path.iloc[:, 0]
+            parents = pd.Series(root, index=path.index)
+            labels = ids
+        else:
+            # 只保留父節點也有顯示的組合
+            parent_ids = path.iloc[:, 0]
+            for col in range(1, depth):
+                parent_ids = parent_ids + "/" + path.iloc[:, col]
+            keep = parent_ids.isin(kept).to_numpy()
+            counts, path, parent_ids = (counts[keep],
+                                        path[keep].reset_index(drop=True),
+                                        parent_ids[keep].reset_index(
+                                            drop=True))
+
+            ids = parent_ids + "/" + path.iloc[:, depth]
+            parents = parent_ids
+            top = path.iloc[:, 0]
+            labels = top.map(acronyms).fillna(top).astype(str)
+            for col in range(1, depth + 1):
+                labels = labels + " - " + path.iloc[:, col]
+
+        kept = set(ids)
+        frames.append(
+            pd.DataFrame({
+                "labels": labels.to_numpy(),
+                "parents": parents.to_numpy(),
+                "ids": ids.to_numpy(),
+                "values": counts.to_numpy(),
+            }))
+
+    nodes = pd.concat(frames, ignore_index=True) if frames else None
+    total = int(frames[0]["values"].sum()) if frames else 0
+
+    result = {"labels": [root], "parents": [""], "ids": [root],
+              "values": [total]}
+    if nodes is not None:
+        for key in result:
+            result[key] += nodes[key].tolist()
+    return result
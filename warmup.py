@@ -0,0 +1,145 @@
+"""
+快取預熱（Cache Warm-up）
+
+資料載入（或更新）後，在背景執行緒池中把常用的 /api 請求先跑一次，
+結果會留在回應快取裡，部署後第一位使用者不必等待計算。
+/api/ready 在預熱完成前回傳 503，負載平衡器可以等快取就緒後再導入流量。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 不帶參數（或只用預設參數）的 endpoint
+WARMUP_PATHS = [
+    "/api/map_data",
+    "/api/map_data?format=columnar",
+    "/api/heatmap",
+    "/api/treemap",
+    "/api/yearly_trend",
+    "/api/statistics",
+    "/api/severity_by_type",
+    "/api/industry_analysis?type=count",
+    "/api/industry_analysis?type=loss",
+    "/api/countries",
+    "/api/attack_types",
+    "/api/time_series",
+    "/api/top_ips",
+    "/api/defense_resolution?mode=summary",
+]
+
+# 支援國家篩選的 endpoint，依事件數最多的幾個國家預熱
+COUNTRY_PATHS = [
+    "/api/top_ips?country={}",
+    "/api/time_series?country={}",
+    "/api/attack_types?country={}",
+]
+
+
+class CacheWarmer:
+    """
+    在背景對目前版本的資料執行一組請求
+
+    Args:
+        app: Flask app（請求會經過 before/after_request，因此寫入回應快取）
+        version_getter: 回傳目前資料版本的函式
+        paths_getter: 回傳要預熱的路徑清單的函式
+        workers: 執行緒數量
+    """
+
+    def __init__(self, app, version_getter, paths_getter, workers=4):
+        self.app = app
+        self.version_getter = version_getter
+        self.paths_getter = paths_getter
+        self.workers = max(1, workers)
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = None
+        self._status = {
+            "state": "idle",
+            "version": None,
+            "done": 0,
+            "total": 0,
+            "failed": [],
+            "started_at": None,
+            "duration": None,
+            # 最近一次完成預熱的版本
+            "warmed_version": None,
+        }
+
+    def schedule(self):
+        """預熱目前版本；正在預熱舊版本時，完成後會接著處理新版本"""
+        with self._lock:
+            self._pending = self.version_getter()
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run,
+                                            name="cache-warmup",
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                version, self._pending = self._pending, None
+                if version is None:
+                    return
+            self._warm(version)
+
+    def _warm(self, version):
+        paths = self.paths_getter()
+        self._update(state="warming", version=version, done=0,
+                     total=len(paths), failed=[], started_at=time.time(),
+                     duration=None)
+
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix="warmup") as pool:
+            for path, status in zip(paths, pool.map(self._request, paths)):
+                # 資料在預熱途中又更新了：這一輪作廢，交給下一輪
+                if self.version_getter() != version:
+                    self._update(state="stale")
+                    pool.shutdown(cancel_futures=True)
+                    return
+                with self._lock:
+                    self._status["done"] += 1
+                    if status != 200:
+                        self._status["failed"].append(path)
+
+        with self._lock:
+            self._status["state"] = "ready"
+            self._status["warmed_version"] = version
+            duration = round(time.time() - self._status["started_at"], 3)
+            self._status["duration"] = duration
+            failed = len(self._status["failed"])
+        print(f"✓ 快取預熱完成: {len(paths) - failed}/{len(paths)} 個請求"
+              f"（{duration} 秒）")
+
+    def _request(self, path):
+        try:
+            with self.app.test_request_context(path):
+                return self.app.full_dispatch_request().status_code
+        except Exception as e:
+            print(f"! 預熱失敗 {path}: {e}")
+            return 500
+
+    def _update(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    @property
+    def warmed(self):
+        """
+        是否至少完成過一次預熱
+
+        資料更新後的重新預熱期間仍視為就緒，舊版本的快取雖然失效，
+        但避免每次附加資料都讓負載平衡器把這台機器移出。
+        """
+        with self._lock:
+            return self._status["warmed_version"] is not None
+
+    def status(self):
+        with self._lock:
+            status = dict(self._status)
+            status["failed"] = list(self._status["failed"])
+        return status
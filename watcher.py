@@ -0,0 +1,232 @@
+"""
+資料目錄監看（Hot Reload）
+
+定期檢查 data/ 內的 CSV 檔案：
+- 已載入的檔案變大（附加新資料）：只讀取上次位置之後的完整資料列
+- 新出現的 CSV 檔案：整份讀入後視為新增資料
+- 檔案變小或前段內容被改寫：通知重新完整載入
+"""
+
+import glob
+import hashlib
+import io
+import os
+import threading
+
+import pandas as pd
+
+from schema import apply_schema, read_threats_csv
+
+# 用來偵測改寫的尾端長度（上次讀到的位置之前的 bytes）
+TAIL_BYTES = 4096
+
+
+def _tail_hash(path, end):
+    """檔案中 end 之前最後 TAIL_BYTES 的 sha1"""
+    start = max(0, end - TAIL_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(end - start)).hexdigest()
+
+
+def _complete_end(path, size):
+    """最後一個換行字元之後的位置（未寫完的最後一列留到下次）"""
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            block = f.read(pos - start)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                return start + i + 1
+            pos = start
+    return 0
+
+
+class _TrackedFile:
+    """已讀取檔案的狀態：讀到哪個位置、欄位名稱與尾端內容"""
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.offset = _complete_end(path, stat.st_size)
+        self.tail = _tail_hash(path, self.offset)
+        self.columns = list(pd.read_csv(path, nrows=0).columns)
+
+
+class DataWatcher:
+    """
+    背景執行緒定期檢查資料目錄
+
+    Args:
+        data_dir: 監看的目錄
+        on_append: 有新資料列時呼叫，參數為 (DataFrame, 來源路徑)
+        on_reset: 已載入的檔案被改寫時呼叫，參數為目前所有已載入的檔案路徑
+        interval: 檢查間隔（秒），0 表示停用
+        loader: 讀取新檔案的函式
+    """
+
+    def __init__(self, data_dir="data", on_append=None, on_reset=None,
+                 interval=5, loader=read_threats_csv):
+        self.data_dir = data_dir
+        self.on_append = on_append
+        self.on_reset = on_reset
+        self.interval = interval
+        self.loader = loader
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # 已載入（資料在快照中）的檔案
+        self._tracked = {}
+        # 啟動時已存在但沒有載入的檔案，不處理
+        self._ignored = set()
+
+    def _csv_files(self):
+        return sorted(glob.glob(os.path.join(self.data_dir, "*.csv")))
+
+    @staticmethod
+    def capture(paths):
+        """
+        記錄檔案目前的狀態（開始載入之前呼叫，結果交給 baseline()）
+
+        以載入前的狀態為基準，載入期間才附加的資料列之後由監看讀取，
+        不會被當作已經載入。
+        """
+        state = {}
+        for path in paths:
+            try:
+                state[os.path.abspath(path)] = _TrackedFile(path)
+            except (OSError, ValueError) as e:
+                print(f"! 無法讀取資料檔案狀態: {path}: {e}")
+        return state
+
+    def baseline(self, loaded_paths, state=None):
+        """
+        以載入前的檔案狀態為基準
+
+        loaded_paths 是已經在快照中的檔案，其餘已存在的 CSV 會被略過，
+        之後才出現的 CSV 檔案才當作新增資料。
+        state 為載入前 capture() 的結果，沒有時使用目前的檔案狀態。
+        """
+        loaded = {os.path.abspath(p) for p in loaded_paths if p}
+        state = state or {}
+        with self._lock:
+            self._tracked = {}
+            self._ignored = set()
+            for path in self._csv_files():
+                key = os.path.abspath(path)
+                if key in loaded:
+                    self._tracked[key] = state.get(key) or _TrackedFile(path)
+                else:
+                    self._ignored.add(key)
+
+    @property
+    def files(self):
+        with self._lock:
+            return [t.path for t in self._tracked.values()]
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return False
+        self._thread = threading.Thread(target=self._run,
+                                        name="data-watcher",
+                                        daemon=True)
+        self._thread.start()
+        print(f"✓ 監看 {self.data_dir}/ 的資料變更（每 {self.interval} 秒）")
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"! 資料監看失敗: {e}")
+
+    def poll(self):
+        """檢查一次，回傳新增的資料列數"""
+        with self._lock:
+            return self._poll()
+
+    def _poll(self):
+        added = 0
+        for path in self._csv_files():
+            key = os.path.abspath(path)
+            if key in self._ignored:
+                continue
+
+            tracked = self._tracked.get(key)
+            if tracked is None:
+                added += self._ingest_new(key, path)
+                continue
+
+            stat = os.stat(path)
+            if (stat.st_size == tracked.size
+                    and stat.st_mtime_ns == tracked.mtime_ns):
+                continue
+
+            if (stat.st_size < tracked.offset or _tail_hash(
+                    path, tracked.offset) != tracked.tail):
+                self._reset(path)
+                return added
+
+            added += self._ingest_tail(tracked, stat)
+
+        # 已載入的檔案被刪除，也需要重新載入
+        missing = [k for k in self._tracked if not os.path.exists(k)]
+        if missing:
+            for key in missing:
+                del self._tracked[key]
+            self._reset(missing[0])
+        return added
+
+    def _ingest_new(self, key, path):
+        tracked = _TrackedFile(path)
+        if tracked.offset == 0:
+            # 檔案還在寫入中，下次再檢查
+            return 0
+        df = self.loader(path)
+        self._tracked[key] = tracked
+        print(f"✓ 偵測到新資料檔案: {path}（{len(df)} 筆）")
+        if self.on_append and len(df):
+            self.on_append(df, path)
+        return len(df)
+
+    def _ingest_tail(self, tracked, stat):
+        end = _complete_end(tracked.path, stat.st_size)
+        if end <= tracked.offset:
+            return 0
+
+        with open(tracked.path, "rb") as f:
+            f.seek(tracked.offset)
+            data = f.read(end - tracked.offset)
+        df = apply_schema(
+            pd.read_csv(io.BytesIO(data), header=None,
+                        names=tracked.columns))
+
+        tracked.offset = end
+        tracked.size = stat.st_size
+        tracked.mtime_ns = stat.st_mtime_ns
+        tracked.tail = _tail_hash(tracked.path, end)
+        print(f"✓ 偵測到附加資料: {tracked.path}（{len(df)} 筆）")
+        if self.on_append and len(df):
+            self.on_append(df, tracked.path)
+        return len(df)
+
+    def _reset(self, path):
+        print(f"! 資料檔案被改寫: {path}，重新完整載入")
+        paths = [t.path for t in self._tracked.values()
+                 if os.path.exists(t.path)]
+        state = self.capture(paths)
+        if self.on_reset:
+            self.on_reset(paths)
+        for key in list(self._tracked):
+            if os.path.exists(key):
+                self._tracked[key] = (state.get(key) or
+                                      _TrackedFile(self._tracked[key].path))